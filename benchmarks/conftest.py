@@ -0,0 +1,202 @@
+# Benchmarks
+# Measures the hot paths of pacli against a fake node serving a synthetic chain (see pacli.fakenode).
+# Needs pytest-benchmark; the wallet.dat benchmark also needs berkeleydb. Run from the repository root:
+#
+#   pytest benchmarks                                   # compares time and memory with benchmarks/baseline.json
+#   pytest benchmarks --update-baseline                 # stores the current results as the new baseline
+#   pytest benchmarks --benchmark-autosave              # pytest-benchmark history, compare later with:
+#   pytest benchmarks --benchmark-compare --benchmark-compare-fail=mean:20%
+#
+# The size of the chain is multiplied by the environment variable PACLI_BENCH_SCALE (default 1).
+# A benchmark fails if its mean time or its memory peak (measured with tracemalloc in an extra round)
+# exceeds the baseline of the same scale by more than the tolerance (--time-tolerance, --memory-tolerance).
+# Benchmarks without a baseline of the scale are skipped after running, so create one first on the machine
+# which runs the comparisons (baselines of other machines are not comparable).
+# pacli reads its config and creates the provider at import, so the node and a temporary config
+# directory (with an in-memory keyring) are set up when this file is loaded, before any pacli module.
+
+import os
+import json
+import tempfile
+import tracemalloc
+import configparser
+import pytest
+import keyring
+from keyring.backend import KeyringBackend
+
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode, start_server
+from pacli.default_conf import default_conf
+
+SCALE = float(os.environ.get("PACLI_BENCH_SCALE", 1))
+CHAIN_PARAMS = {"blocks" : int(1000 * SCALE),
+                "txes_per_block" : 10,
+                "wallet_addresses" : int(500 * SCALE),
+                "foreign_addresses" : int(2000 * SCALE),
+                "decks" : 10,
+                "cards_per_block" : 1,
+                "burns_per_block" : 0.2,
+                "seed" : 0}
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+class MemoryKeyring(KeyringBackend):
+    # keeps the pacli key out of the keyring of the user.
+
+    priority = 1
+
+    def __init__(self):
+        super().__init__()
+        self.passwords = {}
+
+    def get_password(self, service, username):
+        return self.passwords.get((service, username))
+
+    def set_password(self, service, username, password):
+        self.passwords[(service, username)] = password
+
+    def delete_password(self, service, username):
+        self.passwords.pop((service, username), None)
+
+
+def set_up_environment() -> tuple:
+
+    chain = SyntheticChain(**CHAIN_PARAMS)
+    server = start_server(FakeNode(chain))
+
+    config_home = tempfile.mkdtemp(prefix="pacli-bench-")
+    os.environ["XDG_CONFIG_HOME"] = config_home
+    os.makedirs(os.path.join(config_home, "pacli"))
+    config = configparser.ConfigParser()
+    config["settings"] = dict(default_conf, network=chain.network, provider="slm_rpcnode", rpcport=server.server_port)
+    with open(os.path.join(config_home, "pacli", "pacli.conf"), "w") as conf_file:
+        config.write(conf_file)
+    keyring.set_keyring(MemoryKeyring())
+    return chain, server
+
+
+CHAIN, SERVER = set_up_environment()
+
+
+def memory_peak(function, *args, **kwargs) -> int:
+    """Runs the function once and returns the peak of the memory allocated by Python, in bytes."""
+    tracemalloc.start()
+    try:
+        function(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+class Baseline:
+
+    def __init__(self, filename: str, update: bool=False, time_tolerance: float=0.3, memory_tolerance: float=0.2):
+
+        self.filename = filename
+        self.update = update
+        self.time_tolerance = time_tolerance
+        self.memory_tolerance = memory_tolerance
+        self.results = {}
+        try:
+            with open(filename, "r") as baseline_file:
+                self.data = json.load(baseline_file)
+        except FileNotFoundError:
+            self.data = {}
+
+    def check(self, name: str, mean: float, peak: int) -> None:
+        """Fails if the results are worse than the baseline. Benchmarks without baseline are skipped."""
+
+        self.results[name] = {"mean" : mean, "memory_peak" : peak}
+        stored = self.data.get(str(SCALE), {}).get(name)
+        if self.update:
+            return
+        if stored is None:
+            pytest.skip("No baseline for {} at scale {} in {}. Create it with --update-baseline.".format(name, SCALE, self.filename))
+        errors = []
+        if mean > stored["mean"] * (1 + self.time_tolerance):
+            errors.append("mean time {:.4f}s, baseline {:.4f}s".format(mean, stored["mean"]))
+        if peak > stored["memory_peak"] * (1 + self.memory_tolerance):
+            errors.append("memory peak {} bytes, baseline {} bytes".format(peak, stored["memory_peak"]))
+        if errors:
+            pytest.fail("Performance regression in {}: {}".format(name, ", ".join(errors)))
+
+    def save(self) -> None:
+        self.data.setdefault(str(SCALE), {}).update(self.results)
+        with open(self.filename, "w") as baseline_file:
+            json.dump(self.data, baseline_file, indent=2, sort_keys=True)
+
+
+class Bench:
+
+    def __init__(self, benchmark, baseline: Baseline, name: str):
+
+        self.benchmark = benchmark
+        self.baseline = baseline
+        self.name = name
+
+    def __call__(self, function, *args, rounds: int=3, setup=None, **kwargs):
+        """Benchmarks the function, then measures its memory peak and compares both with the baseline.
+           setup is called before every round, e.g. to clear caches."""
+
+        def prepared():
+            if setup is not None:
+                setup()
+            return args, kwargs
+
+        result = self.benchmark.pedantic(function, setup=prepared, rounds=rounds, iterations=1)
+        if setup is not None:
+            setup()
+        peak = memory_peak(function, *args, **kwargs)
+        self.benchmark.extra_info["memory_peak"] = peak
+        self.baseline.check(self.name, self.mean, peak)
+        return result
+
+    @property
+    def mean(self) -> float:
+        return self.benchmark.stats.stats.mean
+
+    def per_second(self, **counts) -> None:
+        """Adds throughput values (e.g. blocks=1000 -> blocks_per_second) to the benchmark results."""
+        for unit, count in counts.items():
+            self.benchmark.extra_info[unit + "_per_second"] = round(count / self.mean, 1)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--update-baseline", action="store_true", help="Store the results as the baseline of the current scale.")
+    parser.addoption("--time-tolerance", type=float, default=0.3, help="Allowed increase of the mean time, relative to the baseline.")
+    parser.addoption("--memory-tolerance", type=float, default=0.2, help="Allowed increase of the memory peak, relative to the baseline.")
+
+
+@pytest.fixture(scope="session")
+def baseline(request):
+    baseline = Baseline(BASELINE_FILE,
+                        update=request.config.getoption("--update-baseline"),
+                        time_tolerance=request.config.getoption("--time-tolerance"),
+                        memory_tolerance=request.config.getoption("--memory-tolerance"))
+    yield baseline
+    if baseline.update:
+        baseline.save()
+
+
+@pytest.fixture
+def bench(request, benchmark, baseline):
+    return Bench(benchmark, baseline, request.node.name)
+
+
+@pytest.fixture(scope="session")
+def chain():
+    return CHAIN
+
+
+@pytest.fixture(scope="session")
+def wallet_datadir(tmp_path_factory, chain):
+    """A data directory with a wallet.dat containing the raw wallet transactions."""
+    berkeleydb = pytest.importorskip("berkeleydb")
+    datadir = tmp_path_factory.mktemp("slimcoin")
+    os.makedirs(datadir / "testnet")
+    database = berkeleydb.db.DB()
+    database.open(str(datadir / "testnet" / "wallet.dat"), "main", berkeleydb.db.DB_BTREE, berkeleydb.db.DB_CREATE)
+    for txid in {e["txid"] for h, e in chain.wallet_entries}:
+        database.put(b"\x02tx" + bytes.fromhex(txid)[::-1], chain.txes[txid][1])
+    database.close()
+    return str(datadir)
@@ -0,0 +1,71 @@
+import random
+import pytest
+from array import array
+import pacli.blockexp.utils as bx
+import pacli.blockexp.blocklocator as loc
+from pacli.blockexp.prevouts import prevout_cache
+
+
+@pytest.fixture(scope="module")
+def address_heights(chain):
+    # block heights of the transactions of each wallet address, like the locator stores them.
+    heights = {}
+    for height, entry in chain.wallet_entries:
+        if height is not None and entry["address"] in chain.wallet_addresses:
+            heights.setdefault(entry["address"], set()).add(height)
+    return {a : sorted(h) for a, h in heights.items()}
+
+
+@pytest.fixture
+def stored_locator(tmp_path, chain, address_heights):
+    locator = loc.BlockLocator.from_db(str(tmp_path / "locator.db"), quiet=True)
+    for address, heights in address_heights.items():
+        locator.store_blockheights(address, heights, chain.tip(), lastblockhash=chain.blocks[-1][0])
+    locator.store(quiet=True)
+    return locator
+
+
+def test_show_txes_by_block(bench, chain):
+    addresses = chain.wallet_addresses[:50]
+    result = bench(bx.show_txes_by_block,
+                   sending_addresses=addresses,
+                   receiving_addresses=addresses,
+                   startblock=0,
+                   endblock=chain.tip(),
+                   quiet=True,
+                   setup=prevout_cache.outputs.clear)
+    assert result["txes"]
+    bench.per_second(blocks=chain.tip() + 1, tx=sum([len(b[2]) for b in chain.blocks]))
+
+
+def test_locator_store(bench, tmp_path, chain, address_heights):
+
+    def store():
+        locator = loc.BlockLocator.from_db(str(tmp_path / "locator.db"), quiet=True)
+        for address, heights in address_heights.items():
+            locator.store_blockheights(address, heights, chain.tip(), lastblockhash=chain.blocks[-1][0])
+        locator.store(quiet=True)
+        locator.db.db.close()
+
+    bench(store, setup=lambda: (tmp_path / "locator.db").unlink(missing_ok=True))
+    bench.per_second(addresses=len(address_heights))
+
+
+def test_locator_load(bench, stored_locator, address_heights):
+
+    def load():
+        locator = loc.BlockLocator.from_db(stored_locator.filename, quiet=True)
+        return locator.get_address_data(list(address_heights))
+
+    heights, lastblock = bench(load)
+    assert len(heights) > 0
+    bench.per_second(addresses=len(address_heights))
+
+
+def test_merge_heights(bench, chain):
+    rng = random.Random(0)
+    stored = array("I", sorted(rng.sample(range(chain.tip() * 100), 100000)))
+    new = sorted(rng.sample(range(chain.tip() * 100), 10000))
+    result = bench(loc.merge_heights, stored, new, rounds=10)
+    assert len(result) <= len(stored) + len(new)
+    bench.per_second(heights=len(stored) + len(new))
@@ -0,0 +1,30 @@
+import pacli.extended.queries as eq
+import pacli.extended.wallet_utils as ewu
+
+
+def test_get_labels_and_addresses(bench, chain):
+    result = bench(eq.get_labels_and_addresses, empty=True, balances=True)
+    assert len(result) >= len(chain.wallet_addresses)
+    bench.per_second(addresses=len(result))
+
+
+def test_get_address_transactions_wallet(bench, chain):
+    result = bench(eq.get_address_transactions, wallet=True, rounds=1)
+    assert result
+    bench.per_second(wallet_txes=len({e["txid"] for h, e in chain.wallet_entries}))
+
+
+def test_get_address_transactions_address(bench, chain):
+    # the wallet address with most transactions
+    counts = {}
+    for height, entry in chain.wallet_entries:
+        counts[entry["address"]] = counts.get(entry["address"], 0) + 1
+    address = max(chain.wallet_addresses, key=lambda a: counts.get(a, 0))
+    result = bench(eq.get_address_transactions, addr_string=address, rounds=1)
+    assert result
+
+
+def test_get_all_transactions(bench, chain, wallet_datadir):
+    result = bench(ewu.get_all_transactions, datadir=wallet_datadir, rounds=1)
+    assert result
+    bench.per_second(wallet_txes=len(result))
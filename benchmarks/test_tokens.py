@@ -0,0 +1,24 @@
+import pytest
+from decimal import Decimal
+import pypeerassets as pa
+import pacli.extended.token_queries as etq
+import pacli.dex.utils as dxu
+from pacli.provider import provider
+from pacli.config import Settings
+
+
+@pytest.fixture(scope="module")
+def decks():
+    return list(pa.find_all_valid_decks(provider, Settings.deck_version, Settings.production))
+
+
+def test_all_balances(bench, chain, decks):
+    assert len(decks) == len(chain.token_decks)
+    bench(etq.all_balances, wallet=True, decks=decks, quiet=True, rounds=1)
+    bench.per_second(decks=len(decks), addresses=len(chain.wallet_addresses))
+
+
+def test_select_utxos(bench, chain):
+    result = bench(dxu.select_utxos, Decimal("0.01"), quiet=True)
+    assert result
+    bench.per_second(utxos=len(result))
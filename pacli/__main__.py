@@ -1,39 +1,66 @@
+import sys
 import fire
-from pacli.keystore import init_keystore
-from pacli.coin import Coin
-from pacli.extended.classes import ExtConfig, ExtAddress, ExtDeck, ExtCard, ExtTransaction
-from pacli.at.classes import ATToken, PoBToken
-from pacli.dt.classes import PoDToken, Proposal, Donation
-from pacli.dex.classes import Swap
-from pacli.extended.checkpoints import Checkpoint
+from importlib import import_module
+from pacli.rpc.profiler import profiler
 
 # EXTENSION NOTE: pacli-extended overrides some vanilla methods.
 # To do that cleanly, the original classes have been outsourced to a 'classes' module.
 # 'classes' is imported by extended.classes module.
 # The extended classes have the ExtCLASS syntax.
 
-def main():
+# Command groups: name : (module, class, summary shown in the help).
+# Only the module of the called group is imported; the list of all groups is shown without importing any.
+COMMANDS = {
+    'config': ('pacli.extended.classes', 'ExtConfig', "Commands to manage configuration settings."),
+    'deck': ('pacli.extended.classes', 'ExtDeck', "Commands to manage token decks."),
+    'card': ('pacli.extended.classes', 'ExtCard', "Commands for card information and manipulation."),
+    'address': ('pacli.extended.classes', 'ExtAddress', "Commands managing the main personal address and other addresses."),
+    'transaction': ('pacli.extended.classes', 'ExtTransaction', "Commands for transaction information and creation."),
+    'coin': ('pacli.coin', 'Coin', "Commands to create coin transactions."),
+    'proposal' : ('pacli.dt.classes', 'Proposal', "Commands to manage, show and vote for proposals in dPoD tokens."),
+    'donation' : ('pacli.dt.classes', 'Donation', "Commands to manage donations in dPoD tokens."),
+    'token' : ('pacli.extended.token_class', 'Token', "Token commands manage the creation (spawning), issuance, transfer and information gathering about PeerAssets tokens."),
+    'attoken' : ('pacli.at.classes', 'ATToken', "Commands to deal with AT (address-tracking) tokens, which can be used for crowdfunding, trustless ICOs and similar purposes."),
+    'pobtoken' : ('pacli.at.classes', 'PoBToken', "Commands to deal with PoB (proof-of-burn) tokens, which reward burn transactions."),
+    'podtoken' : ('pacli.dt.classes', 'PoDToken', "General commands to manage dPoD (decentralized proof-of-donation) tokens."),
+    'swap' : ('pacli.dex.classes', 'Swap', "Commands allowing the decentralized exchange of tokens for coins."),
+    'checkpoint' : ('pacli.extended.checkpoints', 'Checkpoint', "Commands dealing with checkpoints (stored block hashes), which help to recognize chain reorganizations."),
+    'daemon' : ('pacli.daemon', 'Daemon', "Commands to run pacli as a resident process, which answers the commands of 'pacli-client' faster.")
+    }
+
+
+class CommandGroup:
+    # placeholder of a command group in the help output.
+
+    def __init__(self, summary: str):
+        self.__doc__ = summary
+
+    def __repr__(self):
+        return ""
+
+
+def load_command_group(name: str) -> object:
+    module, classname, summary = COMMANDS[name]
+    return getattr(import_module(module), classname)()
 
-    init_keystore()
-
-    from pacli.extended.token_class import Token
-
-    fire.Fire({
-        'config': ExtConfig(),
-        'deck': ExtDeck(),
-        'card': ExtCard(),
-        'address': ExtAddress(),
-        'transaction': ExtTransaction(),
-        'coin': Coin(),
-        'proposal' : Proposal(),
-        'donation' : Donation(),
-        'token' : Token(),
-        'attoken' : ATToken(),
-        'pobtoken' : PoBToken(),
-        'podtoken' : PoDToken(),
-        'swap' : Swap(),
-        'checkpoint' : Checkpoint()
-        })
+
+def run(args: list, name: str=None) -> None:
+    """Runs the command given by the arguments (without the program name). Used by main and the daemon."""
+
+    # global flags, the profiling is started in extended.handling.run_command
+    args = profiler.parse_args(args)
+
+    group = next((arg for arg in args if not arg.startswith("-")), None)
+    if group in COMMANDS:
+        components = {group : load_command_group(group)}
+    else:
+        components = {group_name : CommandGroup(values[2]) for group_name, values in COMMANDS.items()}
+
+    fire.Fire(components, command=args, name=name)
+
+
+def main():
+    run(sys.argv[1:])
 
 
 if __name__ == '__main__':
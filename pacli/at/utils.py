@@ -21,6 +21,8 @@ import pacli.extended.keystore as ke
 import pacli.blockexp.utils as bu
 from pacli.provider import provider
 from pacli.config import Settings
+from pacli.rpc.aio import async_provider
+import pacli.rpc.aio as aio
 
 def create_simple_transaction(amount: Decimal, dest_address: str, tx_fee: Decimal=None, change_address: str=None, debug: bool=False):
     """Creates a simple coin transaction from a pre-selected address."""
@@ -42,19 +44,19 @@ def create_simple_transaction(amount: Decimal, dest_address: str, tx_fee: Decima
             raise eh.PacliInputDataError("Invalid address string. Please provide a correct address or label.")
 
 
-def show_wallet_dtxes(deckid: str=None,
-                      tracked_address: str=None,
-                      sender: str=None,
-                      unclaimed: bool=False,
-                      no_labels: bool=False,
-                      advanced: bool=False,
-                      wallet: bool=False,
-                      keyring: bool=False,
-                      quiet: bool=False,
-                      # include_change_addresses: bool=False,
-                      access_wallet: bool=False,
-                      debug: bool=False) -> list:
-    """Shows burn/gateway transactions."""
+async def show_wallet_dtxes_async(deckid: str=None,
+                                  tracked_address: str=None,
+                                  sender: str=None,
+                                  unclaimed: bool=False,
+                                  no_labels: bool=False,
+                                  advanced: bool=False,
+                                  wallet: bool=False,
+                                  keyring: bool=False,
+                                  quiet: bool=False,
+                                  # include_change_addresses: bool=False,
+                                  access_wallet: bool=False,
+                                  debug: bool=False) -> list:
+    """Async variant of show_wallet_dtxes: the transactions are checked concurrently."""
 
     # MODIF: behaviour is now that if --wallet is chosen, address labels are used when possible.
     # MODIF: if neither sender not wallet is chosen then the P2TH accounts are included (leading to all initialized txes been shown).
@@ -79,7 +81,7 @@ def show_wallet_dtxes(deckid: str=None,
             excluded_accounts, excluded_addresses = [], []
         if debug:
             print("Retrieving labels and wallet addresses (except change) ...")
-        addresses = eq.get_labels_and_addresses(empty=True, keyring=keyring, exclude=excluded_addresses, excluded_accounts=excluded_accounts, access_wallet=access_wallet)
+        addresses = await eq.get_labels_and_addresses_async(empty=True, keyring=keyring, exclude=excluded_addresses, excluded_accounts=excluded_accounts, access_wallet=access_wallet)
         if wallet:
             allowed_addresses = set([a["address"] for a in addresses])
             if debug:
@@ -147,19 +149,24 @@ def show_wallet_dtxes(deckid: str=None,
     if wallet or sender: # wallet mode only needs txes where a wallet address was the sender.
         excluded.append(["receive"])
     if use_db:
-        txids = (k for (k, v) in db_structs.items())
+        txids = list(db_structs.keys())
     else:
-        txids = et.extract_txids_from_utxodict(raw_txes, exclude_cats=excluded, required_address=tracked_address, debug=debug)
+        txids = list(et.extract_txids_from_utxodict(raw_txes, exclude_cats=excluded, required_address=tracked_address, debug=debug))
+
+    def get_full_tx(txid):
+        if deck is not None:
+            return check_donation_tx_validity(txid, tracked_address, startblock=deck.startblock, endblock=deck.endblock, expected_sender=sender, debug=debug)
+        else:
+            return provider.getrawtransaction(txid, 1)
 
     if not quiet: # only needed for message below about number of total transactions
         alltxes = 0
 
-    for txid in txids:
+    # the transactions are requested and checked concurrently, but processed in the original order.
+    txid_list = iter(txids)
+    async for full_tx in async_provider.imap(get_full_tx, [(txid,) for txid in txids]):
+        txid = next(txid_list)
         try:
-            if deck is not None:
-                full_tx = check_donation_tx_validity(txid, tracked_address, startblock=deck.startblock, endblock=deck.endblock, expected_sender=sender, debug=debug)
-            else:
-                full_tx = provider.getrawtransaction(txid, 1)
             assert full_tx is not None and full_tx.get("txid") == txid # second condition prevents error message JSONs to be counted.
 
             if unclaimed:
@@ -235,6 +242,23 @@ def show_wallet_dtxes(deckid: str=None,
 
     return txes_to_address
 
+
+def show_wallet_dtxes(deckid: str=None,
+                      tracked_address: str=None,
+                      sender: str=None,
+                      unclaimed: bool=False,
+                      no_labels: bool=False,
+                      advanced: bool=False,
+                      wallet: bool=False,
+                      keyring: bool=False,
+                      quiet: bool=False,
+                      # include_change_addresses: bool=False,
+                      access_wallet: bool=False,
+                      debug: bool=False) -> list:
+    """Shows burn/gateway transactions."""
+
+    return aio.run(show_wallet_dtxes_async(**locals()))
+
 def check_donation_tx_validity(txid: str, tracked_address: str, startblock: int=None, endblock: int=None, expected_sender: str=None, debug: bool=False):
     # checks the validity of a donation/burn transaction
     try:
@@ -0,0 +1,276 @@
+# Raw block file reader
+# Reads blocks directly from the blk*.dat files of the Slimcoin client via memory mapping,
+# and decodes them into the same dicts getblock and getrawtransaction (verbose) return.
+# Block files contain blocks in the order they were received, including orphans, and block hashes can't be
+# calculated without the Dcrypt algorithm. Blocks are thus located by the hash of their previous block,
+# which is known from the header index. Ambiguous blocks (more than one child of a block) are not read from the files.
+# The merkle root of each block is checked against the decoded transactions.
+# Serialization (PPCoin-based, with Slimcoin Proof-of-Burn fields):
+# - header: version, previous block hash, merkle root, time, bits, nonce
+# - PoB fields, serialized in every block (zeroed if the flag isn't set): fProofOfBurn flag, burn block hash,
+#   burn hash, burn block height, burn tx, burn output, effective burn coins, burn bits
+# - transactions (with nTime after the version), block signature
+
+import os
+import mmap
+import glob
+import struct
+import hashlib
+import datetime
+
+COIN = 1000000
+B58CHARS = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+
+class BlockParseError(Exception):
+    pass
+
+
+class BlockFileReader:
+
+    def __init__(self, datadir: str, p2pkh_prefix: bytes, p2sh_prefix: bytes, debug: bool=False):
+
+        self.files = sorted(glob.glob(os.path.join(datadir, "blk[0-9]*.dat")))
+        if not self.files:
+            raise FileNotFoundError("No block files found in {}.".format(datadir))
+        self.p2pkh_prefix = p2pkh_prefix
+        self.p2sh_prefix = p2sh_prefix
+        self.maps = []
+        self.magic = None
+        self.children = {} # previous block hash (bytes) : list of (file number, offset, size)
+        for filename in self.files:
+            with open(filename, "rb") as blockfile:
+                self.maps.append(mmap.mmap(blockfile.fileno(), 0, access=mmap.ACCESS_READ))
+        for fileno in range(len(self.maps)):
+            self.index_file(fileno)
+        if debug:
+            print("Indexed {} blocks in {} block files.".format(sum([len(c) for c in self.children.values()]), len(self.files)))
+
+    def index_file(self, fileno: int) -> None:
+        # walks the records (magic bytes, size, block) reading only the previous block hash.
+        data = self.maps[fileno]
+        pos = 0
+        while pos + 8 + 80 <= len(data):
+            magic = data[pos:pos + 4]
+            if self.magic is None:
+                self.magic = magic
+            if magic != self.magic: # end of the used part of the file
+                break
+            size = struct.unpack_from("<I", data, pos + 4)[0]
+            prevhash = data[pos + 12:pos + 44]
+            self.children.setdefault(prevhash, []).append((fileno, pos + 8, size))
+            pos += 8 + size
+
+    def find_block(self, prevhash: str) -> tuple:
+        """Returns the location of the only block following the given block hash, or None."""
+
+        candidates = self.children.get(bytes.fromhex(prevhash)[::-1], [])
+        # the same block can be stored more than once.
+        headers = set([self.maps[f][o:o + 80] for f, o, s in candidates])
+        if len(headers) != 1:
+            return None
+        return candidates[0]
+
+    def read_block(self, location: tuple) -> dict:
+        """Returns the decoded block: header fields, PoB fields and transactions."""
+
+        fileno, offset, size = location
+        return parse_block(self.maps[fileno][offset:offset + size], self.p2pkh_prefix, self.p2sh_prefix)
+
+    def close(self) -> None:
+        for data in self.maps:
+            data.close()
+
+
+# Serialization
+
+def sha256d(data: bytes) -> bytes:
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()
+
+def hash_160(data: bytes) -> bytes:
+    md = hashlib.new("ripemd160")
+    md.update(hashlib.sha256(data).digest())
+    return md.digest()
+
+def b58check(payload: bytes) -> str:
+
+    data = payload + sha256d(payload)[:4]
+    value = int.from_bytes(data, "big")
+    result = ""
+    while value > 0:
+        value, mod = divmod(value, 58)
+        result = B58CHARS[mod] + result
+    padding = len(data) - len(data.lstrip(b"\0"))
+    return B58CHARS[0] * padding + result
+
+def b58decode_check(address: str) -> bytes:
+    """Returns the payload (prefix and hash) of a base58check address, or None if the checksum is invalid."""
+
+    value = 0
+    for char in address:
+        if char not in B58CHARS:
+            return None
+        value = value * 58 + B58CHARS.index(char)
+    data = value.to_bytes((value.bit_length() + 7) // 8, "big")
+    data = bytes(len(address) - len(address.lstrip(B58CHARS[0]))) + data
+    if len(data) < 5 or sha256d(data[:-4])[:4] != data[-4:]:
+        return None
+    return data[:-4]
+
+def read_varint(data: bytes, pos: int) -> tuple:
+
+    first = data[pos]
+    if first < 0xfd:
+        return first, pos + 1
+    fmt, size = {0xfd : ("<H", 2), 0xfe : ("<I", 4), 0xff : ("<Q", 8)}[first]
+    return struct.unpack_from(fmt, data, pos + 1)[0], pos + 1 + size
+
+def read_bytes(data: bytes, pos: int) -> tuple:
+    length, pos = read_varint(data, pos)
+    if pos + length > len(data):
+        raise BlockParseError("Data exceeds block size.")
+    return data[pos:pos + length], pos + length
+
+def merkle_root(txids: list) -> bytes:
+    # txids in internal byte order
+    level = txids
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level = level + [level[-1]]
+        level = [sha256d(level[i] + level[i + 1]) for i in range(0, len(level), 2)]
+    return level[0]
+
+def script_addresses(script: bytes, p2pkh_prefix: bytes, p2sh_prefix: bytes) -> tuple:
+    """Returns the script type and the addresses of an output script, like the scriptPubKey dict of the client."""
+
+    if len(script) == 25 and script[:3] == b"\x76\xa9\x14" and script[23:] == b"\x88\xac":
+        return "pubkeyhash", [b58check(p2pkh_prefix + script[3:23])]
+    if len(script) == 23 and script[:2] == b"\xa9\x14" and script[22] == 0x87:
+        return "scripthash", [b58check(p2sh_prefix + script[2:22])]
+    if len(script) in (35, 67) and script[0] == len(script) - 2 and script[-1] == 0xac:
+        return "pubkey", [b58check(p2pkh_prefix + hash_160(script[1:-1]))]
+    if script[:1] == b"\x6a":
+        return "nulldata", []
+    if len(script) > 3 and script[-1] == 0xae and 0x51 <= script[0] <= 0x60 and 0x51 <= script[-2] <= 0x60:
+        addresses, pos = [], 1
+        while pos < len(script) - 2:
+            length = script[pos]
+            if length not in (33, 65):
+                return "nonstandard", []
+            addresses.append(b58check(p2pkh_prefix + hash_160(script[pos + 1:pos + 1 + length])))
+            pos += 1 + length
+        return "multisig", addresses
+    return "nonstandard", []
+
+def parse_tx(data: bytes, pos: int, p2pkh_prefix: bytes, p2sh_prefix: bytes) -> tuple:
+    """Decodes a transaction starting at pos. Returns the transaction dict and the end position."""
+
+    start = pos
+    version, txtime = struct.unpack_from("<iI", data, pos)
+    pos += 8
+    vin_count, pos = read_varint(data, pos)
+    vin = []
+    for i in range(vin_count):
+        prevhash, prevout = data[pos:pos + 32], struct.unpack_from("<I", data, pos + 32)[0]
+        script, pos = read_bytes(data, pos + 36)
+        sequence = struct.unpack_from("<I", data, pos)[0]
+        pos += 4
+        if prevhash == bytes(32) and prevout == 0xffffffff:
+            vin.append({"coinbase" : script.hex(), "sequence" : sequence})
+        else:
+            vin.append({"txid" : prevhash[::-1].hex(), "vout" : prevout, "scriptSig" : {"hex" : script.hex()}, "sequence" : sequence})
+    vout_count, pos = read_varint(data, pos)
+    vout = []
+    for n in range(vout_count):
+        value = struct.unpack_from("<q", data, pos)[0]
+        script, pos = read_bytes(data, pos + 8)
+        script_type, addresses = script_addresses(script, p2pkh_prefix, p2sh_prefix)
+        script_pubkey = {"hex" : script.hex(), "type" : script_type}
+        if addresses:
+            script_pubkey.update({"reqSigs" : 1 if script_type != "multisig" else script[0] - 0x50, "addresses" : addresses})
+        vout.append({"value" : round(value / COIN, 6), "n" : n, "scriptPubKey" : script_pubkey})
+    locktime = struct.unpack_from("<I", data, pos)[0]
+    pos += 4
+    raw = bytes(data[start:pos])
+    txid = sha256d(raw)[::-1].hex()
+    tx = {"txid" : txid, "version" : version, "time" : txtime, "locktime" : locktime, "vin" : vin, "vout" : vout, "hex" : raw.hex()}
+    return tx, pos
+
+def is_coinstake(tx: dict) -> bool:
+    return (len(tx["vin"]) > 0 and "coinbase" not in tx["vin"][0] and len(tx["vout"]) >= 2
+            and tx["vout"][0]["value"] == 0 and tx["vout"][0]["scriptPubKey"]["hex"] == "")
+
+def parse_block(data: bytes, p2pkh_prefix: bytes, p2sh_prefix: bytes) -> dict:
+
+    try:
+        version, prevhash, merkle, blocktime, bits, nonce = struct.unpack_from("<i32s32sIII", data, 0)
+        pos = 80
+        block = {"version" : version,
+                 "previousblockhash" : prevhash[::-1].hex(),
+                 "merkleroot" : merkle[::-1].hex(),
+                 "time" : datetime.datetime.fromtimestamp(blocktime, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
+                 "bits" : "{:08x}".format(bits),
+                 "nonce" : nonce}
+        proof_of_burn, burnblockhash, burnhash, burnheight, burntx, burnout, effective_burn_coins, burn_bits = struct.unpack_from("<?32s32siiiqI", data, pos)
+        pos += struct.calcsize("<?32s32siiiqI")
+        if proof_of_burn:
+            block.update({"burnblockhash" : burnblockhash[::-1].hex(), "burnhash" : burnhash[::-1].hex(),
+                          "burnblockheight" : burnheight, "burnctx" : burntx, "burnctxout" : burnout})
+        block.update({"nEffectiveBurnCoins" : round(effective_burn_coins / COIN, 6), "nBurnBits" : "{:08x}".format(burn_bits)})
+
+        tx_count, pos = read_varint(data, pos)
+        txes = []
+        for i in range(tx_count):
+            tx, pos = parse_tx(data, pos, p2pkh_prefix, p2sh_prefix)
+            txes.append(tx)
+        signature, pos = read_bytes(data, pos)
+    except (struct.error, IndexError, KeyError) as e:
+        raise BlockParseError("Block could not be decoded: {}".format(e))
+
+    if not txes or merkle_root([bytes.fromhex(tx["txid"])[::-1] for tx in txes]) != merkle:
+        raise BlockParseError("Merkle root does not match the decoded transactions.")
+
+    if proof_of_burn:
+        flags = "proof-of-burn"
+    elif len(txes) > 1 and is_coinstake(txes[1]):
+        flags = "proof-of-stake"
+    else:
+        flags = "proof-of-work"
+    block.update({"flags" : flags, "tx" : [tx["txid"] for tx in txes], "txes" : txes, "signature" : signature.hex()})
+    return block
+
+
+# Serialization of blocks, used to create block files (e.g. test fixtures)
+
+def write_varint(value: int) -> bytes:
+    if value < 0xfd:
+        return bytes([value])
+    elif value <= 0xffff:
+        return b"\xfd" + struct.pack("<H", value)
+    elif value <= 0xffffffff:
+        return b"\xfe" + struct.pack("<I", value)
+    return b"\xff" + struct.pack("<Q", value)
+
+def serialize_tx(version: int, txtime: int, vin: list, vout: list, locktime: int=0) -> bytes:
+    """vin: list of (txid, output, script) tuples, txid None for coinbase inputs. vout: list of (amount in satoshis, script)."""
+
+    data = struct.pack("<iI", version, txtime) + write_varint(len(vin))
+    for txid, output, script in vin:
+        prevhash = bytes(32) if txid is None else bytes.fromhex(txid)[::-1]
+        data += prevhash + struct.pack("<I", 0xffffffff if txid is None else output) + write_varint(len(script)) + script + struct.pack("<I", 0xffffffff)
+    data += write_varint(len(vout))
+    for value, script in vout:
+        data += struct.pack("<q", value) + write_varint(len(script)) + script
+    return data + struct.pack("<I", locktime)
+
+def serialize_block(prevhash: str, blocktime: int, txes: list, burn: tuple=None, bits: int=0x1e0fffff, nonce: int=0) -> bytes:
+    """txes: serialized transactions. burn: (burn block hash, burn hash, height, tx, output) for PoB blocks."""
+
+    merkle = merkle_root([sha256d(tx) for tx in txes])
+    data = struct.pack("<i32s32sIII", 1, bytes.fromhex(prevhash)[::-1], merkle, blocktime, bits, nonce)
+    if burn is not None:
+        data += struct.pack("<?32s32siiiqI", True, bytes.fromhex(burn[0])[::-1], bytes.fromhex(burn[1])[::-1], burn[2], burn[3], burn[4], 0, 0)
+    else:
+        data += struct.pack("<?32s32siiiqI", False, bytes(32), bytes(32), 0, 0, 0, 0, 0)
+    data += write_varint(len(txes)) + b"".join(txes)
+    return data + write_varint(0) # empty block signature
@@ -26,10 +26,12 @@ def show_txes(receiving_address: str=None,
               burntoken: bool=False,
               use_locator: bool=True,
               wallet_mode: str=None,
+              stream: bool=False,
               quiet: bool=False,
               debug: bool=False) -> None:
     '''Show all transactions to a tracked address between two block heights (very slow!).
-       start and end can be blockheights or dates in the format YYYY-MM-DD.'''
+       start and end can be blockheights or dates in the format YYYY-MM-DD.
+       With stream, the transactions are printed as JSON lines (NDJSON) while the blocks are processed, and nothing is returned.'''
     # NOTE: burntoken option is needed if no deckid is given.
 
     if burntoken:
@@ -52,7 +54,7 @@ def show_txes(receiving_address: str=None,
 
     try:
         last_block = provider.getblockcount()
-        last_blocktime = provider.getblock(provider.getblockhash(last_block))["time"]
+        last_blocktime = bu.height_to_time(last_block)
         last_block_date = datetime.date.fromisoformat(last_blocktime.split(" ")[0])
         startdate, enddate = None, None
         start = 0 if not start else start
@@ -83,6 +85,8 @@ def show_txes(receiving_address: str=None,
 
         if (startdate is not None and startdate > last_block_date) or (enddate is not None and enddate > last_block_date):
             raise eh.PacliInputDataError("Start or end date is in the future.")
+        if debug and (startdate is not None or enddate is not None):
+            print("Dates resolved to block heights: start {} (date: {}), end {} (date: {}).".format(startblock, startdate, endblock, enddate))
 
         if endblock < startblock:
             if endblock + 1 == startblock: # this can happen if there are no blocks during at least one day
@@ -156,8 +160,14 @@ def show_txes(receiving_address: str=None,
     if not quiet:
         print("Retrieving transactions from block:", startblock, "to block:", endblock)
 
-    blockdata = bu.show_txes_by_block(receiving_addresses=receiving_addresses, sending_addresses=sending_addresses, advanced=advanced, startblock=startblock, endblock=endblock, coinbase=coinbase, quiet=quiet, debug=debug, use_locator=use_locator, locator=locator, store_locator=use_locator, require_sender_and_receiver=require_sender_and_receiver)
-    txes = blockdata["txes"]
+    scan_params = {"receiving_addresses" : receiving_addresses, "sending_addresses" : sending_addresses, "advanced" : advanced, "startblock" : startblock, "endblock" : endblock, "coinbase" : coinbase, "quiet" : quiet, "debug" : debug, "use_locator" : use_locator, "locator" : locator, "store_locator" : use_locator, "require_sender_and_receiver" : require_sender_and_receiver}
+    if stream:
+        blockdata, txes = {}, None
+        for tx in bu.iter_txes_by_block(result=blockdata, **scan_params):
+            print(json.dumps(tx, default=str), flush=True)
+    else:
+        blockdata = bu.show_txes_by_block(**scan_params)
+        txes = blockdata["txes"]
 
     if debug:
         print("Block data:", blockdata)
@@ -187,7 +197,7 @@ def store_deck_blockheights(decks: list, chain: bool=False, quiet: bool=False, d
         deck_addresses = etq.get_deck_related_addresses(deck, debug=debug) # TODO: consider advanced mode to simplify the P2TH selection
         addresses += deck_addresses
         try:
-            spawn_blockheight = provider.getblock(deck_tx["blockhash"])["height"]
+            spawn_blockheight = bu.blockhash_to_height(deck_tx["blockhash"])
         except KeyError:
             continue
 
@@ -365,7 +375,7 @@ def store_address_blockheights(addresses: list, start_block: int=0, blocks: int=
 def get_tx_blockheight(txid: str): # TODO look if this is a duplicate.
     tx = provider.getrawtransaction(txid, 1)
     if "blockhash" in tx.keys():
-        return provider.getblock(tx["blockhash"])["height"]
+        return bu.blockhash_to_height(tx["blockhash"])
     else:
         return None
 
@@ -524,7 +534,7 @@ def show_locators(value: str=None, quiet: bool=False, token_mode: bool=False, de
             ei.print_red("NOTE: At least one address was never cached. Check addresses individually for details.")
             ei.print_red("If you cache this token, the caching process could start from the genesis block, the first accepted block for gateway transactions (AT tokens) or the deck spawn block (other tokens).")
         else:
-            print("This address or token (deck) was never cached. No entry in blocklocator.json.")
+            print("This address or token (deck) was never cached. No entry in the block locator.")
             return
 
     commonly = "commonly " if token_mode else ""
@@ -539,7 +549,7 @@ def show_locators(value: str=None, quiet: bool=False, token_mode: bool=False, de
     for a in addresses:
         if a in laddr:
             addr_result = {"address" : a,
-                           "blockheights" : laddr[a].heights,
+                           "blockheights" : list(laddr[a].heights),
                            "lastblockhash" : laddr[a].lastblockhash,
                            "lastblockheight" : laddr[a].lastblockheight,
                            "startheight" : laddr[a].startheight,
@@ -0,0 +1,289 @@
+# Block fetcher
+# Delivers blocks and their decoded transactions to the block explorer, in the order of the block heights.
+# With a batch size above 1, the blocks of a whole batch of heights are retrieved with JSON-RPC batch requests:
+# first the block hashes, then the blocks, then their transactions and finally the transactions spent by their inputs.
+# With batch size 0 or 1 every call is sent separately.
+# The ParallelBlockFetcher retrieves chunks of block heights in a pool of workers ahead of the block explorer,
+# and merges them back in height order. Processing of the blocks (address matching, locators) is unchanged.
+# The RawBlockFetcher reads blocks below a safety depth directly from the block files of the client.
+
+import threading
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import pacli.blockexp.utils as bu
+from pacli.rpc.batch import batch_query
+from pacli.blockexp.prevouts import prevout_cache
+from pacli.blockexp.headerindex import header_index
+from pacli.blockexp.blkreader import BlockFileReader, BlockParseError
+from pacli.rpc.cache import CachingProvider
+from pacli.provider import provider
+from pacli.config import Settings
+
+
+class BlockFetcher:
+
+    def __init__(self, blockheights: list, batch_size: int=None, debug: bool=False):
+
+        self.blockheights = blockheights # ascending block heights which will be requested
+        self.batch_size = Settings.rpc_batch_size if batch_size is None else batch_size
+        self.position = 0
+        self.buffer = {}
+        self.debug = debug
+
+    def get(self, height: int) -> dict:
+        """Returns a dict with the blockhash, the block and the transactions of a block height.
+           Transactions are (txid, txjson, tx_struct) tuples. tx_struct is None if the transaction could not be processed.
+           After the tip of the chain, the block is an empty dict."""
+
+        if height not in self.buffer:
+            self.buffer.clear()
+            if self.batch_size > 1:
+                self.fetch_batch(height)
+            else:
+                self.buffer.update({height : self.fetch_block(height)})
+        return self.buffer.pop(height)
+
+    def next_heights(self, height: int, size: int=None) -> list:
+        # heights of the next batch, starting with the requested one.
+        size = self.batch_size if size is None else size
+        # the heights are ascending (a list or a range), so the position is found by bisection.
+        position = bisect_left(self.blockheights, height, self.position)
+        if position >= len(self.blockheights) or self.blockheights[position] != height:
+            return [height]
+        self.position = position
+        heights = list(self.blockheights[self.position:self.position + size])
+        self.position += len(heights)
+        return heights
+
+    def fetch_block(self, height: int) -> dict:
+
+        blockhash = provider.getblockhash(height)
+        if type(blockhash) != str: # after the tip, like in fetch_batch
+            return {"blockhash" : None, "block" : {}, "txes" : [], "errors" : {}}
+        block = provider.getblock(blockhash)
+        txes, errors = [], {}
+        for txid in block.get("tx", []):
+            try:
+                txjson = provider.getrawtransaction(txid, 1)
+                tx_struct = bu.get_tx_structure(tx=txjson, blockheight=height)
+            except Exception as e:
+                txjson, tx_struct = None, None
+                errors.update({txid : e})
+            txes.append((txid, txjson, tx_struct))
+
+        return {"blockhash" : blockhash, "block" : block, "txes" : txes, "errors" : errors}
+
+    def fetch_batch(self, height: int) -> None:
+
+        heights = self.next_heights(height)
+        if self.debug:
+            print("Fetching blocks {} to {} in batches ...".format(heights[0], heights[-1]))
+
+        blockhashes = batch_query("getblockhash", [[h] for h in heights], batch_size=self.batch_size, debug=self.debug)
+        # heights after the tip return an error instead of a hash
+        valid = [(h, b) for h, b in zip(heights, blockhashes) if type(b) == str]
+        blocks = batch_query("getblock", [[b] for h, b in valid], batch_size=self.batch_size, debug=self.debug)
+
+        txids = [t for block in blocks for t in block.get("tx", [])]
+        txjsons = batch_query("getrawtransaction", [[t, 1] for t in txids], batch_size=self.batch_size, debug=self.debug)
+        self.decode_blocks(valid, blocks, dict(zip(txids, txjsons)))
+
+        for h in heights:
+            if h not in self.buffer:
+                self.buffer.update({h : {"blockhash" : None, "block" : {}, "txes" : [], "errors" : {}}})
+
+    def decode_blocks(self, valid: list, blocks: list, txjsons: dict) -> None:
+        # valid: (height, blockhash) tuples of the blocks, txjsons: all transactions of the blocks.
+        prevtxes = {t : tx for t, tx in txjsons.items() if type(tx) == dict and "vin" in tx}
+
+        # transactions spent in the inputs, if they are neither part of the batch nor in the prevout cache
+        spent_txids = set([i["txid"] for tx in prevtxes.values() for i in tx["vin"] if "txid" in i and not prevout_cache.contains(i["txid"], i["vout"])])
+        missing = [t for t in spent_txids if t not in prevtxes]
+        prevtxes.update(dict(zip(missing, batch_query("getrawtransaction", [[t, 1] for t in missing], batch_size=self.batch_size, debug=self.debug))))
+
+        for (h, blockhash), block in zip(valid, blocks):
+            txes, errors = [], {}
+            for txid in block.get("tx", []):
+                txjson = txjsons[txid]
+                try:
+                    tx_struct = bu.get_tx_structure(tx=txjson, blockheight=h, prevtxes=prevtxes)
+                except Exception as e:
+                    tx_struct = None
+                    errors.update({txid : e})
+                txes.append((txid, txjson, tx_struct))
+            self.buffer.update({h : {"blockhash" : blockhash, "block" : block, "txes" : txes, "errors" : errors}})
+
+    def close(self) -> None:
+        pass
+
+
+class RawBlockFetcher(BlockFetcher):
+
+    def __init__(self, blockheights: list, reader: BlockFileReader, tip: int, safe_height: int, batch_size: int=None, debug: bool=False):
+
+        super().__init__(blockheights, batch_size=batch_size, debug=debug)
+        self.reader = reader
+        self.tip = tip
+        self.safe_height = safe_height # blocks above are retrieved via RPC
+        self.chunk_size = max(self.batch_size, 100)
+
+    def get(self, height: int) -> dict:
+
+        if height > self.safe_height:
+            return super().get(height)
+        if height not in self.buffer:
+            self.buffer.clear()
+            self.fetch_raw(height)
+        return self.buffer.pop(height)
+
+    def fetch_raw(self, height: int) -> None:
+
+        heights = self.next_heights(height, size=self.chunk_size)
+        unsafe = [h for h in heights if h > self.safe_height]
+        if unsafe: # these heights will be retrieved in the next RPC batch
+            heights = heights[:-len(unsafe)]
+            self.position -= len(unsafe)
+        if self.debug:
+            print("Reading blocks {} to {} from block files ...".format(heights[0], heights[-1]))
+
+        # the block hashes are needed to locate the blocks (by their previous block) and for the transaction data.
+        hashes = {}
+        for h in set([h - 1 for h in heights if h > 0] + heights):
+            entry = header_index.get(height=h)
+            if entry is not None:
+                hashes.update({h : entry[1]})
+        missing = [h for h in set([h - 1 for h in heights if h > 0] + heights) if h not in hashes]
+        hashes.update(dict(zip(missing, batch_query("getblockhash", [[h] for h in missing], batch_size=self.batch_size, debug=self.debug))))
+
+        valid, blocks, txjsons = [], [], {}
+        for h in heights:
+            location = self.reader.find_block(hashes[h - 1]) if h > 0 and type(hashes.get(h - 1)) == str else None
+            try:
+                if location is None or type(hashes.get(h)) != str:
+                    raise BlockParseError("Block not found or ambiguous in the block files.")
+                block = self.reader.read_block(location)
+            except BlockParseError as e:
+                if self.debug:
+                    print("Block {} retrieved via RPC: {}".format(h, e))
+                self.buffer.update({h : self.fetch_block(h)})
+                continue
+            confirmations = self.tip - h + 1
+            for tx in block.pop("txes"):
+                tx.update({"blockhash" : hashes[h], "confirmations" : confirmations, "blocktime" : tx["time"]})
+                txjsons.update({tx["txid"] : tx})
+            block.update({"hash" : hashes[h], "height" : h, "confirmations" : confirmations})
+            valid.append((h, hashes[h]))
+            blocks.append(block)
+
+        self.decode_blocks(valid, blocks, txjsons)
+
+    def close(self) -> None:
+        self.reader.close()
+
+
+class ParallelBlockFetcher(BlockFetcher):
+
+    def __init__(self, blockheights: list, batch_size: int=None, workers: int=2, executor: str="thread", debug: bool=False):
+
+        super().__init__(blockheights, batch_size=batch_size, debug=debug)
+        self.workers = workers
+        self.chunk_size = max(self.batch_size, 1)
+        self.pending = deque() # chunks in progress, in height order
+        if executor == "process":
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=init_process_worker)
+        else:
+            self.pool = ThreadPoolExecutor(max_workers=workers)
+
+    def submit_chunks(self) -> None:
+        # keeps all workers busy, plus one chunk per worker waiting.
+        while len(self.pending) < self.workers * 2 and self.position < len(self.blockheights):
+            heights = list(self.blockheights[self.position:self.position + self.chunk_size])
+            self.position += len(heights)
+            self.pending.append(self.pool.submit(fetch_chunk, heights, self.batch_size, self.debug))
+
+    def get(self, height: int) -> dict:
+
+        while height not in self.buffer:
+            self.submit_chunks()
+            if not self.pending:
+                # height outside of the original height list
+                self.buffer.update(fetch_chunk([height], self.batch_size, self.debug))
+                break
+            self.buffer.update(self.pending.popleft().result())
+        return self.buffer.pop(height)
+
+    def close(self) -> None:
+        # pending chunks are not needed anymore if the scan was interrupted or the tip was reached.
+        for future in self.pending:
+            future.cancel()
+        self.pool.shutdown(wait=False)
+
+
+def fetch_chunk(heights: list, batch_size: int, debug: bool=False) -> dict:
+    """Retrieves a chunk of block heights. Runs in the workers of the ParallelBlockFetcher."""
+    fetcher = BlockFetcher(heights, batch_size=batch_size, debug=debug)
+    return {h : fetcher.get(h) for h in heights}
+
+
+def init_process_worker() -> None:
+    # forked worker processes must not share the open connections of the main process.
+    # The provider is only accessed if it was already created, and the SQLite connections and locks
+    # of the caches are replaced (another thread could have held a lock when the process was forked).
+    node = vars(provider).get("_provider")
+    session = getattr(node, "session", None) if node is not None else None
+    if session is not None:
+        session.close()
+    caches = [header_index, prevout_cache] + ([node] if isinstance(node, CachingProvider) else [])
+    for cache in caches:
+        cache.db, cache.lock = None, threading.Lock()
+    # the new outputs are written by the main process.
+    prevout_cache.unsaved = []
+
+
+def get_raw_block_fetcher(blockheights: list, batch_size: int=None, debug: bool=False) -> RawBlockFetcher:
+    """Returns a RawBlockFetcher if the block files can be used for the first block height, otherwise None."""
+    from pacli.extended.wallet_utils import get_addrtype, determine_datadir
+    import pacli.extended.config as ce
+
+    tip = provider.getblockcount()
+    safe_height = tip - Settings.blk_safety_depth
+    if not blockheights or blockheights[0] > safe_height:
+        return None
+    try:
+        reader = BlockFileReader(Settings.blk_datadir or determine_datadir(), get_addrtype("p2pkh"), get_addrtype("p2sh"), debug=debug)
+    except OSError as e:
+        if debug:
+            print("Block files can't be read, using RPC:", e)
+        return None
+
+    # the block files must contain the chain of the checkpoints.
+    checkpoints = ce.get_config(quiet=True).get("checkpoint", {})
+    for height, blockhash in checkpoints.items():
+        if int(height) >= safe_height:
+            continue
+        if bu.height_to_blockhash(int(height)) != blockhash or reader.find_block(blockhash) is None:
+            if debug:
+                print("Block files don't match checkpoint {} ({}), using RPC.".format(height, blockhash))
+            reader.close()
+            return None
+
+    if debug:
+        print("Reading blocks until height {} from the block files.".format(safe_height))
+    return RawBlockFetcher(blockheights, reader, tip, safe_height, batch_size=batch_size, debug=debug)
+
+
+def get_block_fetcher(blockheights: list, batch_size: int=None, workers: int=None, debug: bool=False) -> BlockFetcher:
+
+    if Settings.blk_reader:
+        fetcher = get_raw_block_fetcher(blockheights, batch_size=batch_size, debug=debug)
+        if fetcher is not None:
+            return fetcher
+
+    workers = Settings.scan_workers if workers is None else workers
+    if workers > 1:
+        if debug:
+            print("Retrieving blocks with {} parallel workers ({}s).".format(workers, Settings.scan_executor))
+        return ParallelBlockFetcher(blockheights, batch_size=batch_size, workers=workers, executor=Settings.scan_executor, debug=debug)
+    else:
+        return BlockFetcher(blockheights, batch_size=batch_size, debug=debug)
@@ -4,13 +4,23 @@
 # keys are addresses (including P2TH for decks).
 # only block heights are stored. A reorg check with the checkpoint list is performed everytime something is stored or read.
 # The lastblock parameter refers to a blockhash.
+# The locator is stored in a SQLite database (one row per address), so only the addresses a command needs are loaded,
+# and only changed addresses are written, in a single transaction.
+# The old JSON locator file is migrated to the database the first time it is opened (a flag in the meta table records it).
+# Block heights of an address are kept in a sorted array('I'), which allows membership tests and range queries
+# with bisect and merges in linear time. In the database they're stored as delta-encoded varints.
 
 import json, os
+import sqlite3
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableMapping
 import pacli.extended.handling as eh
 from pacli.config import conf_dir
 from pacli.provider import provider
 
 LOCATORFILE = os.path.join(conf_dir, "blocklocator.json")
+LOCATORDB = os.path.join(conf_dir, "blocklocator.db")
 
 # NOTES:
 # - start and discontinuous attributes from BlockLocatorAddress will only be stored if necessary.
@@ -21,6 +31,7 @@ class BlockLocator:
     def __init__(self, address_dict, filename: str=None, ignore_orphans: bool=False):
 
        self.filename = filename if filename is not None else LOCATORFILE
+       self.db = None
        self.addresses = {}
        for address, values in address_dict.items():
            self.addresses.update({address : BlockLocatorAddress.from_dict(values, ignore_orphans=ignore_orphans)})
@@ -30,12 +41,22 @@ class BlockLocator:
         """Returns an empty locator."""
         return cls({})
 
+    @classmethod
+    def from_db(cls, filename: str=None, ignore_orphans: bool=False, quiet: bool=False, debug: bool=False):
+        """Opens the locator database. Addresses are loaded when they're accessed."""
+
+        locator = cls({}, filename=filename if filename is not None else LOCATORDB)
+        locator.db = LocatorDB(locator.filename, quiet=quiet, debug=debug)
+        locator.addresses = LocatorAddresses(locator.db, ignore_orphans=ignore_orphans)
+        return locator
+
     @classmethod
     def from_file(cls, locatorfilename: str=None, ignore_orphans: bool=False, quiet: bool=False, debug: bool=False) -> dict:
-        """Gets the content from the file (list of addresses with block heights)."""
+        """Gets the content from the file (list of addresses with block heights).
+           JSON files are only used if given explicitly, by default the locator database is used."""
 
-        if locatorfilename is None:
-            locatorfilename = LOCATORFILE
+        if locatorfilename is None or not locatorfilename.endswith(".json"):
+            return cls.from_db(locatorfilename, ignore_orphans=ignore_orphans, quiet=quiet, debug=debug)
         if debug:
            print("Reading locator file ...")
         try:
@@ -80,8 +101,18 @@ class BlockLocator:
             print("Storing locator data on file.")
         #if debug:
         #    print("New Locator dict:", self.to_dict()) # very long output, not really necessary as one can check the json file
-        with open(self.filename, "w") as locatorfile:
-            json.dump(self.to_dict(), locatorfile)
+        if self.db is not None:
+            changes = self.addresses.changes()
+            if debug:
+                print("Changed addresses: {}, deleted addresses: {}".format(len(changes), len(self.addresses.deleted)))
+            self.db.save(changes, self.addresses.deleted)
+            self.addresses.saved(changes)
+        else:
+            # the new file replaces the old one only after it was written completely.
+            tmpfilename = self.filename + ".tmp"
+            with open(tmpfilename, "w") as locatorfile:
+                json.dump(self.to_dict(), locatorfile, default=list)
+            os.replace(tmpfilename, self.filename)
 
     def store_blockheights(self, address: str, heights: list, lastblockheight: int, startheight: int=0, lastblockhash: str=None, quiet: bool=False, debug: bool=False):
         """Updates block heights of an address in the locator file."""
@@ -102,7 +133,7 @@ class BlockLocator:
                     print("Caching process ignored for address {}: stored startheight {} is higher than the last cached block {}.".format(address, stored_startheight, lastblockheight))
                 return
             stored_tx_heights = self.addresses[address].heights
-            max_height = max(stored_tx_heights) if stored_tx_heights else 0
+            max_height = stored_tx_heights[-1] if stored_tx_heights else 0
 
             if lastblockheight < max_height:
                 if debug:
@@ -121,20 +152,10 @@ class BlockLocator:
                 # It's unfortunately not possible with the current setup to remove it when the startheight is above 0.
                 self.addresses[address].discontinupus = False
         else:
-            stored_tx_heights = []
+            stored_tx_heights = array("I")
             self.addresses.update({address : BlockLocatorAddress.empty(lastblockhash=lastblockhash, startheight=startheight)})
 
-        new_heights = []
-
-        for height in heights:
-            if height in stored_tx_heights:
-                continue
-            else:
-                new_heights.append(height)
-
-        heights = stored_tx_heights + new_heights
-        heights.sort()
-        self.addresses[address].heights = heights
+        self.addresses[address].heights = merge_heights(stored_tx_heights, sorted(heights))
 
     def prune_orphans(self, cutoff_height: int, quiet: bool=False, debug: bool=False) -> int:
         """Prunes all block heights above a defined cutoff height.
@@ -151,12 +172,12 @@ class BlockLocator:
         for address, addr_obj in self.addresses.items():
             if debug:
                 print("Processing address: {}, Lastblockheight: {}".format(address, addr_obj.lastblockheight))
-            after_cutoff = [h for h in addr_obj.heights if h > cutoff_height]
+            cutoff_index = bisect_right(addr_obj.heights, cutoff_height)
+            after_cutoff = addr_obj.heights[cutoff_index:]
             if len(after_cutoff) > 0:
                 if not quiet or debug:
-                    print("Pruning BlockLocator for address {} - erased heights:".format(address), after_cutoff)
-                new_heights = [h for h in addr_obj.heights if h <= cutoff_height]
-                self.addresses[address].heights = new_heights
+                    print("Pruning BlockLocator for address {} - erased heights:".format(address), list(after_cutoff))
+                self.addresses[address].heights = addr_obj.heights[:cutoff_index]
                 self.addresses[address].update_lastblock(lastblockheight=cutoff_height)
                 changed_addresses += 1
             elif addr_obj.lastblockheight is None: # see above
@@ -164,21 +185,19 @@ class BlockLocator:
                 changed_addresses += 1
         if not quiet:
             if changed_addresses > 0:
-                print("Pruned orphans in {} address entries in blocklocator.json.".format(changed_addresses))
+                print("Pruned orphans in {} address entries in the block locator.".format(changed_addresses))
             else:
-                print("No orphans were pruned from blocklocator.json.")
+                print("No orphans were pruned from the block locator.")
         return changed_addresses
 
     def get_address_data(self, address_list: list, debug: bool=False) -> tuple:
-        # returns a list of all block heights of the address list and the last block
-        heights = []
+        # returns a sorted array of all block heights of the address list and the last block
+        heights = array("I")
         lastblocks = []
         for address in address_list:
             if (address is not None) and (address in self.addresses):
-                heights += self.addresses[address].heights
+                heights = merge_heights(heights, self.addresses[address].heights)
                 lastblocks.append(self.addresses[address].lastblockheight)
-        if heights:
-            heights = sorted(set(heights))
         if lastblocks:
             lastblock = min(lastblocks)
         else:
@@ -208,7 +227,8 @@ class BlockLocatorAddress:
                  ignore_orphans: bool=False):
         # Can be initialized with block height or block hash.
         # Hash is stored in the file.
-        self.heights = heights
+        # heights must be sorted.
+        self.heights = heights if type(heights) == array else array("I", heights)
         self.startheight = startheight
         self.discontinuous = discontinuous
         self.update_lastblock(lastblockhash=lastblockhash, lastblockheight=lastblockheight, ignore_orphans=ignore_orphans)
@@ -268,6 +288,210 @@ class BlockLocatorAddress:
         self.update_lastblock() # this resets the block heights to 0
         self.discontinuous = False
         self.startheight = 0
-        self.heights = []
+        self.heights = array("I")
+
+
+
+
+class LocatorDB:
+    """SQLite storage of the block locator."""
 
+    def __init__(self, filename: str, jsonfilename: str=None, quiet: bool=False, debug: bool=False):
+        """jsonfilename is the old locator file to migrate. By default only the standard database migrates the standard file."""
 
+        self.filename = filename
+        if jsonfilename is None and filename == LOCATORDB:
+            jsonfilename = LOCATORFILE
+        self.db = sqlite3.connect(filename)
+        self.db.execute("CREATE TABLE IF NOT EXISTS locator (address TEXT PRIMARY KEY, heights BLOB, lastblock TEXT, startheight INTEGER, discontinuous INTEGER)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if self.get_meta("migrated") is None:
+            if jsonfilename is not None and os.path.exists(jsonfilename) and not self.addresses():
+                self.migrate(jsonfilename, quiet=quiet, debug=debug)
+            else:
+                # nothing to migrate, or the database already contains addresses.
+                with self.db:
+                    self.set_meta("migrated", "")
+
+    def get_meta(self, key: str) -> str:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def migrate(self, jsonfilename: str, quiet: bool=False, debug: bool=False) -> None:
+        """Imports all addresses of a JSON locator file. The old file is kept with the suffix .migrated.
+           The addresses and the migrated flag are written in a single transaction, so an interrupted migration
+           is repeated completely the next time the database is opened."""
+
+        try:
+            with open(jsonfilename, "r") as jsonfile:
+                address_dict = json.load(jsonfile)
+        except json.JSONDecodeError:
+            address_dict = {}
+        if not quiet:
+            print("Migrating block locator file {} with {} addresses to the new locator database {}.".format(jsonfilename, len(address_dict), self.filename))
+        for values in address_dict.values():
+            values.update({"heights" : sorted(set(values["heights"]))})
+        with self.db:
+            self.write(address_dict)
+            self.set_meta("migrated", jsonfilename)
+        os.replace(jsonfilename, jsonfilename + ".migrated")
+
+    def addresses(self) -> list:
+        return [row[0] for row in self.db.execute("SELECT address FROM locator ORDER BY rowid")]
+
+    def load(self, address: str) -> dict:
+        """Returns the data of an address in the format of BlockLocatorAddress.to_dict, or None."""
+
+        row = self.db.execute("SELECT heights, lastblock, startheight, discontinuous FROM locator WHERE address = ?", (address,)).fetchone()
+        if row is None:
+            return None
+        result = {"heights" : decode_heights(row[0]), "lastblock" : row[1]}
+        if row[2]:
+            result.update({"startheight" : row[2]})
+        if row[3]:
+            result.update({"discontinuous" : True})
+        return result
+
+    def save(self, address_dict: dict, deleted: set=set()) -> None:
+        """Writes changed and deleted addresses in a single transaction."""
+
+        with self.db:
+            self.write(address_dict, deleted)
+
+    def write(self, address_dict: dict, deleted: set=set()) -> None:
+        # the caller commits.
+        rows = [(a, encode_heights(v["heights"]), v["lastblock"], v.get("startheight", 0), int(v.get("discontinuous", False))) for a, v in address_dict.items()]
+        self.db.executemany("""INSERT INTO locator VALUES (?, ?, ?, ?, ?) ON CONFLICT (address) DO UPDATE SET
+                               heights = excluded.heights, lastblock = excluded.lastblock,
+                               startheight = excluded.startheight, discontinuous = excluded.discontinuous""", rows)
+        self.db.executemany("DELETE FROM locator WHERE address = ?", [(a,) for a in deleted])
+
+
+class LocatorAddresses(MutableMapping):
+    """Address dict of a database locator. BlockLocatorAddress objects are loaded on first access."""
+
+    def __init__(self, db: LocatorDB, ignore_orphans: bool=False):
+
+        self.db = db
+        self.ignore_orphans = ignore_orphans
+        self.keys_ = dict.fromkeys(db.addresses()) # ordered set
+        self.loaded = {}
+        self.snapshots = {} # stored state of loaded addresses, to detect changes
+        self.deleted = set()
+
+    def __getitem__(self, address: str):
+        if address not in self.loaded:
+            if address not in self.keys_:
+                raise KeyError(address)
+            addr_dict = self.db.load(address)
+            self.loaded[address] = BlockLocatorAddress.from_dict(addr_dict, ignore_orphans=self.ignore_orphans)
+            self.snapshots[address] = locator_state(addr_dict)
+        return self.loaded[address]
+
+    def __setitem__(self, address: str, addr_obj) -> None:
+        self.keys_[address] = None
+        self.loaded[address] = addr_obj
+        self.deleted.discard(address)
+
+    def __delitem__(self, address: str) -> None:
+        del self.keys_[address]
+        self.loaded.pop(address, None)
+        self.snapshots.pop(address, None)
+        self.deleted.add(address)
+
+    def __contains__(self, address) -> bool:
+        return address in self.keys_
+
+    def __iter__(self):
+        return iter(list(self.keys_))
+
+    def __len__(self) -> int:
+        return len(self.keys_)
+
+    def changes(self) -> dict:
+        """Returns the dicts of all loaded addresses which were changed or added."""
+
+        changes = {}
+        for address, addr_obj in self.loaded.items():
+            addr_dict = addr_obj.to_dict()
+            if locator_state(addr_dict) != self.snapshots.get(address):
+                changes.update({address : addr_dict})
+        return changes
+
+    def saved(self, changes: dict) -> None:
+        for address, addr_dict in changes.items():
+            self.snapshots[address] = locator_state(addr_dict)
+        self.deleted = set()
+
+
+def locator_state(addr_dict: dict) -> tuple:
+    # comparable representation of the stored data of an address.
+    return (array("I", addr_dict["heights"]).tobytes(), addr_dict["lastblock"], addr_dict.get("startheight", 0), bool(addr_dict.get("discontinuous", False)))
+
+
+# Sorted block height arrays
+
+def merge_heights(heights1: array, heights2: list) -> array:
+    """Merges two sorted height sequences in linear time, without duplicates.
+       heights2 can contain duplicates (e.g. several transactions in a block)."""
+
+    if not heights2:
+        return array("I", heights1)
+    if not heights1 or heights1[-1] < heights2[0]: # usual case: new heights are above the stored ones
+        return array("I", heights1) + array("I", dict.fromkeys(heights2))
+    result = array("I")
+    i, j = 0, 0
+    while i < len(heights1) or j < len(heights2):
+        if j == len(heights2) or (i < len(heights1) and heights1[i] <= heights2[j]):
+            height = heights1[i]
+            i += 1
+        else:
+            height = heights2[j]
+            j += 1
+        if not result or result[-1] != height:
+            result.append(height)
+    return result
+
+def contains_height(heights: array, height: int) -> bool:
+    i = bisect_left(heights, height)
+    return i < len(heights) and heights[i] == height
+
+def add_height(heights: array, height: int) -> None:
+    """Inserts a height into a sorted array, if it's not already present."""
+    i = bisect_left(heights, height)
+    if i == len(heights) or heights[i] != height:
+        heights.insert(i, height)
+
+def heights_in_range(heights: array, start: int, end: int) -> array:
+    return heights[bisect_left(heights, start):bisect_right(heights, end)]
+
+def encode_heights(heights: list) -> bytes:
+    """Encodes sorted heights as differences to the previous height, in LEB128 varints."""
+
+    result = bytearray()
+    previous = 0
+    for height in heights:
+        delta = height - previous
+        previous = height
+        while delta > 0x7f:
+            result.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        result.append(delta)
+    return bytes(result)
+
+def decode_heights(data: bytes) -> array:
+
+    heights = array("I")
+    height, delta, shift = 0, 0, 0
+    for byte in data:
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            height += delta
+            heights.append(height)
+            delta, shift = 0, 0
+    return heights
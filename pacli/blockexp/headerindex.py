@@ -0,0 +1,171 @@
+# Header index
+# Local index of block headers: height -> block hash, block hash -> height and height -> block time.
+# It is stored in a SQLite database next to the block locator and filled incrementally,
+# every time a block is retrieved from the node or scanned by the block explorer.
+# When the index is opened, and again when the tip of the chain has changed (tested at most every CHECK_SECONDS seconds,
+# e.g. in the daemon), it is checked against the checkpoints and the highest stored block is compared with the node.
+# Entries from a chain reorganization on are deleted. Orphaned entries can also remain below a valid one (e.g. after a gap),
+# so entries of the last REORG_DEPTH blocks are compared with the node when they are looked up, once per tip.
+
+import os
+import time
+import sqlite3
+import threading
+from pacli.config import conf_dir
+from pacli.provider import provider
+
+HEADERFILE = os.path.join(conf_dir, "headerindex.db")
+REORG_DEPTH = 500
+CHECK_SECONDS = 10
+
+
+class HeaderIndex:
+
+    def __init__(self, filename: str=None):
+
+        self.filename = filename if filename is not None else HEADERFILE
+        self.db = None
+        self.lock = threading.Lock()
+        self.checked_tip = None # (height, hash) of the tip at the last check
+        self.checked_time = 0
+        self.verified = set() # recent heights compared with the node since the last check
+
+    def connect(self, debug: bool=False) -> None:
+        if self.db is None:
+            self.db = sqlite3.connect(self.filename, check_same_thread=False)
+            # the index can always be rebuilt from the node, so commits don't need to wait for the disk.
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS headers (height INTEGER PRIMARY KEY, hash TEXT UNIQUE, time TEXT)")
+            self.reorg_check(debug=debug)
+        elif time.time() - self.checked_time >= CHECK_SECONDS:
+            tip = self.get_tip()
+            if tip != self.checked_tip:
+                self.reorg_check(tip=tip, debug=debug)
+            else:
+                self.checked_time = time.time()
+
+    def get_tip(self) -> tuple:
+        tip = provider.getblockcount()
+        return (tip, provider.getblockhash(tip)) if type(tip) == int else None
+
+    def reorg_check(self, tip: tuple=None, debug: bool=False) -> None:
+        """Deletes all entries from the first height where the index differs from the checkpoints or the current chain."""
+        import pacli.extended.config as ce
+
+        tip = self.get_tip() if tip is None else tip
+        self.checked_tip, self.checked_time = tip, time.time()
+        self.verified.clear()
+        if tip is None: # no connection to the node
+            return
+
+        cutoff = None
+        checkpoints = ce.get_config(quiet=True).get("checkpoint", {})
+        for height in sorted([int(h) for h in checkpoints]):
+            stored = self.db.execute("SELECT hash FROM headers WHERE height = ?", (height,)).fetchone()
+            if stored is not None and stored[0] != checkpoints[str(height)]:
+                cutoff = height
+                break
+
+        # entries above the tip are orphaned, below it a reorg changes the highest stored block, whose fork point is searched.
+        limit = min(tip[0] + 1, cutoff if cutoff is not None else float("inf"))
+        top = self.db.execute("SELECT height, hash FROM headers WHERE height < ? ORDER BY height DESC LIMIT 1", (limit,)).fetchone()
+        if top is not None and provider.getblockhash(top[0]) != top[1]:
+            cutoff = self.find_fork(top[0])
+
+        with self.db:
+            deleted = self.db.execute("DELETE FROM headers WHERE height >= ?", (limit if cutoff is None else cutoff,)).rowcount
+        if deleted and debug:
+            print("Chain reorganization found. Deleted header index entries from height {} on.".format(limit if cutoff is None else cutoff))
+
+    def verify(self, entry: tuple) -> tuple:
+        # recent entries are compared with the node, orphaned ones are deleted.
+        if entry is None or self.checked_tip is None or entry[0] <= self.checked_tip[0] - REORG_DEPTH or entry[0] in self.verified:
+            return entry
+        if provider.getblockhash(entry[0]) != entry[1]:
+            with self.db:
+                self.db.execute("DELETE FROM headers WHERE height = ?", (entry[0],))
+            return None
+        self.verified.add(entry[0])
+        return entry
+
+    def find_fork(self, height: int) -> int:
+        # binary search for the first stored height which is not part of the current chain.
+        heights = [h[0] for h in self.db.execute("SELECT height FROM headers WHERE height <= ? ORDER BY height", (height,))]
+        low, high = 0, len(heights) - 1
+        while low < high:
+            middle = (low + high) // 2
+            stored = self.db.execute("SELECT hash FROM headers WHERE height = ?", (heights[middle],)).fetchone()[0]
+            if provider.getblockhash(heights[middle]) == stored:
+                low = middle + 1
+            else:
+                high = middle
+        return heights[low]
+
+    def get(self, height: int=None, blockhash: str=None) -> tuple:
+        """Returns the (height, hash, time) tuple of a block, or None if it is not indexed."""
+
+        with self.lock:
+            self.connect()
+            if height is not None:
+                entry = self.db.execute("SELECT height, hash, time FROM headers WHERE height = ?", (height,)).fetchone()
+            else:
+                entry = self.db.execute("SELECT height, hash, time FROM headers WHERE hash = ?", (blockhash,)).fetchone()
+            return self.verify(entry)
+
+    def add(self, height: int, blockhash: str, blocktime: str=None) -> None:
+
+        with self.lock:
+            self.connect()
+            self.verified.add(height) # retrieved from the node
+            stored = self.db.execute("SELECT hash, time FROM headers WHERE height = ?", (height,)).fetchone()
+            if stored is not None and stored[0] == blockhash and (blocktime is None or stored[1] is not None):
+                return
+            # replaces entries without time, and orphaned blocks at the same height.
+            self.db.execute("INSERT OR REPLACE INTO headers VALUES (?, ?, ?)", (height, blockhash, blocktime))
+
+    def add_block(self, block: dict) -> None:
+        """Adds a block retrieved with getblock, if it belongs to the main chain."""
+        if block.get("confirmations", 0) > 0 and "height" in block:
+            self.add(block["height"], block["hash"], block.get("time"))
+
+    def save(self) -> None:
+        with self.lock:
+            if self.db is not None:
+                self.db.commit()
+
+
+header_index = HeaderIndex()
+
+
+def height_to_blockhash(height: int) -> str:
+    entry = header_index.get(height=height)
+    if entry is not None:
+        return entry[1]
+    blockhash = provider.getblockhash(height)
+    if type(blockhash) == str: # heights after the tip return an error
+        header_index.add(height, blockhash)
+        header_index.save()
+    return blockhash
+
+
+def blockhash_to_height(blockhash: str) -> int:
+    """Block height of a block hash. Raises KeyError if the block doesn't exist, like provider.getblock."""
+    entry = header_index.get(blockhash=blockhash)
+    if entry is not None:
+        return entry[0]
+    block = provider.getblock(blockhash)
+    header_index.add_block(block)
+    header_index.save()
+    return block["height"]
+
+
+def height_to_time(height: int) -> str:
+    """Block time of a block height in the node's format (e.g. 2022-04-26 20:31:22 UTC)."""
+    entry = header_index.get(height=height)
+    if entry is not None and entry[2] is not None:
+        return entry[2]
+    block = provider.getblock(height_to_blockhash(height))
+    header_index.add_block(block)
+    header_index.save()
+    return block["time"]
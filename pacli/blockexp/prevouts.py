@@ -0,0 +1,118 @@
+# Prevout cache
+# Stores the addresses and value of transaction outputs, so the senders of a transaction can be found
+# without retrieving the spent transactions again. Outputs are identified by their txid, so they never change,
+# even after a reorg.
+# The memory tier is a LRU cache with a maximum number of outputs (setting prevout_cache_size).
+# Optionally (setting prevout_cache_disk) outputs are also stored in a SQLite database in the config directory.
+# New outputs are written to disk every SAVE_ENTRIES outputs or SAVE_SECONDS seconds, and at exit.
+
+import os
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+from pacli.config import conf_dir, Settings
+
+PREVOUTFILE = os.path.join(conf_dir, "prevouts.db")
+SAVE_ENTRIES = 10000 # new outputs written to the disk tier at once
+SAVE_SECONDS = 60 # maximum time new outputs are kept only in memory
+
+
+class PrevoutCache:
+
+    def __init__(self, maxsize: int=None, diskfile: str=None):
+
+        self.maxsize = Settings.prevout_cache_size if maxsize is None else maxsize
+        self.outputs = OrderedDict() # (txid, vout) : (addresses, value)
+        self.hits, self.misses = 0, 0
+        self.lock = threading.Lock()
+        self.diskfile = diskfile
+        self.db = None
+        self.unsaved = []
+        self.last_save = time.time()
+        if diskfile is not None:
+            atexit.register(self.save)
+
+    def connect(self) -> None:
+        if self.db is None:
+            self.db = sqlite3.connect(self.diskfile, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS prevouts (txid TEXT, vout INTEGER, output TEXT, PRIMARY KEY (txid, vout))")
+
+    def get(self, txid: str, vout: int) -> tuple:
+        """Returns the (addresses, value) tuple of an output, or None if it is not cached."""
+
+        key = (txid, vout)
+        with self.lock:
+            if key in self.outputs:
+                self.outputs.move_to_end(key)
+                self.hits += 1
+                return self.outputs[key]
+            if self.diskfile is not None:
+                self.connect()
+                row = self.db.execute("SELECT output FROM prevouts WHERE txid = ? AND vout = ?", key).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    output = tuple(json.loads(row[0]))
+                    self.store(key, output)
+                    return output
+            self.misses += 1
+        return None
+
+    def contains(self, txid: str, vout: int) -> bool:
+        # memory tier only, doesn't change the statistics.
+        with self.lock:
+            return (txid, vout) in self.outputs
+
+    def store(self, key: tuple, output: tuple) -> None:
+        # memory tier only, the caller holds the lock.
+        self.outputs[key] = output
+        self.outputs.move_to_end(key)
+        while len(self.outputs) > self.maxsize:
+            self.outputs.popitem(last=False)
+
+    def add_tx(self, tx: dict) -> None:
+        """Adds all outputs with addresses of a decoded transaction."""
+
+        if self.maxsize < 1 or "txid" not in tx:
+            return
+        with self.lock:
+            for n, output in enumerate(tx.get("vout", [])):
+                try:
+                    entry = (output["scriptPubKey"]["addresses"], output["value"])
+                except KeyError: # outputs without addresses are not senders
+                    continue
+                if (tx["txid"], n) not in self.outputs:
+                    self.store((tx["txid"], n), entry)
+                    if self.diskfile is not None:
+                        self.unsaved.append((tx["txid"], n, json.dumps(entry)))
+            if len(self.unsaved) >= SAVE_ENTRIES or (self.unsaved and time.time() - self.last_save >= SAVE_SECONDS):
+                self.write()
+
+    def save(self) -> None:
+        """Writes the new outputs to the disk tier."""
+
+        with self.lock:
+            self.write()
+
+    def write(self) -> None:
+        # the caller holds the lock.
+        self.last_save = time.time()
+        if self.diskfile is None or not self.unsaved:
+            return
+        self.connect()
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO prevouts VALUES (?, ?, ?)", self.unsaved)
+        self.unsaved = []
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total > 0 else 0
+        return "Prevout cache: {} hits, {} misses ({:.1f}% hit rate), {} outputs in memory.".format(self.hits, self.misses, rate, len(self.outputs))
+
+    def reset_stats(self) -> None:
+        self.hits, self.misses = 0, 0
+
+
+prevout_cache = PrevoutCache(diskfile=PREVOUTFILE if Settings.prevout_cache_disk else None)
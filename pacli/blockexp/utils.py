@@ -1,10 +1,17 @@
 import datetime
+import time
 import pacli.extended.handling as eh
 import pacli.blockexp.blocklocator as loc
 from pacli.provider import provider
+from pacli.config import Settings
+from pacli.blockexp.prevouts import prevout_cache
+from pacli.rpc.profiler import profiler
+from pacli.blockexp.headerindex import header_index, blockhash_to_height, height_to_blockhash, height_to_time
 
 # lower level block exploring utilities are now bundled here
 
+TIMESTAMP_WINDOW = 10 # blocks checked before a date boundary, as timestamps are not strictly increasing
+
 def show_txes_by_block(sending_addresses: list=[],
                        receiving_addresses: list=[],
                        locator_list: list=None,
@@ -20,14 +27,77 @@ def show_txes_by_block(sending_addresses: list=[],
                        use_locator: bool=False,
                        store_locator: bool=False,
                        only_store: bool=False,
+                       batch_size: int=None,
+                       workers: int=None,
+                       flush_blocks: int=None,
+                       flush_seconds: int=None,
                        debug: bool=False) -> list:
-    """Shows or stores transaction data from the blocks directly."""
+    """Shows or stores transaction data from the blocks directly.
+       Returns a dict with the matching transactions (txes) and the locator data (see iter_txes_by_block)."""
+
+    result = {}
+    txes = list(iter_txes_by_block(sending_addresses=sending_addresses,
+                                   receiving_addresses=receiving_addresses,
+                                   locator_list=locator_list,
+                                   startblock=startblock,
+                                   endblock=endblock,
+                                   locator=locator,
+                                   quiet=quiet,
+                                   coinbase=coinbase,
+                                   advanced=advanced,
+                                   advanced_struct=advanced_struct,
+                                   require_sender_and_receiver=require_sender_and_receiver,
+                                   force_storing=force_storing,
+                                   use_locator=use_locator,
+                                   store_locator=store_locator,
+                                   only_store=only_store,
+                                   batch_size=batch_size,
+                                   workers=workers,
+                                   flush_blocks=flush_blocks,
+                                   flush_seconds=flush_seconds,
+                                   result=result,
+                                   debug=debug))
+    if not only_store:
+        result.update({"txes" : txes})
+    return result
+
+
+def iter_txes_by_block(sending_addresses: list=[],
+                       receiving_addresses: list=[],
+                       locator_list: list=None,
+                       startblock: int=0,
+                       endblock: int=None,
+                       locator: loc.BlockLocator=None,
+                       quiet: bool=False,
+                       coinbase: bool=False,
+                       advanced: bool=False,
+                       advanced_struct: bool=False,
+                       require_sender_and_receiver: bool=False,
+                       force_storing: bool=False,
+                       use_locator: bool=False,
+                       store_locator: bool=False,
+                       only_store: bool=False,
+                       batch_size: int=None,
+                       workers: int=None,
+                       flush_blocks: int=None,
+                       flush_seconds: int=None,
+                       result: dict=None,
+                       debug: bool=False):
+    """Yields the matching transactions block by block, directly from the blocks.
+       batch_size is the number of RPC calls sent together in batch requests (default: rpc_batch_size setting).
+       workers is the number of parallel workers retrieving the blocks (default: scan_workers setting).
+       When storing locators, the locator data is saved every flush_blocks blocks or flush_seconds seconds
+       (default: locator_flush_blocks and locator_flush_seconds settings, 0 disables), so an aborted caching run
+       can be resumed from the last saved block.
+       If a result dict is given, the locator data (blocks, bhash, bheight) is added to it at the end."""
     #TODO: specifying a burn address does not restrict the txes to burn transactions.
     # Maybe sending and receiving TXes are connected by OR instead of AND?
     # (i.e. if both are specified, both sending and receiving txes are shown?)
 
     # NOTE: locator_list parameter only stores the locator
+    from pacli.blockexp.blockfetcher import get_block_fetcher
 
+    timer = profiler.timer("show_txes_by_block")
     lastblockheight, lastblockhash = None, None
     all_txes = False
 
@@ -42,8 +112,6 @@ def show_txes_by_block(sending_addresses: list=[],
               Abort and get results with KeyboardInterrupt (e.g. CTRL-C).
               """)
 
-    tracked_txes = []
-
     if sending_addresses or receiving_addresses:
         address_list = list(set(sending_addresses + receiving_addresses)) # removes overlapping addresses
     elif locator_list:
@@ -78,7 +146,7 @@ def show_txes_by_block(sending_addresses: list=[],
                 if only_store:
                     blockheights = blockrange
                 else:
-                    blockheights = [b for b in loc_blockheights if b >= startblock] + [b for b in blockrange if b > last_checked_block]
+                    blockheights = list(loc.heights_in_range(loc_blockheights, startblock, last_checked_block)) + [b for b in blockrange if b > last_checked_block]
 
             else:
                 blockheights = blockrange
@@ -92,7 +160,7 @@ def show_txes_by_block(sending_addresses: list=[],
         else:
             if debug:
                 print("Only showing already cached blockheights. No caching will be done.")
-            blockheights = [b for b in loc_blockheights if (startblock <= b <= endblock)]
+            blockheights = list(loc.heights_in_range(loc_blockheights, startblock, endblock))
             store_locator = False # makes sense here as there are no new blocks cached.
 
     else:
@@ -106,134 +174,164 @@ def show_txes_by_block(sending_addresses: list=[],
         mbd = 50 # minimum block distance
         last_cycle = 0
 
-    for bh in blockheights:
-        try:
-            # progress message
-            if not quiet and (not use_locator or (bh not in loc_blockheights)):
-                rh = bh - min_height # relative height: current height minus minimum height
-                if (bh == min_height) or (use_locator and (len(loc_blockheights) > 0 and bh == (max(loc_blockheights) + 1))):
-                    if use_locator:
-                        print("Processing uncached blocks starting from block {} ...".format(bh))
-                    else:
-                        print("Processing blocks starting from block {} ...".format(bh))
-
-                elif (bh == max_height) or (int(rh % percent) == 0): # each time a full percentage is recorded
-                    percentage = round(rh / percent)
-                    if (bh == max_height) or ((rh - last_cycle) >= mbd and (percentage not in (0, 100))):
-                        last_cycle = (rh // mbd) * mbd
-                        print("Progress: {} %, block: {} ...".format(percentage, bh))
+    if store_locator:
+        flush_blocks = Settings.locator_flush_blocks if flush_blocks is None else flush_blocks
+        flush_seconds = Settings.locator_flush_seconds if flush_seconds is None else flush_seconds
+        unflushed_blocks, last_flush = 0, time.time()
 
-            blockhash = provider.getblockhash(bh)
-            block = provider.getblock(blockhash)
+    timer.lap("locator data")
+    fetcher = get_block_fetcher(blockheights, batch_size=batch_size, workers=workers, debug=debug)
+    prevout_cache.reset_stats()
+    timer.lap("fetcher setup")
 
+    try:
+        for bh in blockheights:
             try:
-                block_txes = block["tx"]
-            except KeyError:
-                if not quiet:
-                    print("You have reached the tip of the blockchain.")
-                if lastblockheight is None:
-                    raise eh.PacliInputDataError("Start block is after the current block height.\nIf you didn't specify a start block, this probably means there are no new blocks to cache.")
-                else:
-                    break
+                # progress message
+                if not quiet and (not use_locator or not loc.contains_height(loc_blockheights, bh)):
+                    rh = bh - min_height # relative height: current height minus minimum height
+                    if (bh == min_height) or (use_locator and (len(loc_blockheights) > 0 and bh == (loc_blockheights[-1] + 1))):
+                        if use_locator:
+                            print("Processing uncached blocks starting from block {} ...".format(bh))
+                        else:
+                            print("Processing blocks starting from block {} ...".format(bh))
+
+                    elif (bh == max_height) or (int(rh % percent) == 0): # each time a full percentage is recorded
+                        percentage = round(rh / percent)
+                        if (bh == max_height) or ((rh - last_cycle) >= mbd and (percentage not in (0, 100))):
+                            last_cycle = (rh // mbd) * mbd
+                            print("Progress: {} %, block: {} ...".format(percentage, bh))
+
+                timer.reset()
+                blockdata = fetcher.get(bh)
+                timer.lap("block retrieval")
+                blockhash, block = blockdata["blockhash"], blockdata["block"]
 
-            for txid in block_txes:
                 try:
-                    txjson = provider.getrawtransaction(txid, 1)
-                    # tx_struct = get_tx_structure(txid=txid)
-                    tx_struct = get_tx_structure(tx=txjson)
-                except Exception as e:
-                    if debug:
-                        print("TX {} Error: {}".format(txid, e))
-                    continue
-                #if debug: # enable for deep debugging
-                #    print("TX {} struct: {}".format(txid, tx_struct))
-                if not coinbase and len(tx_struct["inputs"]) == 0:
-                    continue
-
-                sender_present, receiver_present = None, None
-                receivers = [r for o in tx_struct["outputs"] for r in o["receivers"]]
-                senders = [s for i in tx_struct["inputs"] for s in i["sender"]]
-
-                if locator_list:
-                    addr_present = not set(address_list).isdisjoint(set(senders + receivers))
-                elif sending_addresses or receiving_addresses: # list mode is probably slower
-                    receiver_present = not set(receiving_addresses).isdisjoint(set(receivers))
-                    sender_present = not set(sending_addresses).isdisjoint(set(senders))
-                    if require_sender_and_receiver:
-                        addr_present = sender_present and receiver_present
+                    block_txes = block["tx"]
+                except KeyError:
+                    if not quiet:
+                        print("You have reached the tip of the blockchain.")
+                    if lastblockheight is None:
+                        raise eh.PacliInputDataError("Start block is after the current block height.\nIf you didn't specify a start block, this probably means there are no new blocks to cache.")
                     else:
-                        addr_present = sender_present or receiver_present # TODO perhaps this line is the problem: it does an OR between senders and receivers.
+                        break
+                header_index.add_block(block)
 
-                if all_txes or addr_present:
-                    if advanced:
-                        # tx_dict = provider.getrawtransaction(txid, 1)
-                        tx_dict = txjson
-                    else:
-                        tx_dict = {"txid" : txid}
-                        tx_dict.update(tx_struct)
-                        if advanced_struct:
-                            tx_dict.update({"txjson" : txjson})
+                for txid, txjson, tx_struct in blockdata["txes"]:
+                    if tx_struct is None:
                         if debug:
-                            print("TX detected: {} struct: {}".format(txid, tx_struct))
-
-                    if all_txes or receiver_present or sender_present:
-                        tracked_txes.append(tx_dict)
-
-                    # skip blocks which were already stored in the block locators
-                    if store_locator and bh not in loc_blockheights:
-                       for a in address_list:
-                           if ((a in senders) or (a in receivers)) and (bh not in address_blocks[a]):
-                               address_blocks[a].append(bh)
-
-            lastblockhash = blockhash
-            lastblockheight = bh
+                            print("TX {} Error: {}".format(txid, blockdata["errors"].get(txid)))
+                        continue
+                    #if debug: # enable for deep debugging
+                    #    print("TX {} struct: {}".format(txid, tx_struct))
+                    if not coinbase and len(tx_struct["inputs"]) == 0:
+                        continue
+
+                    sender_present, receiver_present = None, None
+                    receivers = [r for o in tx_struct["outputs"] for r in o["receivers"]]
+                    senders = [s for i in tx_struct["inputs"] for s in i["sender"]]
+
+                    if locator_list:
+                        addr_present = not set(address_list).isdisjoint(set(senders + receivers))
+                    elif sending_addresses or receiving_addresses: # list mode is probably slower
+                        receiver_present = not set(receiving_addresses).isdisjoint(set(receivers))
+                        sender_present = not set(sending_addresses).isdisjoint(set(senders))
+                        if require_sender_and_receiver:
+                            addr_present = sender_present and receiver_present
+                        else:
+                            addr_present = sender_present or receiver_present # TODO perhaps this line is the problem: it does an OR between senders and receivers.
+
+                    if all_txes or addr_present:
+                        if advanced:
+                            # tx_dict = provider.getrawtransaction(txid, 1)
+                            tx_dict = txjson
+                        else:
+                            tx_dict = {"txid" : txid}
+                            tx_dict.update(tx_struct)
+                            if advanced_struct:
+                                tx_dict.update({"txjson" : txjson})
+                            if debug:
+                                print("TX detected: {} struct: {}".format(txid, tx_struct))
+
+                        if (all_txes or receiver_present or sender_present) and not only_store:
+                            yield tx_dict
+
+                        # skip blocks which were already stored in the block locators
+                        if store_locator and not loc.contains_height(loc_blockheights, bh):
+                           for a in address_list:
+                               if (a in senders) or (a in receivers):
+                                   loc.add_height(address_blocks[a], bh)
+
+                lastblockhash = blockhash
+                lastblockheight = bh
+
+                # periodic flush of the new locator data, only in the uncached range.
+                if store_locator and bh > last_checked_block:
+                    unflushed_blocks += 1
+                    if (flush_blocks and unflushed_blocks >= flush_blocks) or (flush_seconds and time.time() - last_flush >= flush_seconds):
+                        if debug:
+                            print("Saving locator data until block {} ...".format(bh))
+                        timer.reset()
+                        store_locator_data(address_blocks, lastblockheight, lastblockhash, locator, startheight=startblock, quiet=True, debug=debug)
+                        timer.lap("locator flush")
+                        unflushed_blocks, last_flush = 0, time.time()
+
+            except KeyboardInterrupt:
+                if use_locator and loc.contains_height(loc_blockheights, bh):
+                    raise eh.PacliInputDataError("Interrupted while initializing blockheights. No block processing was done, so nothing is shown nor stored.")
+                else:
+                    break
+    finally:
+        fetcher.close()
 
-        except KeyboardInterrupt:
-            if use_locator and bh in loc_blockheights:
-                raise eh.PacliInputDataError("Interrupted while initializing blockheights. No block processing was done, so nothing is shown nor stored.")
-            else:
-                break
+    timer.reset()
+    prevout_cache.save()
+    header_index.save()
+    timer.lap("saving caches")
+    if debug:
+        print(prevout_cache.stats())
 
-    result = {}
-    if store_locator is True:
-        result.update({"blocks" : address_blocks, "bhash" : lastblockhash, "bheight" : lastblockheight})
-    if not only_store:
-        result.update({"txes" : tracked_txes})
-    return result
+    if result is not None and store_locator is True:
+        result.update({"blocks" : {a : list(h) for a, h in address_blocks.items()}, "bhash" : lastblockhash, "bheight" : lastblockheight})
 
 
 def date_to_blockheight(date: datetime.date, last_block: int, startheight: int=0, debug: bool=False):
     """Returns the first block created after 00:00 UTC the given date.
-       This means the block can also be created at a later date (e.g. in testnets with irregular block creation)."""
+       This means the block can also be created at a later date (e.g. in testnets with irregular block creation).
+       If no block was created after this date, returns the block after last_block."""
     # block time format: 2022-04-26 20:31:22 UTC
-    blockheight = startheight
-
-    for step in 1000000, 100000, 10000, 1000, 100, 10, 1:
-        if step > last_block:
-            continue
-        for bh in range(blockheight, last_block, step):
-            blocktime = provider.getblock(provider.getblockhash(bh))["time"]
-            block_date = datetime.date.fromisoformat(blocktime.split(" ")[0])
-            if debug:
-                print("Checking height", bh)
-
-            if block_date >= date:
-                blockheight = bh - step + (step // 10)
-                break
-        # we also need to reset block height when the loop ends
+    # Binary search over the block times, which are taken from the header index if possible.
+
+    def block_date(height: int) -> datetime.date:
+        blocktime = height_to_time(height)
+        if debug:
+            print("Checking height", height, blocktime)
+        return datetime.date.fromisoformat(blocktime.split(" ")[0])
+
+    low, high = startheight, last_block + 1
+    while low < high:
+        middle = (low + high) // 2
+        if block_date(middle) >= date:
+            high = middle
         else:
-            blockheight = bh - step + (step // 10)
+            low = middle + 1
 
-        if step == 1 and block_date >= date:
-            if debug:
-                print("Best block found", bh, blocktime, date)
+    # Block timestamps are not strictly increasing (e.g. PoS blocks can have earlier timestamps than their predecessors),
+    # so some blocks shortly before the found one can already be after the date.
+    for bh in range(max(low - TIMESTAMP_WINDOW, startheight), low):
+        if block_date(bh) >= date:
+            low = bh
             break
 
-    return bh
+    if debug:
+        print("Best block found for date {}: {}".format(date, low))
+    return low
 
-def get_tx_structure(txid: str=None, tx: dict=None, human_readable: bool=True, add_txid: bool=False, ignore_blockhash: bool=False) -> dict:
+def get_tx_structure(txid: str=None, tx: dict=None, human_readable: bool=True, add_txid: bool=False, ignore_blockhash: bool=False, blockheight: int=None, prevtxes: dict=None) -> dict:
     """Helper function showing useful values which are not part of the transaction,
-       like sender(s) and block height."""
+       like sender(s) and block height.
+       blockheight and prevtxes (already retrieved transactions spent by the inputs) avoid RPC calls if known."""
 
     if not tx:
         if txid:
@@ -241,13 +339,14 @@ def get_tx_structure(txid: str=None, tx: dict=None, human_readable: bool=True, a
         else:
             return None
     try:
-        senders = find_tx_senders(tx)
+        senders = find_tx_senders(tx, prevtxes=prevtxes)
     except KeyError:
         raise eh.PacliInputDataError("Transaction does not exist or is corrupted.")
+    prevout_cache.add_tx(tx)
 
     outputs = []
     if "blockhash" in tx and not ignore_blockhash:
-        height = provider.getblock(tx["blockhash"])["height"]
+        height = blockheight if blockheight is not None else blockhash_to_height(tx["blockhash"])
     elif human_readable:
         height = "unconfirmed"
     else:
@@ -355,18 +454,29 @@ def display_caching_warnings(address_list: list, locator: loc.BlockLocator, igno
             print("Note: Address {} was or will be cached from the block height {} on.".format(a, locator.addresses[a].startheight))
 
 
-def find_tx_senders(tx: dict) -> list:
+def find_tx_senders(tx: dict, prevtxes: dict=None) -> list:
     """Finds all known senders of a transaction."""
     # find_tx_sender from pypeerassets only finds the first sender.
     # this variant returns a list of all input senders.
+    # prevtxes can contain the spent transactions if they were already retrieved (e.g. in batches).
+
+    # Spent outputs are looked up in the prevout cache first.
 
     senders = []
     for vin in tx["vin"]:
         try:
-            sending_tx = provider.getrawtransaction(vin["txid"], 1)
             vout = vin["vout"]
-            sender = sending_tx["vout"][vout]["scriptPubKey"]["addresses"]
-            value = sending_tx["vout"][vout]["value"]
+            cached = prevout_cache.get(vin["txid"], vout)
+            if cached is not None:
+                sender, value = cached
+            else:
+                if prevtxes is not None and vin["txid"] in prevtxes:
+                    sending_tx = prevtxes[vin["txid"]]
+                else:
+                    sending_tx = provider.getrawtransaction(vin["txid"], 1)
+                    prevout_cache.add_tx(sending_tx)
+                sender = sending_tx["vout"][vout]["scriptPubKey"]["addresses"]
+                value = sending_tx["vout"][vout]["value"]
             senders.append({"sender" : sender, "value" : value})
         except KeyError: # coinbase transactions
             continue
@@ -2,10 +2,7 @@ from typing import Union
 from appdirs import user_config_dir
 import configparser
 import os
-from pacli.keystore import load_key
-from pypeerassets.pa_constants import param_query
 from pacli.default_conf import default_conf
-from pypeerassets import Kutil
 
 
 conf_dir = user_config_dir("pacli")
@@ -27,6 +24,15 @@ def write_default_config(conf_file=None):
 
 
 required = {"network", "deck_version", "production", "change", "provider"}
+# settings added later, which may be missing in older config files
+optional = {"rpc_batch_size", "scan_workers", "scan_executor", "prevout_cache_size", "prevout_cache_disk", "locator_flush_blocks", "locator_flush_seconds",
+            "blk_reader", "blk_datadir", "blk_safety_depth", "rpc_cache", "rpc_cache_size", "rpc_cache_disk", "rpc_cache_depth",
+            "rpc_pool_size", "rpc_timeout", "rpc_connect_timeout", "replay_node", "replay_file", "rpc_concurrency",
+            "rpc_adaptive", "rpc_retries", "rpc_retry_delay", "wallet_index", "ownership_cache_disk"}
+numeric = {"rpc_batch_size", "scan_workers", "prevout_cache_size", "locator_flush_blocks", "locator_flush_seconds", "blk_safety_depth",
+           "rpc_cache_size", "rpc_cache_depth", "rpc_pool_size", "rpc_timeout", "rpc_connect_timeout", "rpc_concurrency",
+           "rpc_retries", "rpc_retry_delay"}
+boolean = {"prevout_cache_disk", "blk_reader", "rpc_cache", "rpc_cache_disk", "rpc_adaptive", "wallet_index", "ownership_cache_disk"}
 
 
 def read_conf(conf_file):
@@ -43,11 +49,36 @@ def read_conf(conf_file):
     if settings["network"].startswith("t"):
         settings["testnet"] = True
 
-    settings['p2th_address'] = param_query(settings['network']).P2TH_addr
-
     return settings
 
 
+class LazySetting:
+    '''setting computed on first access, replaced then by its value.
+    Used for values which need the keyring or pypeerassets, so commands which don't use them start faster.'''
+
+    def __init__(self, name: str, function):
+        self.name = name
+        self.function = function
+
+    def __get__(self, instance, owner):
+        value = self.function(owner)
+        setattr(owner, self.name, value)
+        return value
+
+
+def load_key_from_keystore(Settings):
+
+    from pacli.keystore import load_key
+    from pypeerassets import Kutil
+    return Kutil(network=Settings.network, privkey=bytearray.fromhex(load_key()))
+
+
+def get_p2th_address(Settings):
+
+    from pypeerassets.pa_constants import param_query
+    return param_query(Settings.network).P2TH_addr
+
+
 def init_config():
     '''if first run, setup local configuration directory.'''
 
@@ -71,17 +102,32 @@ def load_conf():
         setattr(Settings, key, settings[key])
 
     setattr(Settings, 'deck_version', int(Settings.deck_version))
-    setattr(Settings, 'key', Kutil(network=settings['network'],
-                                   privkey=bytearray.fromhex(load_key())
-                                   )
-            )
+    for key in optional - settings.keys():
+        setattr(Settings, key, default_conf[key])
+    for key in numeric:
+        setattr(Settings, key, int(getattr(Settings, key)))
+    for key in boolean:
+        setattr(Settings, key, str(getattr(Settings, key)).lower() in ("true", "1", "yes"))
+    setattr(Settings, 'key', LazySetting('key', load_key_from_keystore))
+    setattr(Settings, 'p2th_address', LazySetting('p2th_address', get_p2th_address))
 
     if settings['change'] == "default":
-        Settings.change = Settings.key.address
+        Settings.change = LazySetting('change', lambda Settings: Settings.key.address)
 
     return Settings
 
 
+def reload_conf(Settings) -> None:
+    '''reads the configuration again into the existing Settings class (used by the daemon before each command)'''
+
+    new_settings = load_conf()
+    for key in [k for k in vars(Settings) if not k.startswith("__")]:
+        delattr(Settings, key)
+    for key, value in vars(new_settings).items():
+        if not key.startswith("__"):
+            setattr(Settings, key, value)
+
+
 def write_settings(key: str, value: Union[str, bool]) -> None:
     '''write new conf file'''
 
@@ -0,0 +1,230 @@
+# Resident pacli process
+# 'pacli daemon start' keeps pacli loaded (provider, caches, settings) and runs the commands sent by
+# the thin client 'pacli-client' over a Unix domain socket in the config directory.
+# The client sends its arguments and working directory; the daemon runs the command like the pacli
+# executable, streams stdout and stderr back and ends with the exit code, so 'pacli-client ARGS'
+# behaves like 'pacli ARGS'. Commands are executed one after another.
+# The configuration is read again before each command, and the provider is created again if one of its settings changed.
+# Protocol: one JSON object per line. Client: {"argv" : [...], "cwd" : DIR} or {"shutdown" : true}.
+# Daemon: {"stdout" : TEXT}, {"stderr" : TEXT} and finally {"exit" : CODE}.
+# The client uses the socket given in the environment variable PACLI_SOCKET, if set (see 'pacli daemon start -s').
+
+import os
+import sys
+import json
+import socket
+import socketserver
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from appdirs import user_config_dir
+
+SOCKET_FILE = os.path.join(user_config_dir("pacli"), "pacli.sock")
+
+
+class StreamWriter:
+    # file-like object sending everything written to the client.
+
+    def __init__(self, connection, stream: str):
+        self.connection = connection
+        self.stream = stream
+        self.disconnected = False
+
+    def write(self, text: str) -> int:
+        if text and not self.disconnected:
+            try:
+                send_message(self.connection, {self.stream : text})
+            except OSError:
+                # the client was interrupted, the command is completed without output.
+                self.disconnected = True
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+def send_message(connection, message: dict) -> None:
+    connection.sendall((json.dumps(message) + "\n").encode())
+
+
+def exit_code(code) -> int:
+    # like the interpreter: None is 0, other non-integers are printed and return 1.
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+        if request.get("shutdown"):
+            send_message(self.connection, {"exit" : 0})
+            self.server.stopped = True
+            return
+        code = self.server.execute(request["argv"], request.get("cwd"), self.connection)
+        try:
+            send_message(self.connection, {"exit" : code})
+        except OSError:
+            pass
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+
+    def __init__(self, socket_file: str):
+
+        super().__init__(socket_file, CommandHandler)
+        self.stopped = False
+        self.provider_settings = None
+
+    def execute(self, argv: list, cwd: str, connection) -> int:
+        from pacli.__main__ import run
+        from pacli.config import Settings, reload_conf
+        from pacli.provider import provider, provider_settings
+        from pacli.rpc.profiler import profiler
+
+        stdout, stderr = StreamWriter(connection, "stdout"), StreamWriter(connection, "stderr")
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            try:
+                reload_conf(Settings)
+                settings = provider_settings(Settings)
+                if self.provider_settings is not None and settings != self.provider_settings:
+                    provider._reset()
+                self.provider_settings = settings
+
+                if "daemon" in argv[:1]:
+                    print("The daemon commands can't be sent to the daemon, use 'pacli daemon' instead.", file=sys.stderr)
+                    return 1
+                if cwd:
+                    os.chdir(cwd)
+                run(argv, name="pacli")
+                code = 0
+            except SystemExit as e:
+                code = exit_code(e.code)
+            except Exception:
+                traceback.print_exc()
+                code = 1
+            finally:
+                profiler.finish()
+        return code
+
+    def serve(self) -> None:
+        while not self.stopped:
+            self.handle_request()
+
+
+class Daemon:
+
+    """Commands to run pacli as a resident process, which answers the commands of 'pacli-client' faster."""
+
+    def start(self, socket_file: str=None, quiet: bool=False):
+        """Starts the daemon in the foreground. It runs until 'pacli daemon stop' or an interruption.
+
+        Usage:
+
+        pacli daemon start
+
+        Then use 'pacli-client' with the same arguments as 'pacli', e.g. 'pacli-client address list'.
+
+        Args:
+
+          socket_file: Path of the Unix domain socket (default: pacli.sock in the configuration directory).
+          quiet: Don't show messages."""
+
+        socket_file = SOCKET_FILE if socket_file is None else socket_file
+        if not hasattr(socket, "AF_UNIX"):
+            print("The daemon needs Unix domain sockets, which are not supported on this platform.")
+            return
+        if os.path.exists(socket_file):
+            if daemon_running(socket_file):
+                print("The daemon is already running.")
+                return
+            os.remove(socket_file) # left over after a crash
+
+        server = DaemonServer(socket_file)
+        if not quiet:
+            print("Pacli daemon listening on {}.".format(socket_file))
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            os.remove(socket_file)
+        if not quiet:
+            print("Pacli daemon stopped.")
+
+    def stop(self, socket_file: str=None):
+        """Stops the daemon.
+
+        Args:
+
+          socket_file: Path of the Unix domain socket (default: pacli.sock in the configuration directory)."""
+
+        socket_file = SOCKET_FILE if socket_file is None else socket_file
+        if not daemon_running(socket_file):
+            print("The daemon is not running.")
+            return
+        request(socket_file, {"shutdown" : True})
+
+    def status(self, socket_file: str=None) -> bool:
+        """Shows if the daemon is running.
+
+        Args:
+
+          socket_file: Path of the Unix domain socket (default: pacli.sock in the configuration directory)."""
+
+        return daemon_running(SOCKET_FILE if socket_file is None else socket_file)
+
+
+def daemon_running(socket_file: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(socket_file)
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def request(socket_file: str, message: dict) -> int:
+    """Sends a request to the daemon, writes its output to stdout and stderr and returns the exit code."""
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(socket_file)
+        send_message(connection, message)
+        for line in connection.makefile("r"):
+            response = json.loads(line)
+            if "stdout" in response:
+                sys.stdout.write(response["stdout"])
+            elif "stderr" in response:
+                sys.stderr.write(response["stderr"])
+            elif "exit" in response:
+                sys.stdout.flush()
+                return response["exit"]
+    return 1 # connection closed without exit code
+
+
+def client_main():
+    """Entry point of pacli-client: runs the command in the daemon."""
+
+    socket_file = os.environ.get("PACLI_SOCKET", SOCKET_FILE)
+    try:
+        code = request(socket_file, {"argv" : sys.argv[1:], "cwd" : os.getcwd()})
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("The pacli daemon is not running. Start it with 'pacli daemon start'.", file=sys.stderr)
+        code = 1
+    except KeyboardInterrupt:
+        code = 130
+    sys.exit(code)
+
+
+if __name__ == '__main__':
+    client_main()
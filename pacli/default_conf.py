@@ -5,9 +5,34 @@ default_conf = {
     "production": True,
     "deck_version": 1,  # deck version
     "change": "default",
-    "provider": "slm_rpcnode", # explorer, cryptoid
+    "provider": "slm_rpcnode", # explorer, cryptoid, record, replay
     "rpcuser" : "RPC_USER",
     "rpcpassword" : "RPC_PASS",
     "rpcport" : 9904,
-    "compatibility_mode" : False
+    "compatibility_mode" : False,
+    "rpc_batch_size" : 100, # calls per JSON-RPC batch request, 0 or 1 disables batching
+    "scan_workers" : 1, # parallel workers retrieving blocks in the block explorer
+    "scan_executor" : "thread", # thread, process
+    "prevout_cache_size" : 100000, # spent outputs kept in memory to find transaction senders
+    "prevout_cache_disk" : False, # store the prevout cache also on disk
+    "locator_flush_blocks" : 1000, # save locator data during caching every N blocks, 0 disables
+    "locator_flush_seconds" : 300, # save locator data during caching every N seconds, 0 disables
+    "blk_reader" : False, # read old blocks from the blk*.dat files of the client
+    "blk_datadir" : "", # directory of the block files, empty: default data directory
+    "blk_safety_depth" : 500, # only blocks with at least this number of confirmations are read from the block files
+    "rpc_cache" : False, # cache transactions, blocks and block hashes which can't change anymore
+    "rpc_cache_size" : 10000, # maximum number of cached RPC results in memory
+    "rpc_cache_disk" : False, # store the cached RPC results also on disk
+    "rpc_cache_depth" : 10, # minimum confirmations of cached transactions and blocks
+    "rpc_pool_size" : 10, # keep-alive connections to the node, at least scan_workers and rpc_concurrency are used
+    "rpc_timeout" : 0, # seconds to wait for the answer of the node to read-only calls, 0 waits forever
+    "rpc_connect_timeout" : 10, # seconds to wait for the connection to the node, 0 waits forever
+    "replay_node" : "slm_rpcnode", # node used by the record and replay providers
+    "replay_file" : "", # file of the record and replay providers, empty: rpcreplay.json.gz in the config directory
+    "rpc_concurrency" : 4, # concurrent RPC requests of wallet queries, 1 disables
+    "rpc_adaptive" : True, # reduce the concurrent RPC requests if the node slows down or fails
+    "rpc_retries" : 3, # retries of read-only RPC calls after timeouts, connection errors or an overloaded node, 0 disables
+    "rpc_retry_delay" : 500, # milliseconds before the first retry, doubled for each further one
+    "wallet_index" : True, # index the wallet transactions locally and update it incrementally
+    "ownership_cache_disk" : False # store the addresses found in the wallet also on disk
     }
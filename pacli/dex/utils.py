@@ -763,6 +763,7 @@ def check_swap(txhex: str,
             fail = True
 
     for adr in [a for a in (token_receiver, change_receiver) if a is not None]:
+        # checked directly with the client, as the swap is signed based on this result.
         validation = provider.validateaddress(adr)
         if validation.get("ismine") != True:
             notmine = True
@@ -919,7 +919,7 @@ class Donation:
         return eh.run_command(dtx.create_trackedtransaction, "signalling", **kwargs)
 
 
-    def lock(self, proposal: str, amount: str=None, destination: str=Settings.key.address, change: str=None, reserve: str=None, tx_fee: str="0.01", wait_for_confirmation: bool=False, sign: bool=False, send: bool=False, verify: bool=False, round_number: int=None, match_round: bool=False, new_inputs: bool=False, timelock: int=None, reserveamount: str=None, force: bool=False, debug: bool=False, quiet: bool=False, level_security: int=1) -> None:
+    def lock(self, proposal: str, amount: str=None, destination: str=None, change: str=None, reserve: str=None, tx_fee: str="0.01", wait_for_confirmation: bool=False, sign: bool=False, send: bool=False, verify: bool=False, round_number: int=None, match_round: bool=False, new_inputs: bool=False, timelock: int=None, reserveamount: str=None, force: bool=False, debug: bool=False, quiet: bool=False, level_security: int=1) -> None:
         """Creates a Locking Transaction to lock funds for a donation, by default to the origin address.
 
         Usage:
@@ -948,9 +948,10 @@ class Donation:
           quiet: Only display the transaction hexstring (script-friendly).
           debug: Display debugging information.
           force: Send the transaction even if the reorg check fails or some parameters do not make sense.
-          destination: Address the funds will be locked at.
+          destination: Address the funds will be locked at (default: current main address).
         """
 
+        destination = Settings.key.address if destination is None else destination
         kwargs = locals()
         kwargs.update({"txhex" : quiet, "security" : level_security, "wait" : match_round, "check_round" : round_number})
         del kwargs["self"], kwargs["round_number"], kwargs["match_round"], kwargs["level_security"], kwargs["quiet"]
@@ -1099,9 +1100,11 @@ class Donation:
 
             di.display_donation_state(dstate, mode)
 
-    def __my_donation_states(self, proposal: str, address: str=Settings.key.address, wallet: bool=False, all_matches: bool=False, all_states: bool=False, unclaimed: bool=False, incomplete: bool=False, keyring: bool=False, mode: str=None, debug: bool=False) -> None:
+    def __my_donation_states(self, proposal: str, address: str=None, wallet: bool=False, all_matches: bool=False, all_states: bool=False, unclaimed: bool=False, incomplete: bool=False, keyring: bool=False, mode: str=None, debug: bool=False) -> None:
         """Shows the donation states involving a certain address (default: current active address)."""
 
+        address = Settings.key.address if address is None else address
+
         # TODO: not working properly; probably related to the label prefixes.
 
         proposal_id = eu.search_for_stored_tx_label("proposal", proposal)
@@ -1300,7 +1303,7 @@ class Donation:
             print("Slot:", slot)
 
 
-    def qualified(self, proposal: str, round_number: int, address: str=Settings.key.address, label: str=None, debug: bool=False) -> bool:
+    def qualified(self, proposal: str, round_number: int, address: str=None, label: str=None, debug: bool=False) -> bool:
         """Shows if the address is entitled to participate in a slot distribution round.
 
         Usage:
@@ -1326,6 +1329,7 @@ class Donation:
             address_label = "{} with label {}".format(address, label)
         else:
             # we don't use show_label here so it's also possible to use under Windows.
+            address = Settings.key.address if address is None else address
             address_label = address
 
         print("Qualification status for address {} for distribution round {} in proposal {}:".format(address_label, round_number, proposal_id))
@@ -1358,7 +1362,7 @@ class Donation:
                 return False
         return False
 
-    def check_address(self, proposal: str, address: str=Settings.key.address, quiet: bool=False):
+    def check_address(self, proposal: str, address: str=None, quiet: bool=False):
         """Shows if the donor address was already used for a Proposal.
 
         Usage:
@@ -1373,6 +1377,7 @@ class Donation:
           address: Donor address. To be used as a positional argument (flag name not mandatory). See Usage.
           quiet: Suppress output."""
 
+        address = Settings.key.address if address is None else address
         proposal_id = eh.run_command(eu.search_for_stored_tx_label, "proposal", proposal, quiet=quiet)
         if du.donor_address_used(address, proposal_id):
             result = "Already used in this proposal, use another address." if not quiet else False
@@ -17,6 +17,7 @@ import pacli.dt.interface as di
 import pacli.extended.utils as eu
 import pacli.extended.queries as eq
 import pacli.extended.handling as eh
+from pacli.extended.wallet_index import wallet_index
 from pacli.provider import provider
 from pacli.config import Settings
 
@@ -172,6 +173,7 @@ def init_dt_deck(network_name: str, deckid: str, rescan: bool=True, quiet: bool=
             provider.rescanblockchain()
             if not quiet:
                 print("Rescanning ...")
+        wallet_index.rescan()
 
 
     if not no_label:
@@ -192,9 +194,10 @@ def dt_state(deckid: str, debug: bool=False, debug_voting: bool=False, debug_don
 # Card
 # Reward data seems to be missing in the "new" function ATM.
 
-def claim_pod_tokens(proposal_id: str, donor_address: str=Settings.key.address, donation_state: str=None, payment: list=None, receiver: list=None, proposer: bool=False, force: bool=False, debug: bool=False, quiet: bool=False) -> tuple:
+def claim_pod_tokens(proposal_id: str, donor_address: str=None, donation_state: str=None, payment: list=None, receiver: list=None, proposer: bool=False, force: bool=False, debug: bool=False, quiet: bool=False) -> tuple:
 
     # TODO: recheck the numbers of decimals problem (if donations have more decimals than token txes) here too!
+    donor_address = Settings.key.address if donor_address is None else donor_address
 
     if not receiver: # if there is no receiver, the coins are directly allocated to the donor.
         receiver = [donor_address]
@@ -242,7 +242,8 @@ def reorg_check(prune: bool=False, quiet: bool=False, debug: bool=False) -> int:
 
     if not quiet:
         print("Last checkpoint found: height {} hash {}".format(last_height, stored_bhash))
-    checked_bhash = provider.getblockhash(last_height)
+    # the block hash must come from the node, not from the RPC cache.
+    checked_bhash = getattr(provider, "node", provider).getblockhash(last_height)
     if checked_bhash == stored_bhash:
         if not quiet:
             print("No reorganization found. Everything seems to be ok.")
@@ -255,6 +256,8 @@ def reorg_check(prune: bool=False, quiet: bool=False, debug: bool=False) -> int:
             print("This is not necessarily an attack, it can also occur due to orphaned blocks.")
             print("Make sure you check token balances and other states.")
             print("Orphan checkpoints can be pruned with: 'pacli checkpoint set -r'")
+        if hasattr(provider, "invalidate"): # cached blocks and transactions may be orphaned too
+            provider.invalidate()
         if prune:
             if not quiet:
                 print("Checkpoints will be pruned until the highest one which is still valid.")
@@ -115,6 +115,32 @@ class ExtConfig(Config):
                Changing 'production' setting to False will enable a test environment for test tokens/decks which is
                incompatible with normal decks, this should also only be changed by developers.
                To change from testnet to mainnet and vice versa, use the 'network' setting.
+               The setting 'rpc_batch_size' is the number of RPC calls the block explorer sends together
+               in a single batch request. Set it to 0 if your client doesn't support batch requests.
+               With 'scan_workers' above 1, blocks are retrieved by several parallel workers ('scan_executor': thread or process).
+               'prevout_cache_size' is the number of spent outputs kept in memory to find the senders of transactions.
+               With 'prevout_cache_disk' set to True, they're also stored on disk and re-used in later scans.
+               Block hashes, heights and times are indexed in headerindex.db in the configuration directory.
+               This file can be deleted safely, it will be rebuilt when blocks are retrieved again.
+               During caching, the locator data is saved every 'locator_flush_blocks' blocks or 'locator_flush_seconds' seconds,
+               so an interrupted caching process continues from the last saved block.
+               With 'blk_reader' set to True, blocks with at least 'blk_safety_depth' confirmations are read directly
+               from the block files of the client ('blk_datadir', by default the standard data directory).
+               With 'rpc_cache' set to True, transactions and blocks with at least 'rpc_cache_depth' confirmations are cached
+               ('rpc_cache_size' entries in memory, and on disk if 'rpc_cache_disk' is True). The cache is updated if 'checkpoint reorg_check' finds a reorg.
+               RPC calls share a pool of 'rpc_pool_size' keep-alive connections to the client (at least 'scan_workers' and 'rpc_concurrency').
+               'rpc_timeout' and 'rpc_connect_timeout' are the seconds to wait for the answer of and the connection to the client (0: no limit).
+               'rpc_timeout' only applies to read-only calls, calls changing the wallet (e.g. importprivkey with a rescan) wait forever.
+               Wallet queries send up to 'rpc_concurrency' independent RPC requests at the same time.
+               With 'rpc_adaptive' set to True, fewer requests are sent at the same time while the client answers slowly or fails.
+               Read-only calls are retried up to 'rpc_retries' times, the first time after 'rpc_retry_delay' milliseconds.
+               With 'wallet_index' set to True, the wallet transactions are indexed in walletindex.db in the configuration directory
+               and only new transactions are retrieved. Delete this file if transactions were added to the wallet by an import outside of pacli.
+               The addresses found in the wallet are cached; with 'ownership_cache_disk' set to True also in ownership.db in the configuration directory.
+               The file is reset if the client uses another wallet.
+               With 'provider' set to 'record', all RPC requests to the client ('replay_node': slm_rpcnode or rpcnode) and
+               their responses are recorded into 'replay_file'. With 'provider' set to 'replay', they're answered from this file
+               without a running client, e.g. for benchmarks. Requests which weren't recorded raise an error.
 
            Args:
 
@@ -270,16 +296,17 @@ class ExtConfig(Config):
             result = []
             if find or label:
                 searchstr = value_or_label
-                for label, value in Settings.__dict__.items():
+                for label in list(Settings.__dict__):
+                    value = getattr(Settings, label) # resolves lazy settings
                     exact_value = (label and (str(searchstr) == str(value)))
                     string_found = (find and (str(searchstr) in str(value)))
                     if exact_value or string_found:
                         result.append(label)
 
             else:
-                try:
-                    result = Settings.__dict__[value_or_label]
-                except KeyError:
+                if value_or_label in Settings.__dict__:
+                    result = getattr(Settings, value_or_label)
+                else:
                     raise eh.PacliInputDataError("This setting label does not exist in the basic configuration file.")
 
 
@@ -329,10 +356,10 @@ class ExtConfig(Config):
         elif categories is True:
             print("Currently there are no different categories in the basic configuration file.")
         elif all_basic_settings is True:
-            pprint(Settings.__dict__)
+            pprint({s:getattr(Settings, s) for s in list(Settings.__dict__)})
         else:
             settings = Settings.__dict__
-            pprint({s:settings[s] for s in settings if s in default_conf.keys()})
+            pprint({s:getattr(Settings, s) for s in list(settings) if s in default_conf.keys()})
 
 
     def update_extended_categories(self, quiet: bool=False):
@@ -911,8 +938,8 @@ class ExtAddress(Address):
              blocks: Number of blocks to scan. Can be used as a positional argument. Default: 50000 blocks (ignored in combination with -c).
              chain: Scans without block limit (up to the whole blockchain). WARNING: Can take several hours up to days!
              force: Ignore warnings and proceed. See Usage modes.
-             erase: Delete address entry in blocklocator.json. To be used when the locator data is faulty or inconsistent.
-             prune_orphans: Prunes orphan blocks in blocklocator.json, see Usage section.
+             erase: Delete address entry in the block locator. To be used when the locator data is faulty or inconsistent.
+             prune_orphans: Prunes orphan blocks in the block locator, see Usage section.
              quiet: Suppress output.
              debug: Show additional debug information.
              keyring: Use addresses/label(s) stored in keyring.
@@ -2209,7 +2236,8 @@ class ExtTransaction(Transaction):
              unclaimed: bool=False,
              view_coinbase: bool=False,
              wallet: bool=False,
-             xplore: bool=False) -> None:
+             xplore: bool=False,
+             ystream: bool=False) -> None:
         """Lists transactions, optionally of a specific type (burn transactions and claim transactions).
 
         Usage modes:
@@ -2263,6 +2291,7 @@ class ExtTransaction(Transaction):
             - In this mode, both ORIGIN_ADDRESS and RECEIVER_ADDRESS can be any address, not only wallet addresses.
             - To use the locator feature -l an origin or receiver address or a deck has to be provided.
             - The mode with DECK only works for AT and PoB tokens together with -g or -b options and tracks the burn or gateway address.
+            - With -y, each transaction is printed as a JSON line (NDJSON) as soon as its block is processed. Add -q to get only the JSON lines.
 
         pacli transaction list [DECK] [ADDRESS] -p PARAM
 
@@ -2298,6 +2327,7 @@ class ExtTransaction(Transaction):
           wallet: Show transactions related to addresses in the wallet. See Usage modes for combinations with other options (-n not supported).
           view_coinbase: Include coinbase transactions in the output (not in combination with -n, -c, -b or -g).
           xplore: Block explorer mode (see Usage modes).
+          ystream: Stream the transactions as JSON lines while the blocks are processed (only in combination with -x).
           _value1: Deck or address. Should be used only as a positional argument (flag keyword not mandatory). See Usage modes above.
           _value2: Address (in some modes). Should be used only as a positional argument (flag keyword not mandatory). See Usage modes above.
         """
@@ -2331,6 +2361,7 @@ class ExtTransaction(Transaction):
              view_coinbase: bool=False,
              wallet: bool=False,
              xplore: bool=False,
+             ystream: bool=False,
              zraw: bool=False) -> None:
 
         # TODO: Further harmonization: Results are now:
@@ -2364,21 +2395,26 @@ class ExtTransaction(Transaction):
             use_db = False
         datadir = None if type(access_wallet) == bool else access_wallet # always None when access_wallet is not selected
 
+        if ystream and not xplore:
+            raise eh.PacliInputDataError("Streaming is only supported in block explorer mode (-x).")
+
         if (not named) and (not quiet):
             print("Searching transactions (this can take several minutes) ...")
 
         if xplore is True:
             if (burntxes is True) or (gatewaytxes is True):
-                txes = bx.show_txes(deck=address_or_deck, sending_address=origin, start=from_height, end=end_height, use_locator=locator, burntoken=burntxes, advanced=json, quiet=quiet, debug=debug)
+                txes = bx.show_txes(deck=address_or_deck, sending_address=origin, start=from_height, end=end_height, use_locator=locator, burntoken=burntxes, advanced=json, stream=ystream, quiet=quiet, debug=debug)
             else:
                 if wallet:
                     if sent is True or received is True:
                         wallet_mode = "sent" if sent is True else "received"
                     else:
                         wallet_mode = "all"
-                    txes = bx.show_txes(wallet_mode=wallet_mode, start=from_height, end=end_height, coinbase=view_coinbase, advanced=json, use_locator=locator, quiet=quiet, debug=debug)
+                    txes = bx.show_txes(wallet_mode=wallet_mode, start=from_height, end=end_height, coinbase=view_coinbase, advanced=json, use_locator=locator, stream=ystream, quiet=quiet, debug=debug)
                 else:
-                    txes = bx.show_txes(sending_address=origin, receiving_address=address_or_deck, start=from_height, end=end_height, coinbase=view_coinbase, advanced=json, use_locator=locator, quiet=quiet, debug=debug)
+                    txes = bx.show_txes(sending_address=origin, receiving_address=address_or_deck, start=from_height, end=end_height, coinbase=view_coinbase, advanced=json, use_locator=locator, stream=ystream, quiet=quiet, debug=debug)
+            if ystream: # transactions were already printed
+                return
         elif (burntxes is True) or (gatewaytxes is True):
             address = au.burn_address() if burntxes is True else None
             deckid = eu.search_for_stored_tx_label("deck", address_or_deck, quiet=quiet) if address_or_deck else None
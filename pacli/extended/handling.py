@@ -5,6 +5,7 @@ import pacli.extended.txtools as et
 import pacli.extended.interface as ei
 from pacli.provider import provider
 from pacli.config import Settings
+from pacli.rpc.profiler import profiler
 
 
 
@@ -23,6 +24,10 @@ def run_command(c, *args, **kwargs) -> object:
 
     debug = ("debug" in kwargs and kwargs["debug"]) or ("show_debug_info" in kwargs and kwargs["show_debug_info"])
 
+    if profiler.requested:
+        # prints the RPC statistics at exit (global --profile flag)
+        profiler.start()
+
     try:
         if "change" in kwargs:
             et.set_change_address(kwargs["change"], debug=debug)
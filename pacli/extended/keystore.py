@@ -284,11 +284,16 @@ def import_key_to_wallet(accountname: str, label: str=None, legacy: bool=False):
         pkey = pa.Kutil(network=Settings.network, privkey=bytearray.fromhex(get_key(prefix + label)))
         wif = pkey.wif
     else:
-        wif = Settings.key.wif
+        pkey = Settings.key
+        wif = pkey.wif
     if Settings.network in ("slm", "tslm"):
         provider.importprivkey(wif, accountname, rescan=True)
     else:
         provider.importprivkey(wif, account_name=accountname)
+    from pacli.extended.utils import ownership_cache # imported here to avoid a circular import
+    from pacli.extended.wallet_index import wallet_index
+    ownership_cache.forget([pkey.address])
+    wallet_index.rescan()
 
 def delete_key_from_keyring(label: str, network_name: str=Settings.network, legacy: bool=False):
     prefix = get_key_prefix(network_name, legacy=legacy)
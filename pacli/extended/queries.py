@@ -1,6 +1,8 @@
 # bundles most functions acceding directly to queries like listtransactions, listunspent etc.
 # queries involving PeerAssets features are in extended_token_queries.py
 
+import asyncio
+from decimal import Decimal
 from pacli.provider import provider
 from pacli.config import Settings
 
@@ -11,27 +13,33 @@ import pacli.extended.utils as eu
 import pacli.blockexp.utils as bu
 import pacli.extended.commands as ec
 import pacli.extended.handling as eh
-
-def get_labels_and_addresses(prefix: str=Settings.network,
-                             exclude: list=[],
-                             excluded_accounts: list=[],
-                             include_only: list=[],
-                             include: list=[],
-                             access_wallet: str=None,
-                             keyring: bool=False,
-                             named: bool=False,
-                             prioritize_named: bool=True,
-                             wallet_only: bool=True,
-                             empty: bool=False,
-                             mark_duplicates: bool=False,
-                             labels: bool=False,
-                             full_labels: bool=False,
-                             no_labels: bool=False,
-                             balances: bool=False,
-                             ownership: bool=False,
-                             debug: bool=False) -> list:
-    """Returns a dict of all labels and addresses which were stored.
-       Addresses without label are not included if "named" is True."""
+from pacli.rpc.profiler import profiler
+from pacli.rpc.aio import async_provider
+from pacli.rpc.batch import batch_query
+import pacli.rpc.aio as aio
+from pacli.extended.wallet_index import wallet_index
+
+BALANCE_MINCONF = 6 # confirmations of the coin balances, like the default of provider.getbalance
+
+async def get_labels_and_addresses_async(prefix: str=Settings.network,
+                                         exclude: list=[],
+                                         excluded_accounts: list=[],
+                                         include_only: list=[],
+                                         include: list=[],
+                                         access_wallet: str=None,
+                                         keyring: bool=False,
+                                         named: bool=False,
+                                         prioritize_named: bool=True,
+                                         wallet_only: bool=True,
+                                         empty: bool=False,
+                                         mark_duplicates: bool=False,
+                                         labels: bool=False,
+                                         full_labels: bool=False,
+                                         no_labels: bool=False,
+                                         balances: bool=False,
+                                         ownership: bool=False,
+                                         debug: bool=False) -> list:
+    """Async variant of get_labels_and_addresses: ownership and balances of the addresses are requested concurrently."""
        # This version is better ordered and already prepares the dict for the address table.
        # NOTE: wallet_only excludes the named addresses which are not in the wallet.
        # note 2: empty parameter here only refers to coin balances, not token balances.
@@ -109,23 +117,37 @@ def get_labels_and_addresses(prefix: str=Settings.network,
                 #    print("Unnamed address added:", address)
 
     # Note: empty and excluded flags do not remove named addresses.
-    result2 = []
+    candidates = []
     for item in result:
-        if check_ownership:
-            mine = eu.is_mine(item["address"])
-            if wallet_only and not mine:
-                continue
-            else:
-                item.update({"ismine" : mine})
-
         not_include_flag = include_only and item["address"] not in include_only
-        empty_flag = ((not prioritize_named) or (prioritize_named and not item["label"])) and (not empty) and (provider.getbalance(item["address"]) == 0)
         excluded_flag = (not prioritize_named) and item["address"] in exclude
         # not_wallet_flag = wallet_only and not eu.is_mine(item["address"])
-        if not_include_flag or empty_flag or excluded_flag: # or not_wallet_flag:
+        if not_include_flag or excluded_flag: # or not_wallet_flag:
             continue
         else:
+            candidates.append(item)
+
+    # ownership and coin balances of all addresses are resolved concurrently with a few RPC calls.
+    # The coin balance of each address is requested only once, for the empty check and the balances.
+    check_empty = lambda item: ((not prioritize_named) or (prioritize_named and not item["label"])) and (not empty)
+    balance_addresses = list(dict.fromkeys([item["address"] for item in candidates if balances or check_empty(item)]))
+    if check_ownership:
+        address_ownership, coin_balances = await asyncio.gather(async_provider.run(eu.are_mine, [item["address"] for item in candidates]),
+                                                                async_provider.run(get_coin_balances, balance_addresses))
+    else:
+        coin_balances = await async_provider.run(get_coin_balances, balance_addresses)
+
+    result2 = []
+    for item in candidates:
+        if check_ownership:
+            mine = address_ownership[item["address"]]
+            if wallet_only and not mine:
+                continue
+            else:
+                item.update({"ismine" : mine})
+        if not (check_empty(item) and coin_balances[item["address"]] == 0):
             result2.append(item)
+
     if debug:
         deleted_entries = len(result) - len(result2)
         print("{} entries of {} deleted due to restrictions by command line arguments.".format(deleted_entries, len(result)))
@@ -133,12 +155,13 @@ def get_labels_and_addresses(prefix: str=Settings.network,
 
     if balances:
         for item in result:
-            try:
-                balance = str(provider.getbalance(item["address"]))
-            except TypeError:
+            balance = coin_balances[item["address"]]
+            if balance is None:
                 balance = "0"
                 if debug is True:
-                    print("No valid balance for address {} with label {}. Probably not a valid address.".format(address, label))
+                    print("No valid balance for address {} with label {}. Probably not a valid address.".format(item["address"], item["label"]))
+            else:
+                balance = str(balance)
 
             if "." in balance:
                 balance = balance.rstrip("0")
@@ -148,23 +171,68 @@ def get_labels_and_addresses(prefix: str=Settings.network,
     return result
 
 
-
-def get_address_transactions(addr_string: str=None,
-                             sent: bool=False,
-                             received: bool=False,
-                             advanced: bool=False,
+def get_labels_and_addresses(prefix: str=Settings.network,
+                             exclude: list=[],
+                             excluded_accounts: list=[],
+                             include_only: list=[],
+                             include: list=[],
+                             access_wallet: str=None,
                              keyring: bool=False,
-                             include_p2th: bool=False,
-                             include_coinbase: bool=False,
-                             sort: bool=False,
-                             reverse_sort: bool=False,
-                             unconfirmed: bool=True,
-                             wallet: bool=False,
-                             raw: bool=False,
-                             txstruct: bool=False,
+                             named: bool=False,
+                             prioritize_named: bool=True,
+                             wallet_only: bool=True,
+                             empty: bool=False,
+                             mark_duplicates: bool=False,
+                             labels: bool=False,
+                             full_labels: bool=False,
+                             no_labels: bool=False,
+                             balances: bool=False,
+                             ownership: bool=False,
                              debug: bool=False) -> list:
-    """Returns all transactions sent to or from a specific address, or of the whole wallet."""
+    """Returns a dict of all labels and addresses which were stored.
+       Addresses without label are not included if "named" is True."""
+
+    return aio.run(get_labels_and_addresses_async(**locals()))
 
+
+def get_coin_balances(addresses: list, ownership: dict=None) -> dict:
+    """Returns a dict address : coin balance with BALANCE_MINCONF confirmations (None if the address is invalid).
+       The balances of the wallet addresses are calculated from a single listunspent call, the others are requested in batches.
+       With ownership (from eu.are_mine), wallet addresses without unspent outputs aren't requested again."""
+
+    wallet_balances = {}
+    for utxo in provider.listunspent(minconf=BALANCE_MINCONF):
+        address = utxo.get("address")
+        if address is None: # e.g. outputs with non-standard scripts
+            continue
+        wallet_balances[address] = wallet_balances.get(address, 0) + Decimal(str(utxo["amount"]))
+    ownership = {} if ownership is None else ownership
+
+    # wallet addresses without unspent outputs have a balance of 0.
+    balances = {a : wallet_balances.get(a, Decimal(0)) for a in addresses if a in wallet_balances or ownership.get(a)}
+    others = [a for a in dict.fromkeys(addresses) if a not in balances]
+    for address, balance in zip(others, batch_query("getbalance", [[a, BALANCE_MINCONF] for a in others])):
+        balances[address] = Decimal(str(balance)) if type(balance) in (int, float, Decimal) else None
+    return balances
+
+
+async def get_address_transactions_async(addr_string: str=None,
+                                         sent: bool=False,
+                                         received: bool=False,
+                                         advanced: bool=False,
+                                         keyring: bool=False,
+                                         include_p2th: bool=False,
+                                         include_coinbase: bool=False,
+                                         sort: bool=False,
+                                         reverse_sort: bool=False,
+                                         unconfirmed: bool=True,
+                                         wallet: bool=False,
+                                         raw: bool=False,
+                                         txstruct: bool=False,
+                                         debug: bool=False) -> list:
+    """Async variant of get_address_transactions: the transactions are requested concurrently."""
+
+    timer = profiler.timer("get_address_transactions")
     txes = {}
     excluded_accounts = None
     if (sent and not received) or (received and not sent):
@@ -208,51 +276,79 @@ def get_address_transactions(addr_string: str=None,
             if wallet:
                 print("Wallet addresses", wallet_addresses)
 
-    wallet_txes = get_wallet_transactions(debug=debug, exclude=excluded_accounts)
+    timer.lap("p2th and wallet addresses")
+    use_index = not raw and wallet_index.update(debug=debug)
+    if use_index:
+        # the transactions of the address or the wallet addresses, their wallet entries and the values sent and received
+        # are read from the wallet index, ordered by height. For the sent/received filters, only the sender or receiver role is read.
+        roles = ("sender",) if sent and not received else ("receiver",) if received and not sent else ("sender", "receiver")
+        records = {}
+        for record in wallet_index.address_entries(wallet_addresses if wallet else [address], roles):
+            categories = list(dict.fromkeys([category for account, category in record["entries"]
+                                             if excluded_accounts is None or account not in excluded_accounts]))
+            if not set(cats).isdisjoint(categories):
+                records[record["txid"]] = record
+                txes[record["txid"]] = categories
+        timer.lap("wallet index")
+    else:
+        wallet_txes = get_wallet_transactions(debug=debug, exclude=excluded_accounts)
+        timer.lap("wallet transactions")
 
-    if raw: # TODO: mainly debugging mode, maybe later remove again, or return the set (see below).
-        return wallet_txes
+        if raw: # TODO: mainly debugging mode, maybe later remove again, or return the set (see below).
+            return wallet_txes
 
+        unique_txes = list(set([(t["txid"], t["category"]) for t in wallet_txes]))
 
-    unique_txes = list(set([(t["txid"], t["category"]) for t in wallet_txes]))
-    if debug:
-        print("Sorting ...")
-    unique_txes.sort(key=lambda x: x[0], reverse=True) # should be: send, receive, generate
+        if debug:
+            print("Sorting ...")
+        unique_txes.sort(key=lambda x: x[0], reverse=True) # should be: send, receive, generate
 
-    if debug:
-        print("Sorting finished.\nPreprocessing transaction list ...")
+        if debug:
+            print("Sorting finished.\nPreprocessing transaction list ...")
 
-    oldtxid = None
-    for txid, category in unique_txes:
-        # deletes txes which aren't in the required categories
-        if (oldtxid not in (None, txid)) and set(cats).isdisjoint(txes[oldtxid]):
-            if debug:
-                print("Ignoring tx {}. Cats {} not matching {}.".format(oldtxid, txes[oldtxid], cats))
-            del txes[oldtxid]
+        oldtxid = None
+        for txid, category in unique_txes:
+            # deletes txes which aren't in the required categories
+            if (oldtxid not in (None, txid)) and set(cats).isdisjoint(txes[oldtxid]):
+                if debug:
+                    print("Ignoring tx {}. Cats {} not matching {}.".format(oldtxid, txes[oldtxid], cats))
+                del txes[oldtxid]
 
-        if txid not in txes.keys():
-            if debug:
-                print("New tx", txid, "with category", category)
-            txes.update({ txid : [category]})
-        else:
-            if category not in txes[txid]:
+            if txid not in txes.keys():
                 if debug:
-                    print("Adding category {} to tx {}".format(category, txid))
-                txes[txid].append(category)
+                    print("New tx", txid, "with category", category)
+                txes.update({ txid : [category]})
             else:
-                if debug:
-                    print("Ignoring category {} to tx {}, already existing in: {}".format(category, txid, txes["txid"]))
-        oldtxid = txid
+                if category not in txes[txid]:
+                    if debug:
+                        print("Adding category {} to tx {}".format(category, txid))
+                    txes[txid].append(category)
+                else:
+                    if debug:
+                        print("Ignoring category {} to tx {}, already existing in: {}".format(category, txid, txes["txid"]))
+            oldtxid = txid
 
     if debug:
        print(len(txes), "wallet transactions found.")
+    timer.lap("preprocessing")
     result = []
     if debug:
         print("Preprocessing finished.\nChecking senders and receivers ...")
 
-    for txid, categories in txes.items():
+    async def indexed_txes():
+        for txid in txes:
+            yield wallet_index.as_tx(records[txid])
+
+    def get_txstruct(tx):
+        # with the index, the structures are created after the selection (see below).
+        return tx if use_index else bu.get_tx_structure(tx=tx, human_readable=False, add_txid=True)
+
+    # the transactions are requested concurrently, but processed in the original order.
+    raw_txes = indexed_txes() if use_index else async_provider.imap(provider.getrawtransaction, [(txid, 1) for txid in txes])
+    categories_list = iter(txes.values())
+    async for tx in raw_txes:
 
-        tx = provider.getrawtransaction(txid, 1)
+        categories = next(categories_list)
         txdict = None
         try:
             confs = tx["confirmations"]
@@ -274,31 +370,35 @@ def get_address_transactions(addr_string: str=None,
             if debug:
                 print("Checking if wallet or address has sent transaction {} ...".format(tx["txid"]), end="")
 
-            try:
-                senders = bu.find_tx_senders(tx)
-            except KeyError: # coinbase txes should not be canceled here as they should give []
-                if debug:
-                    print("Transaction aborted.")
-                continue
+            if use_index:
+                values = records[tx["txid"]]["values"]
+                sender_values = [values["sender"]] if "sender" in values else []
+            else:
+                try:
+                    senders = bu.find_tx_senders(tx)
+                except KeyError: # coinbase txes should not be canceled here as they should give []
+                    if debug:
+                        print("Transaction aborted.")
+                    continue
+                sender_values = [sender_dict["value"] for sender_dict in senders
+                                 if (wallet and not set(sender_dict["sender"]).isdisjoint(wallet_addresses)) or (address in sender_dict["sender"])]
 
             value_sent = 0
 
-            for sender_dict in senders:
-                if (wallet and not set(sender_dict["sender"]).isdisjoint(wallet_addresses)) or (address in sender_dict["sender"]):
-
-                    value_sent += sender_dict["value"]
+            for sender_value in sender_values:
+                value_sent += sender_value
 
-                    if txdict is None:
-                        if txstruct:
-                            txdict = bu.get_tx_structure(tx=tx, human_readable=False, add_txid=True)
-                        elif advanced:
-                            txdict = tx
-                        else:
-                            txdict = {"txid" : tx["txid"], "type": ["send"], "value_sent" : value_sent, "confirmations": confs}
-                        if advanced:
-                            break
+                if txdict is None:
+                    if txstruct:
+                        txdict = get_txstruct(tx)
+                    elif advanced:
+                        txdict = tx
                     else:
-                        txdict.update({"value_sent" : value_sent})
+                        txdict = {"txid" : tx["txid"], "type": ["send"], "value_sent" : value_sent, "confirmations": confs}
+                    if advanced:
+                        break
+                else:
+                    txdict.update({"value_sent" : value_sent})
 
             if debug:
                 print("{}.".format(value_sent > 0)) # true or false
@@ -314,24 +414,27 @@ def get_address_transactions(addr_string: str=None,
             if "send" in categories:
                 categories.remove("send")
 
-            try:
-                outputs = tx["vout"]
-            except KeyError:
-                if debug:
-                    print("WARNING: Invalid transaction. TXID:", tx.get("txid"))
-                continue
-
             value_received = 0
 
-            for output in outputs:
-                out_addresses = output["scriptPubKey"].get("addresses")
-                if not out_addresses: # None or []
+            if use_index:
+                value_received = records[tx["txid"]]["values"].get("receiver", 0)
+            else:
+                try:
+                    outputs = tx["vout"]
+                except KeyError:
+                    if debug:
+                        print("WARNING: Invalid transaction. TXID:", tx.get("txid"))
                     continue
 
-                # P2TH addresses don't have to be added to out_addresses
-                if (wallet and (include_p2th or not set(out_addresses).isdisjoint(wallet_addresses))) or (address in out_addresses):
+                for output in outputs:
+                    out_addresses = output["scriptPubKey"].get("addresses")
+                    if not out_addresses: # None or []
+                        continue
 
-                    value_received += output["value"]
+                    # P2TH addresses don't have to be added to out_addresses
+                    if (wallet and (include_p2th or not set(out_addresses).isdisjoint(wallet_addresses))) or (address in out_addresses):
+
+                        value_received += output["value"]
 
             # TODO: if receiver or not depends on value.
             # This could be problematic in the future if 0-value-txes are allowed.
@@ -343,7 +446,7 @@ def get_address_transactions(addr_string: str=None,
                         txdict.update({"value_received" : value_received})
                 else:
                     if txstruct:
-                        txdict = bu.get_tx_structure(tx=tx, human_readable=False, add_txid=True)
+                        txdict = get_txstruct(tx)
                     elif advanced:
                         txdict = tx
                     else:
@@ -352,7 +455,7 @@ def get_address_transactions(addr_string: str=None,
                 if debug:
                     print("True.")
                     if not wallet:
-                        print("Address detected as receiver in transaction: {}. Received value in this output: {}".format(tx["txid"], output["value"]))
+                        print("Address detected as receiver in transaction: {}. Received value: {}".format(tx["txid"], value_received))
 
 
             else:
@@ -363,6 +466,17 @@ def get_address_transactions(addr_string: str=None,
 
         if txdict is not None:
             result.append(txdict)
+    timer.lap("senders and receivers")
+
+    if use_index and (advanced or txstruct):
+        # the index doesn't contain the complete transactions, they're only requested for the result.
+        full_txes = []
+        async for tx in async_provider.imap(provider.getrawtransaction, [(t["txid"], 1) for t in result]):
+            if advanced and "confirmations" not in tx:
+                tx.update({"confirmations" : 0})
+            full_txes.append(tx)
+        result = [bu.get_tx_structure(tx=tx, human_readable=False, add_txid=True) for tx in full_txes] if txstruct else full_txes
+        timer.lap("complete transactions")
 
     if sort or reverse_sort:
         confpar = "blockheight" if txstruct else "confirmations"
@@ -374,6 +488,25 @@ def get_address_transactions(addr_string: str=None,
     return result
 
 
+def get_address_transactions(addr_string: str=None,
+                             sent: bool=False,
+                             received: bool=False,
+                             advanced: bool=False,
+                             keyring: bool=False,
+                             include_p2th: bool=False,
+                             include_coinbase: bool=False,
+                             sort: bool=False,
+                             reverse_sort: bool=False,
+                             unconfirmed: bool=True,
+                             wallet: bool=False,
+                             raw: bool=False,
+                             txstruct: bool=False,
+                             debug: bool=False) -> list:
+    """Returns all transactions sent to or from a specific address, or of the whole wallet."""
+
+    return aio.run(get_address_transactions_async(**locals()))
+
+
 def retrieve_balance(address: str, debug: bool=False) -> str:
     # currently a string is returned, to be converted into Decimal if needed.
     try:
@@ -437,6 +570,9 @@ def get_wallet_address_set(empty: bool=False, include_named: bool=False, use_acc
 def find_transaction_by_string(searchstring: str, only_start: bool=False):
     """Returns transactions where the TXID matches a string."""
 
+    if wallet_index.update():
+        return wallet_index.find_txids(searchstring, only_start=only_start)
+
     wallet_txids = set([tx["txid"] for tx in get_wallet_transactions()])
     matches = []
     for txid in wallet_txids:
@@ -451,33 +587,35 @@ def search_change_addresses(known_addresses: list, wallet_txes: list=None, balan
     # TODO: probably obsolete now due to database utils. Is unused and commented out in at_utils.py.
     if not wallet_txes:
         wallet_txes = get_address_transactions(wallet=True, advanced=True, debug=debug)
-    known_addr_list = [a["address"] for a in known_addresses]
+    known_addr_list = set([a["address"] for a in known_addresses])
     unknown_wallet_addresses = []
-    new_addr_list = []
     network = Settings.network
 
+    # the unknown output addresses of all transactions are checked together.
+    output_addresses = []
     for tx in wallet_txes:
         if debug:
             print("CHANGE ADDRESS SEARCH: checking tx:", tx["txid"])
         for output in tx["vout"]:
             try:
-                addresses = output["scriptPubKey"]["addresses"]
+                output_addresses += output["scriptPubKey"]["addresses"]
             except KeyError:
                 continue
-            for address in addresses:
-                if address not in known_addr_list and address not in new_addr_list:
-                    validation = provider.validateaddress(address)
-                    if validation.get("ismine") == True:
-                        address_item = {"label" : "", "address" : address, "network" : network}
-                        if balances is True:
-                            balance = retrieve_balance(address, debug=debug)
-                            address_item.update({"balance" : balance})
-                        unknown_wallet_addresses.append(address_item)
-                        new_addr_list.append(address)
-                        if debug:
-                            print("Found and added unknown address:", address)
-                    elif debug:
-                        print("Ignored non-wallet address:", address)
+    unknown_addresses = [a for a in dict.fromkeys(output_addresses) if a not in known_addr_list]
+    ownership = eu.are_mine(unknown_addresses, debug=debug)
+    new_addr_list = [a for a in unknown_addresses if ownership[a]]
+    if debug:
+        for address in unknown_addresses:
+            print("Found and added unknown address:" if ownership[address] else "Ignored non-wallet address:", address)
+
+    if balances is True:
+        coin_balances = get_coin_balances(new_addr_list, ownership)
+    for address in new_addr_list:
+        address_item = {"label" : "", "address" : address, "network" : network}
+        if balances is True:
+            # same format as retrieve_balance
+            address_item.update({"balance" : str(float(coin_balances[address] or 0)).rstrip("0")})
+        unknown_wallet_addresses.append(address_item)
     return unknown_wallet_addresses
 
 def utxo_check(utxodata: list, access_wallet: str=None, quiet: bool=False, debug: bool=False):
@@ -485,6 +623,11 @@ def utxo_check(utxodata: list, access_wallet: str=None, quiet: bool=False, debug
     if access_wallet is not None:
         import pacli.db_utils as dbu
         datadir = access_wallet if type(access_wallet) == str else None
+    # the wallet index finds the spending transactions of all UTXOs at once, without the transactions of the addresses.
+    use_index = access_wallet is None and wallet_index.update(debug=debug)
+    if use_index:
+        spending_txes = wallet_index.find_spending_txes(utxodata)
+    address_txes = {} # the transactions of an address are only retrieved once.
 
     for utxo in utxodata:
         spenttx = 0
@@ -494,6 +637,8 @@ def utxo_check(utxodata: list, access_wallet: str=None, quiet: bool=False, debug
         addresses = bu.get_utxo_addresses(output)
         if debug:
             print("Checking UTXO: str: {}, output: {}, addresses: {}.".format(utxostr, output, addresses))
+        if use_index:
+            spending_tx = spending_txes.get((txid, vout))
 
         for address in addresses:
             if not quiet:
@@ -501,20 +646,24 @@ def utxo_check(utxodata: list, access_wallet: str=None, quiet: bool=False, debug
                 if not eu.is_mine(address):
                     ei.print_red("Warning: Address is not part of the current wallet. Results are likely to be incomplete.")
 
-            if access_wallet is not None:
-                txes = dbu.get_all_transactions(address=address, datadir=datadir, advanced=True, unconfirmed=False, debug=debug)
+            if use_index:
+                txes = [spending_tx] if spending_tx is not None else []
+            elif address in address_txes:
+                txes = address_txes[address]
+            elif access_wallet is not None:
+                txes = address_txes[address] = dbu.get_all_transactions(address=address, datadir=datadir, advanced=True, unconfirmed=False, debug=debug)
             else:
-                txes = get_address_transactions(addr_string=address, advanced=True, include_p2th=True, unconfirmed=False, debug=debug)
+                txes = address_txes[address] = get_address_transactions(addr_string=address, advanced=True, include_p2th=True, unconfirmed=False, debug=debug)
             if not txes:
                 continue
-            elif not quiet:
+            elif not quiet and not use_index:
                 print("Searching utxo in", len(txes), "transactions ...")
             for tx in txes:
                 if debug:
                     print("Searching TX:", tx.get("txid"))
-                if bu.utxo_in_tx(utxo, tx):
+                if use_index or bu.utxo_in_tx(utxo, tx):
                     try:
-                        blockheight = provider.getblock(tx["blockhash"])["height"]
+                        blockheight = tx["height"] if use_index else bu.blockhash_to_height(tx["blockhash"])
                     except:
                         blockheight = 0
                     if not quiet:
@@ -12,6 +12,7 @@ import pacli.extended.interface as ei
 import pacli.extended.config as ce
 import pacli.extended.queries as eq
 import pacli.extended.handling as eh
+from pacli.rpc.profiler import profiler
 from pacli.provider import provider
 from pacli.config import Settings
 
@@ -54,6 +55,7 @@ def all_balances(address: str=None,
     # TODO: currently -w mode shows too few balances, even addresses with token balances are omitted.
 
     # address = ke.get_main_address() if address is None else address
+    timer = profiler.timer("all_balances")
     ownership = True if not wallet_only else False
     if no_tokens:
         decks = []
@@ -73,6 +75,7 @@ def all_balances(address: str=None,
                                         Settings.production)
     if advanced is True and not no_tokens:
         decks = get_initialized_decks(decks, debug=debug)
+    timer.lap("decks")
 
     if debug:
         print("Retrieving addresses and/or labels ...")
@@ -110,6 +113,7 @@ def all_balances(address: str=None,
                                                 balances=balances,
                                                 ownership=ownership,
                                                 debug=debug)
+    timer.lap("addresses")
 
     # NOTE: default view needs no deck labels
     # NOTE2: Quiet mode doesn't show labels.
@@ -143,6 +147,7 @@ def all_balances(address: str=None,
             if debug:
                 print("Warning: Omitting deck with initialization problem:", deck.id)
             continue
+    timer.lap("token balances")
 
     if not empty:
         non_empty_addresses = []
@@ -413,11 +418,13 @@ def get_valid_cardissues(deck: object, sender: str=None, only_wallet: bool=False
         raise eh.PacliInputDataError("Deck not initialized. Initialize it with 'pacli deck init DECK'")
 
     claim_cards = []
+    if only_wallet: # the senders of all CardIssues are checked together.
+        ownership = eu.are_mine([c.sender for c in ds.valid_cards if c.type == "CardIssue"], debug=debug)
     for card in ds.valid_cards:
         if card.type == "CardIssue":
             if (((sender is not None) and (card.sender == sender))
             or (only_wallet and (card.sender in wallet_senders))
-            or (only_wallet and eu.is_mine(card.sender, debug=debug) and not card.sender in excluded_senders)
+            or (only_wallet and ownership[card.sender] and not card.sender in excluded_senders)
             or ((sender is None) and not only_wallet)):
                 claim_cards.append(card)
                 if debug:
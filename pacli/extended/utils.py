@@ -1,4 +1,5 @@
 import re, hashlib, datetime
+import os, time, sqlite3, threading
 from decimal import Decimal
 import pypeerassets as pa
 from prettyprinter import cpprint as pprint
@@ -15,7 +16,8 @@ import pacli.extended.interface as ei
 import pacli.extended.handling as eh
 from pacli.extended.constants import ALLOWED_CHARACTERS
 from pacli.provider import provider
-from pacli.config import Settings
+from pacli.config import Settings, conf_dir
+from pacli.rpc.batch import batch_query
 
 # Utils which are used by both at and dt (and perhaps normal) tokens.
 
@@ -37,6 +39,10 @@ def init_deck(network: str, deckid: str, label: str=None, rescan: bool=True, qui
         err = provider.importprivkey(deck.p2th_wif, deck.id, rescan)
         if type(err) == dict and err.get("code") == -13:
             raise eh.PacliDataError("Wallet locked, initializing deck is not possible. Please unlock the wallet and repeat the command.")
+        ownership_cache.forget([deck.p2th_address])
+        if rescan: # the transactions of the P2TH address are added to the wallet.
+            from pacli.extended.wallet_index import wallet_index # imported here to avoid a circular import
+            wallet_index.rescan()
         if not quiet:
             print("Importing P2TH address from deck.")
     else:
@@ -299,13 +305,108 @@ def is_possible_address(address: str, network_name: str=Settings.network, valida
         # raise eh.PacliInputDataError("No valid address string or non-existing label.")
         return False
 
+# Ownership checks
+# is_mine and are_mine share a cache of the ownership of addresses. When more than SEED_ADDRESSES unknown addresses
+# are checked at once, it is seeded with the address set of the wallet (a single listreceivedbyaddress call).
+# Other addresses, and all addresses of smaller checks before, are checked with validateaddress in batches.
+# Wallet addresses stay in the wallet, so they're cached during the whole process and optionally
+# on disk (setting ownership_cache_disk). The addresses on disk are deleted if the first of them is not part of
+# the wallet of the client, i.e. if pacli is used with another wallet.
+# Other addresses can be added to the wallet later (e.g. importprivkey), so they're checked again after NOT_MINE_SECONDS.
+# Failed checks are not cached.
+
+OWNERSHIPFILE = os.path.join(conf_dir, "ownership.db")
+NOT_MINE_SECONDS = 60
+SEED_ADDRESSES = 5
+
+
+class OwnershipCache:
+
+    def __init__(self, diskfile: str=None):
+
+        self.mine = set()
+        self.not_mine = {} # address : time of the check
+        self.seeded = False
+        self.diskfile = diskfile
+        self.db = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> None:
+        if self.db is None:
+            self.db = sqlite3.connect(self.diskfile, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS mine (network TEXT, address TEXT, PRIMARY KEY (network, address))")
+
+    def seed(self) -> None:
+        # the caller holds the lock.
+        addresses = [e["address"] for e in provider.listreceivedbyaddress(0, True)]
+        if self.diskfile is not None:
+            self.connect()
+            stored = [row[0] for row in self.db.execute("SELECT address FROM mine WHERE network = ? ORDER BY rowid", (Settings.network,))]
+            if stored and stored[0] not in addresses and provider.validateaddress(stored[0]).get("ismine") != True:
+                with self.db:
+                    self.db.execute("DELETE FROM mine WHERE network = ?", (Settings.network,))
+                stored = []
+            addresses += stored
+        self.add(addresses)
+        self.seeded = True
+
+    def add(self, addresses: list) -> None:
+        # the caller holds the lock.
+        new = set(addresses) - self.mine
+        self.mine.update(new)
+        for address in new:
+            self.not_mine.pop(address, None)
+        if new and self.diskfile is not None:
+            self.connect()
+            with self.db:
+                self.db.executemany("INSERT OR IGNORE INTO mine VALUES (?, ?)", [(Settings.network, a) for a in new])
+
+    def check(self, addresses: list, debug: bool=False) -> dict:
+        """Returns a dict address : True if the address is part of the wallet."""
+
+        with self.lock:
+            now = time.time()
+            unknown = [a for a in dict.fromkeys(addresses) if a not in self.mine
+                       and now - self.not_mine.get(a, -NOT_MINE_SECONDS) >= NOT_MINE_SECONDS]
+            if not self.seeded and len(unknown) > SEED_ADDRESSES:
+                try:
+                    self.seed()
+                except Exception as e: # e.g. a client error; the addresses are checked with validateaddress.
+                    if debug:
+                        print("Wallet address set not available:", e)
+                unknown = [a for a in unknown if a not in self.mine]
+
+        try:
+            validations = batch_query("validateaddress", [[a] for a in unknown], debug=debug)
+        except Exception as e:
+            if debug:
+                print("Ownership check failed:", e)
+            validations = [None] * len(unknown)
+
+        with self.lock:
+            self.add([a for a, v in zip(unknown, validations) if type(v) == dict and v.get("ismine") == True])
+            for address, validation in zip(unknown, validations):
+                if type(validation) == dict and "isvalid" in validation and validation.get("ismine") != True:
+                    self.not_mine[address] = now
+            return {a : a in self.mine for a in addresses}
+
+    def forget(self, addresses: list) -> None:
+        """Discards cached negative results, e.g. after importing keys into the wallet."""
+
+        with self.lock:
+            for address in addresses:
+                self.not_mine.pop(address, None)
+
+
+ownership_cache = OwnershipCache(diskfile=OWNERSHIPFILE if Settings.ownership_cache_disk else None)
+
+
 def is_mine(address: str, debug: bool=False) -> bool:
-    try:
-        if provider.validateaddress(address).get("ismine") == True:
-            return True
-    except:
-        pass
-    return False
+    return ownership_cache.check([address], debug=debug)[address]
+
+def are_mine(addresses: list, debug: bool=False) -> dict:
+    """Returns a dict address : True if the address is part of the wallet, for many addresses at once."""
+    return ownership_cache.check(addresses, debug=debug)
 
 def get_p2th_dict(decks: list=None, check_auxiliary: bool=False) -> dict:
     pa_params = param_query(Settings.network)
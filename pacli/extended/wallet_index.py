@@ -0,0 +1,312 @@
+# Wallet transaction index
+# Local index of the wallet transactions, so the wallet and address queries don't need to retrieve all
+# wallet entries and raw transactions from the client in every command.
+# For each transaction it stores the wallet entries (account and category), the block hash and height,
+# the senders, the outputs (addresses and value) and the spent outputs (inputs).
+# The addresses table maps each address to the transactions where it is a sender or receiver, with the value
+# sent or received, so the transactions of an address or the wallet are found without reading the transactions.
+# The spent table maps the spent outputs (txid, vout) to the transactions spending them.
+# It is stored in a SQLite database in the configuration directory and updated incrementally when it is used:
+# listsinceblock returns the wallet transactions after the last stable block, i.e. the block before
+# the oldest transaction whose entries can still change (unconfirmed or immature coinbase transactions).
+# These transactions are indexed again with their current entries; transactions which disappeared
+# (e.g. double spends) are deleted. If the last stable block was orphaned by a chain reorganization,
+# the transactions from the fork on are indexed again.
+# Transactions added to the wallet in old blocks by a rescan are found by checking all wallet transactions
+# again in the next update: pacli does it after its own imports (see rescan()). Imports done outside pacli
+# need a deletion of walletindex.db, which is rebuilt then.
+# The index belongs to the wallet which owns one of its receiving addresses (state 'wallet_address'). If the client
+# uses another wallet (e.g. another wallet.dat or data directory), all wallet transactions are checked again
+# and the transactions of the old wallet are deleted.
+# The index is used with RPC node providers if the setting 'wallet_index' is True.
+
+import os
+import json
+import sqlite3
+import threading
+from pacli.config import conf_dir, Settings
+from pacli.provider import provider
+import pacli.blockexp.utils as bu
+from pacli.rpc.aio import async_provider
+import pacli.rpc.aio as aio
+
+WALLETINDEXFILE = os.path.join(conf_dir, "walletindex.db")
+# the index is rebuilt if it was created with another version.
+VERSION = 3
+
+# categories of transactions whose entries can change later
+MUTABLE_CATEGORIES = ("immature",)
+# categories of the entries whose address belongs to the wallet
+OWN_CATEGORIES = ("receive", "generate", "immature")
+
+
+class WalletIndex:
+
+    def __init__(self, filename: str=None):
+
+        self.filename = filename if filename is not None else WALLETINDEXFILE
+        self.db = None
+        self.lock = threading.Lock()
+        self.tip = None # height of the last block, set by update()
+
+    def connect(self) -> None:
+        if self.db is None:
+            self.db = sqlite3.connect(self.filename, check_same_thread=False)
+            # the index can always be rebuilt from the client, so commits don't need to wait for the disk.
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA synchronous=NORMAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS txes (txid TEXT PRIMARY KEY, blockhash TEXT, height INTEGER, entries TEXT, senders TEXT, outputs TEXT, inputs TEXT)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS txes_height ON txes (height)")
+            # role: sender or receiver, value: sum of the inputs or outputs of the address in the transaction.
+            self.db.execute("CREATE TABLE IF NOT EXISTS addresses (address TEXT, txid TEXT, role TEXT, value REAL)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS addresses_address ON addresses (address)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS addresses_txid ON addresses (txid)")
+            self.db.execute("CREATE TABLE IF NOT EXISTS spent (txid TEXT, vout INTEGER, spending_txid TEXT)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS spent_outpoint ON spent (txid, vout)")
+            self.db.execute("CREATE INDEX IF NOT EXISTS spent_spending_txid ON spent (spending_txid)")
+            if self.get_state("network") != Settings.network or self.get_state("version") != str(VERSION):
+                with self.db:
+                    self.db.execute("DELETE FROM txes")
+                    self.db.execute("DELETE FROM addresses")
+                    self.db.execute("DELETE FROM spent")
+                    self.db.execute("DELETE FROM state")
+                    self.set_state("network", Settings.network)
+                    self.set_state("version", VERSION)
+
+    def get_state(self, key: str) -> str:
+        row = self.db.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def set_state(self, key: str, value: object) -> None:
+        self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (key, None if value is None else str(value)))
+
+    def available(self) -> bool:
+        return Settings.wallet_index and Settings.provider.lower() in ("rpcnode", "slm_rpcnode", "record", "replay")
+
+    def update(self, debug: bool=False) -> bool:
+        """Adds the new wallet transactions to the index. Returns False if the index can't be used with the current provider."""
+
+        if not self.available():
+            return False
+
+        with self.lock:
+            self.connect()
+            since_height = self.get_state("since_height")
+            since_height = int(since_height) if since_height is not None else None
+            since_hash = self.get_state("since_hash")
+            if since_height is not None and not self.same_wallet():
+                if debug:
+                    print("The client uses another wallet. Checking all wallet transactions.")
+                since_height, since_hash = None, None
+            # the block hashes are compared with the client, the header index could still contain orphaned blocks.
+            if since_height is not None and provider.getblockhash(since_height) != since_hash:
+                since_height = self.find_fork(since_height) - 1
+                since_hash = provider.getblockhash(since_height) if since_height >= 0 else None
+                if debug:
+                    print("Chain reorganization found. Indexing wallet transactions again from height {} on.".format(since_height + 1))
+
+            result = provider.listsinceblock(since_hash) if since_hash is not None else provider.listsinceblock()
+            if type(result) != dict or "transactions" not in result:
+                if debug:
+                    print("The wallet index can't be used, listsinceblock failed:", result)
+                return False
+            self.tip = bu.blockhash_to_height(result["lastblock"])
+
+            entries = {} # txid : [[account, category], ...]
+            blocks = {} # txid : (blockhash, height)
+            for entry in result["transactions"]:
+                entries.setdefault(entry["txid"], []).append([entry.get("account", ""), entry["category"]])
+                if entry.get("confirmations", 0) > 0 and "blockhash" in entry:
+                    blocks[entry["txid"]] = (entry["blockhash"], self.tip - entry["confirmations"] + 1)
+
+            # transactions after the stable block are replaced.
+            if since_height is None:
+                old_txids = {r[0] for r in self.db.execute("SELECT txid FROM txes")}
+            else:
+                old_txids = {r[0] for r in self.db.execute("SELECT txid FROM txes WHERE height IS NULL OR height > ?", (since_height,))}
+            known_txids = {r[0] for r in self.db.execute("SELECT txid FROM txes")}
+            new_txids = [t for t in entries if t not in known_txids]
+            if debug:
+                print("Wallet index: {} transactions checked, {} new.".format(len(entries), len(new_txids)))
+            records = aio.run(get_records(new_txids))
+
+            with self.db:
+                deleted_txids = [(t,) for t in old_txids - set(entries)]
+                self.db.executemany("DELETE FROM txes WHERE txid = ?", deleted_txids)
+                self.db.executemany("DELETE FROM addresses WHERE txid = ?", deleted_txids)
+                self.db.executemany("DELETE FROM spent WHERE spending_txid = ?", deleted_txids)
+                self.db.executemany("INSERT INTO txes VALUES (?, NULL, NULL, '[]', ?, ?, ?)",
+                                    [(r["txid"], json.dumps(r["senders"]), json.dumps(r["outputs"]), json.dumps(r["inputs"])) for r in records])
+                self.db.executemany("INSERT INTO addresses VALUES (?, ?, ?, ?)", [row for r in records for row in address_rows(r)])
+                self.db.executemany("INSERT INTO spent VALUES (?, ?, ?)", [(txid, vout, r["txid"]) for r in records for txid, vout in r["inputs"] or []])
+                self.db.executemany("UPDATE txes SET blockhash = ?, height = ?, entries = ? WHERE txid = ?",
+                                    [blocks.get(t, (None, None)) + (json.dumps(e), t) for t, e in entries.items()])
+
+                # the next update starts at the block before the oldest transaction which can still change.
+                mutable_heights = [r[0] for r in self.db.execute("SELECT height FROM txes WHERE height IS NOT NULL AND ({})".format(
+                                   " OR ".join(["entries LIKE ?"] * len(MUTABLE_CATEGORIES))), ['%"{}"%'.format(c) for c in MUTABLE_CATEGORIES])]
+                since_height = min(mutable_heights + [self.tip + 1]) - 1
+                self.set_state("since_height", since_height)
+                self.set_state("since_hash", provider.getblockhash(since_height) if since_height >= 0 else None)
+                if since_hash is None: # all wallet transactions were checked
+                    own = [e["address"] for e in result["transactions"] if e["category"] in OWN_CATEGORIES and e.get("address")]
+                    self.set_state("wallet_address", own[0] if own else None)
+        return True
+
+    def same_wallet(self) -> bool:
+        # without a receiving address, all wallet transactions are checked in each update.
+        address = self.get_state("wallet_address")
+        if address is None:
+            return False
+        validation = provider.validateaddress(address)
+        return type(validation) == dict and validation.get("ismine") is True
+
+    def rescan(self) -> None:
+        """Makes the next update check all wallet transactions, e.g. after keys were imported with a rescan."""
+
+        if not os.path.exists(self.filename): # nothing indexed yet
+            return
+        with self.lock:
+            self.connect()
+            with self.db:
+                self.set_state("since_height", None)
+                self.set_state("since_hash", None)
+
+    def find_fork(self, height: int) -> int:
+        # binary search for the first indexed block which is not part of the current chain.
+        blocks = self.db.execute("SELECT DISTINCT height, blockhash FROM txes WHERE height <= ? ORDER BY height", (height,)).fetchall()
+        if not blocks or provider.getblockhash(blocks[0][0]) != blocks[0][1]:
+            return 0
+        low, high = 0, len(blocks)
+        while low < high:
+            middle = (low + high) // 2
+            if provider.getblockhash(blocks[middle][0]) == blocks[middle][1]:
+                low = middle + 1
+            else:
+                high = middle
+        # all blocks above the last block of the current chain can be orphaned.
+        return blocks[low - 1][0] + 1
+
+    def transactions(self) -> list:
+        """Returns all indexed transactions, ordered by txid (descending)."""
+
+        with self.lock:
+            self.connect()
+            rows = self.db.execute("SELECT txid, blockhash, height, entries, senders, outputs, inputs FROM txes ORDER BY txid DESC").fetchall()
+        return [row_to_record(row) for row in rows]
+
+    def address_entries(self, addresses: list, roles: tuple=("sender", "receiver")) -> list:
+        """Returns the indexed transactions where one of the addresses has one of the roles (sender, receiver),
+           ordered by height (unconfirmed last). The records contain txid, blockhash, height, the wallet entries
+           and the values of both roles (sum of the inputs or outputs of the addresses in the transaction)."""
+
+        # the addresses are passed as a JSON array, as SQLite limits the number of parameters of a statement.
+        addresses = json.dumps(list(addresses))
+        params = (addresses,)
+        condition = ""
+        if set(roles) != {"sender", "receiver"}:
+            condition = "AND a.txid IN (SELECT txid FROM addresses WHERE address IN (SELECT value FROM json_each(?)) AND role IN ({})) ".format(",".join("?" * len(roles)))
+            params += (addresses,) + tuple(roles)
+        records = {}
+        with self.lock:
+            self.connect()
+            rows = self.db.execute("SELECT t.txid, t.blockhash, t.height, t.entries, a.role, SUM(a.value) FROM addresses a JOIN txes t ON a.txid = t.txid "
+                                   "WHERE a.address IN (SELECT value FROM json_each(?)) " + condition +
+                                   "GROUP BY t.txid, a.role ORDER BY t.height IS NULL, t.height, t.txid", params).fetchall()
+        for txid, blockhash, height, entries, role, value in rows:
+            if txid not in records:
+                records[txid] = {"txid" : txid, "blockhash" : blockhash, "height" : height, "entries" : json.loads(entries), "values" : {}}
+            records[txid]["values"][role] = value
+        return list(records.values())
+
+    def find_txids(self, searchstring: str, only_start: bool=False) -> list:
+        """Returns the txids of the wallet transactions containing (or starting with) a string."""
+
+        pattern = searchstring.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = pattern + "%" if only_start else "%" + pattern + "%"
+        with self.lock:
+            self.connect()
+            return [r[0] for r in self.db.execute("SELECT txid FROM txes WHERE txid LIKE ? ESCAPE '\\'", (pattern,))]
+
+    def find_spending_tx(self, txid: str, vout: int) -> dict:
+        """Returns the confirmed wallet transaction spending an output, or None if it's not in the index."""
+        return self.find_spending_txes([(txid, vout)]).get((txid, vout))
+
+    def find_spending_txes(self, outpoints: list) -> dict:
+        """Returns a dict (txid, vout) : record of the confirmed wallet transactions spending the outputs.
+           Outputs not spent by an indexed transaction are missing."""
+
+        outpoints = set([(txid, int(vout)) for txid, vout in outpoints])
+        txids = sorted(set([txid for txid, vout in outpoints]))
+        result = {}
+        with self.lock:
+            self.connect()
+            # SQLite limits the number of parameters of a statement.
+            for i in range(0, len(txids), 500):
+                chunk = txids[i:i + 500]
+                rows = self.db.execute("SELECT s.txid, s.vout, t.txid, t.blockhash, t.height, t.entries, t.senders, t.outputs, t.inputs "
+                                       "FROM spent s JOIN txes t ON s.spending_txid = t.txid "
+                                       "WHERE t.height IS NOT NULL AND s.txid IN ({})".format(",".join("?" * len(chunk))), chunk).fetchall()
+                for row in rows:
+                    if (row[0], row[1]) in outpoints:
+                        result[(row[0], row[1])] = row_to_record(row[2:])
+        return result
+
+    def as_tx(self, record: dict) -> dict:
+        """Transaction dict with the keys used by the wallet queries: txid, confirmations (if confirmed),
+           vout (addresses and value of the outputs) and senders (as returned by bu.find_tx_senders).
+           vout and senders are missing if the transaction couldn't be read or the record doesn't contain them."""
+
+        tx = {"txid" : record["txid"]}
+        if record["height"] is not None:
+            tx.update({"confirmations" : self.tip - record["height"] + 1, "blockhash" : record["blockhash"]})
+        if record.get("outputs") is not None:
+            tx.update({"vout" : [{"value" : value, "scriptPubKey" : {"addresses" : addresses} if addresses else {}}
+                                 for addresses, value in record["outputs"]]})
+        if record.get("senders") is not None:
+            tx.update({"senders" : record["senders"]})
+        return tx
+
+
+def row_to_record(row: tuple) -> dict:
+    txid, blockhash, height, entries, senders, outputs, inputs = row
+    return {"txid" : txid, "blockhash" : blockhash, "height" : height, "entries" : json.loads(entries),
+            "senders" : json.loads(senders), "outputs" : json.loads(outputs), "inputs" : json.loads(inputs)}
+
+
+def address_rows(record: dict) -> list:
+    # (address, txid, role, value) rows of the addresses table.
+    values = {}
+    for sender in record["senders"] or []:
+        for address in sender["sender"]:
+            values[(address, "sender")] = values.get((address, "sender"), 0) + sender["value"]
+    for addresses, value in record["outputs"] or []:
+        for address in addresses or []:
+            values[(address, "receiver")] = values.get((address, "receiver"), 0) + value
+    return [(address, record["txid"], role, value) for (address, role), value in values.items()]
+
+
+def get_record(txid: str) -> dict:
+    # the data of a transaction which doesn't change.
+    tx = provider.getrawtransaction(txid, 1)
+    record = {"txid" : txid, "senders" : None, "outputs" : None, "inputs" : []}
+    try:
+        record["senders"] = bu.find_tx_senders(tx)
+    except (KeyError, TypeError):
+        pass
+    try:
+        record["outputs"] = [[output["scriptPubKey"].get("addresses"), output["value"]] for output in tx["vout"]]
+        bu.prevout_cache.add_tx(tx)
+    except (KeyError, TypeError):
+        pass
+    if type(tx) == dict:
+        record["inputs"] = [[vin["txid"], vin["vout"]] for vin in tx.get("vin", []) if "txid" in vin]
+    return record
+
+
+async def get_records(txids: list) -> list:
+    return [record async for record in async_provider.imap(get_record, [(txid,) for txid in txids])]
+
+
+wallet_index = WalletIndex()
@@ -1,5 +1,5 @@
 from pacli.provider import provider
-from pacli.blockexp.utils import get_tx_structure
+from pacli.blockexp.utils import get_tx_structure, blockhash_to_height
 import pacli.extended.txtools as et
 import pacli.extended.handling as eh
 from pacli.config import Settings
@@ -220,7 +220,7 @@ def get_all_transactions(address: str=None,
             complete_tx = provider.getrawtransaction(txid, 1)
             if not advanced:
                 if "blockhash" in complete_tx:
-                    blockheight = provider.getblock(complete_tx["blockhash"])["height"]
+                    blockheight = blockhash_to_height(complete_tx["blockhash"])
                     struct.update({"blockheight" : blockheight})
                 elif unconfirmed is False:
                     continue
@@ -0,0 +1,34 @@
+import fire
+import time
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode, make_server
+
+# Starts a fake node on localhost with a synthetic chain, e.g.:
+# python -m pacli.fakenode --blocks 100000 --txes_per_block 20 --wallet_addresses 5000 --decks 50 --cards_per_block 2 --port 19904
+# To use it with pacli, set 'rpcport' to the port of the fake node (rpcuser and rpcpassword are not checked).
+
+
+def run(port: int=19904, blockfiles: str=None, **chain_params):
+    """Generates a synthetic chain and serves it until interrupted.
+       All parameters of SyntheticChain (blocks, txes_per_block, wallet_addresses, foreign_addresses, decks,
+       at_decks, dt_decks, cards_per_block, donations_per_block, burns_per_block, network, seed ...) can be given.
+       blockfiles: directory to write the chain also as blk*.dat files."""
+
+    start = time.time()
+    chain = SyntheticChain(**chain_params)
+    print("Generated {} blocks with {} transactions ({} wallet entries) in {:.1f} seconds.".format(
+          chain.tip() + 1, len(chain.txes), len(chain.wallet_entries), time.time() - start))
+    if blockfiles:
+        chain.write_block_files(blockfiles)
+        print("Block files written to", blockfiles)
+
+    server = make_server(FakeNode(chain), port=port)
+    print("Fake node listening on port {}.".format(server.server_port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    fire.Fire(run)
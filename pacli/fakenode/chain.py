@@ -0,0 +1,510 @@
+# Synthetic chain generator
+# Creates a deterministic (seeded) Slimcoin-like chain with a wallet, to be served by the fake node.
+# Transactions are serialized like real ones (see blockexp.blkreader), so transaction ids, hex data,
+# decoded transactions and block files are consistent with each other.
+# Generated traffic: coinbase transactions, payments between wallet and foreign addresses, burn transactions,
+# and optionally PeerAssets deck spawns (common, AT and dPoD decks), card issuances and transfers
+# with their P2TH outputs, and donations to the addresses tracked by AT decks.
+# The token transactions need pypeerassets to encode the protobuf metadata and derive the P2TH addresses.
+# Keys are not generated: addresses are random hashes, so the wallet can't sign transactions.
+
+import random
+import datetime
+import pacli.blockexp.blkreader as br
+from pacli.extended.constants import BURN_ADDRESS
+
+COIN = br.COIN
+BLOCK_REWARD = 50 * COIN
+TX_FEE = COIN // 100 # 0.01 coins
+P2TH_FEE = COIN // 100
+MATURITY = 500 # confirmations until coinbase outputs are shown as "generate" instead of "immature"
+SPAWN_HEIGHT = 10 # block of the deck spawns, the coinbase outputs of the blocks before go to the wallet
+
+# fallback address prefixes (p2pkh, p2sh) if pypeerassets is not available
+PREFIXES = {"tslm" : (b"\x6f", b"\xc4"), "tppc" : (b"\x6f", b"\xc4"), "slm" : (b"\x3f", b"\x7d")}
+
+
+def p2pkh_script(h160: bytes) -> bytes:
+    return b"\x76\xa9\x14" + h160 + b"\x88\xac"
+
+def nulldata_script(data: bytes) -> bytes:
+    push = bytes([len(data)]) if len(data) < 0x4c else b"\x4c" + bytes([len(data)])
+    return b"\x6a" + push + data
+
+
+class SyntheticChain:
+
+    def __init__(self,
+                 blocks: int=1000,
+                 txes_per_block: int=5,
+                 wallet_addresses: int=100,
+                 foreign_addresses: int=1000,
+                 labeled_accounts: int=10,
+                 wallet_share: float=0.5,
+                 burns_per_block: float=0.1,
+                 decks: int=0,
+                 at_decks: int=0,
+                 dt_decks: int=0,
+                 cards_per_block: float=0,
+                 transfer_share: float=0.5,
+                 donations_per_block: float=0,
+                 network: str="tslm",
+                 production: bool=True,
+                 block_interval: int=90,
+                 start_time: int=1600000000,
+                 seed: int=0):
+        """Generates a chain of the given number of blocks (after the genesis block).
+           Values per block can be fractions, e.g. 0.1 burns per block is one burn transaction every 10 blocks on average.
+           wallet_share is the probability that a payment involves a wallet address."""
+
+        self.rng = random.Random(seed)
+        self.scripts = {} # address : output script
+        self.network = network
+        self.production = production
+        self.block_interval = block_interval
+        self.start_time = start_time
+        self.p2pkh_prefix, self.p2sh_prefix = self.get_prefixes(network)
+
+        self.blocks = [] # (blockhash, time, txids) per height
+        self.block_heights = {} # blockhash : height
+        self.txes = {} # txid : (height, raw transaction), height None in the mempool
+        self.mempool = [] # txids
+        self.utxos = {} # (txid, n) : (address, value in satoshis, height, coinbase)
+        self.address_utxos = {} # address : set of outpoints
+        self.spendable = {True : [], False : []} # outpoints which can be spent by the generator, of wallet (True) and foreign addresses
+        self.spendable_index = {}
+
+        # wallet: address : account, and wallet transactions in the format of listtransactions
+        self.wallet = {}
+        self.wallet_entries = [] # (height, entry without confirmations)
+        self.burns = [] # (txid, height, amount)
+
+        self.accounts = [""] + ["account{}".format(i) for i in range(labeled_accounts)]
+        self.wallet_addresses = [self.new_address() for i in range(wallet_addresses)]
+        for address in self.wallet_addresses:
+            self.wallet[address] = self.rng.choice(self.accounts)
+        self.foreign_addresses = [self.new_address() for i in range(foreign_addresses)]
+        self.payment_addresses = set(self.wallet_addresses + self.foreign_addresses)
+        self.burn_address = BURN_ADDRESS.get(network)
+
+        self.token_decks = [] # decks for card transfers: dicts with deck, issuer, balances
+        self.at_addresses = [] # addresses tracked by AT decks
+        self.token_network = None
+        try:
+            self.init_tokens()
+        except ImportError:
+            # without pypeerassets only coin transactions can be generated.
+            if decks or at_decks or dt_decks:
+                raise
+
+        self.add_block([self.coinbase_tx(0)]) # genesis block
+        for height in range(1, blocks + 1):
+            self.generate_block(height, txes_per_block, wallet_share, burns_per_block, cards_per_block, transfer_share, donations_per_block,
+                                spawns=(decks, at_decks, dt_decks) if height == SPAWN_HEIGHT else None)
+
+    # addresses and scripts
+
+    def get_prefixes(self, network: str) -> tuple:
+        try:
+            from pypeerassets.networks import net_query
+            prefixes = net_query(network).base58_raw_prefixes
+            return bytes(prefixes["p2pkh"]), bytes(prefixes["p2sh"])
+        except ImportError:
+            return PREFIXES[network]
+
+    def new_address(self) -> str:
+        return br.b58check(self.p2pkh_prefix + self.rng.randbytes(20))
+
+    def address_script(self, address: str) -> bytes:
+        if address not in self.scripts:
+            payload = br.b58decode_check(address)
+            if payload[:1] == self.p2sh_prefix:
+                self.scripts[address] = b"\xa9\x14" + payload[1:] + b"\x87"
+            else:
+                self.scripts[address] = p2pkh_script(payload[1:])
+        return self.scripts[address]
+
+    def block_time(self, height: int) -> int:
+        return self.start_time + height * self.block_interval
+
+    # transaction creation
+
+    def coinbase_tx(self, height: int) -> bytes:
+        # the height in the coinbase script makes the transaction unique.
+        if height <= SPAWN_HEIGHT or self.rng.random() < 0.2:
+            miner = self.rng.choice(self.wallet_addresses)
+        else:
+            miner = self.rng.choice(self.foreign_addresses)
+        script = b"\x04" + height.to_bytes(4, "little")
+        return br.serialize_tx(1, self.block_time(height), [(None, 0, script)], [(BLOCK_REWARD, self.address_script(miner))])
+
+    def pick_utxo(self, wallet: bool=None) -> tuple:
+        """Picks a random spendable output, optionally only wallet outputs (True) or foreign outputs (False)."""
+        if wallet is None:
+            total = len(self.spendable[True]) + len(self.spendable[False])
+            wallet = self.rng.randrange(total) < len(self.spendable[True]) if total > 0 else True
+        pool = self.spendable[wallet]
+        return pool[self.rng.randrange(len(pool))] if pool else None
+
+    def address_utxo(self, address: str) -> tuple:
+        spendable = [o for o in self.address_utxos.get(address, ()) if o in self.spendable_index]
+        return min(spendable) if spendable else None
+
+    def add_spendable(self, outpoint: tuple, address: str) -> None:
+        pool = self.spendable[address in self.wallet]
+        self.spendable_index[outpoint] = len(pool)
+        pool.append(outpoint)
+
+    def remove_spendable(self, outpoint: tuple) -> None:
+        index = self.spendable_index.pop(outpoint, None)
+        if index is None:
+            return
+        pool = self.spendable[self.utxos[outpoint][0] in self.wallet]
+        last = pool.pop()
+        if last != outpoint:
+            pool[index] = last
+            self.spendable_index[last] = index
+
+    def spend_tx(self, height: int, outpoint: tuple, outputs: list) -> bytes:
+        """Spends an output to a list of (script, value) outputs, the rest minus the fee is sent back to the sender as change.
+           Returns None if the output doesn't cover the outputs and the fee.
+           The output can't be picked again, the transaction has to be added to the current block."""
+
+        sender, value = self.utxos[outpoint][:2]
+        change = value - sum([v for s, v in outputs]) - TX_FEE
+        if change < 0:
+            return None
+        if change > 0:
+            outputs = outputs + [(self.address_script(sender), change)]
+        script_sig = b"\x48" + self.rng.randbytes(72) + b"\x21" + self.rng.randbytes(33) # signature and public key placeholders
+        self.remove_spendable(outpoint)
+        return br.serialize_tx(1, self.block_time(height), [(outpoint[0], outpoint[1], script_sig)], [(v, s) for s, v in outputs])
+
+    def payment_tx(self, height: int, wallet_share: float) -> bytes:
+        involves_wallet = self.rng.random() < wallet_share
+        outpoint = self.pick_utxo(wallet=True if involves_wallet and self.rng.random() < 0.5 else None)
+        if outpoint is None:
+            return None
+        receivers = self.wallet_addresses if involves_wallet else self.foreign_addresses
+        value = self.utxos[outpoint][1]
+        amount = self.rng.randint(1, max(value // 2, 1))
+        return self.spend_tx(height, outpoint, [(self.address_script(self.rng.choice(receivers)), amount)])
+
+    def burn_tx(self, height: int) -> bytes:
+        outpoint = self.pick_utxo(wallet=True)
+        if outpoint is None or self.burn_address is None:
+            return None
+        amount = self.rng.randint(1, max(self.utxos[outpoint][1] // 10, 1))
+        return self.spend_tx(height, outpoint, [(self.address_script(self.burn_address), amount)])
+
+    # PeerAssets transactions
+
+    def init_tokens(self) -> None:
+        # the P2TH addresses of PeerAssets are imported into the wallet by pacli.
+        from pypeerassets.pa_constants import param_query
+        self.token_network = param_query(self.network)
+        p2th_addresses = {self.token_network.P2TH_addr : "PAPROD", self.token_network.test_P2TH_addr : "PATEST"}
+        self.wallet.update(p2th_addresses)
+
+    def deck_spawn_tx(self, height: int, deck_type: str) -> tuple:
+        """Creates a deck spawn transaction from a wallet address. Returns the transaction and the deck."""
+        import pypeerassets as pa
+        from pypeerassets.networks import net_query
+        from pypeerassets.at.protobuf_utils import serialize_deck_extended_data
+        from pypeerassets.at.constants import ID_AT, ID_DT
+
+        outpoint = self.pick_utxo(wallet=True)
+        if outpoint is None:
+            return None, None
+        issuer = self.utxos[outpoint][0]
+        name = "{}deck{}".format(deck_type, len(self.token_decks))
+        if deck_type == "at":
+            at_address = self.rng.choice(self.wallet_addresses + self.foreign_addresses)
+            params = {"at_type" : ID_AT, "multiplier" : self.rng.randint(1, 1000), "at_address" : at_address, "addr_type" : 2,
+                      "startblock" : 0, "endblock" : 0, "extradata" : b""}
+            data = serialize_deck_extended_data(net_query(self.network), params=params)
+            self.at_addresses.append(at_address)
+            issue_mode = 0x01 # custom
+        elif deck_type == "dt":
+            params = {"at_type" : ID_DT, "epoch_length" : 1000, "epoch_reward" : 10000, "min_vote" : 0, "sdp_deckid" : b"", "sdp_periods" : 0}
+            data = serialize_deck_extended_data(net_query(self.network), params=params)
+            issue_mode = 0x01
+        else:
+            data = None
+            issue_mode = 0x04 # multi
+        deck = pa.Deck(name, 2, issue_mode, self.network, self.production, 1, data)
+        p2th = self.token_network.P2TH_addr if self.production else self.token_network.test_P2TH_addr
+        tx = self.spend_tx(height, outpoint, [(self.address_script(p2th), P2TH_FEE), (nulldata_script(deck.metainfo_to_protobuf), 0)])
+        if tx is None:
+            return None, None
+        txid = br.sha256d(tx)[::-1].hex()
+        deck = pa.Deck(name, 2, issue_mode, self.network, self.production, 1, data, issuer=issuer, id=txid)
+        self.wallet[deck.p2th_address] = deck.id # pacli imports the P2TH keys of the decks
+        if deck_type == "common":
+            self.token_decks.append({"deck" : deck, "issuer" : issuer, "balances" : {}})
+        return tx, deck
+
+    def card_tx(self, height: int, transfer_share: float) -> bytes:
+        import pypeerassets as pa
+
+        if not self.token_decks:
+            return None
+        token = self.rng.choice(self.token_decks)
+        deck, balances = token["deck"], token["balances"]
+        holders = [a for a, b in balances.items() if b > 0 and a != token["issuer"]]
+        sender, amount = token["issuer"], self.rng.randint(1, 100000)
+        if holders and self.rng.random() < transfer_share:
+            sender = self.rng.choice(holders)
+            amount = self.rng.randint(1, balances[sender])
+        outpoint = self.address_utxo(sender)
+        if outpoint is None:
+            return None
+        receiver = self.rng.choice(self.wallet_addresses + self.foreign_addresses)
+        card = pa.CardTransfer(deck=deck, receiver=[receiver], amount=[amount], version=deck.version)
+        tx = self.spend_tx(height, outpoint, [(self.address_script(deck.p2th_address), P2TH_FEE),
+                                              (nulldata_script(card.metainfo_to_protobuf), 0),
+                                              (self.address_script(receiver), P2TH_FEE)])
+        if tx is not None:
+            if sender != token["issuer"]:
+                balances[sender] -= amount
+            balances[receiver] = balances.get(receiver, 0) + amount
+        return tx
+
+    def donation_tx(self, height: int) -> bytes:
+        # coins sent to the address tracked by an AT deck, which can be claimed as tokens.
+        outpoint = self.pick_utxo(wallet=True)
+        if outpoint is None or not self.at_addresses:
+            return None
+        amount = self.rng.randint(1, max(self.utxos[outpoint][1] // 10, 1))
+        return self.spend_tx(height, outpoint, [(self.address_script(self.rng.choice(self.at_addresses)), amount)])
+
+    # blocks
+
+    def times(self, rate: float) -> int:
+        # number of transactions of a type in a block, for fractional rates randomly rounded.
+        count = int(rate)
+        if self.rng.random() < rate - count:
+            count += 1
+        return count
+
+    def generate_block(self, height: int, txes_per_block: int, wallet_share: float, burns_per_block: float, cards_per_block: float,
+                       transfer_share: float, donations_per_block: float, spawns: tuple=None) -> None:
+
+        txes = [self.coinbase_tx(height)]
+
+        def add(tx):
+            # new outputs are spendable in the next block.
+            if tx is not None:
+                txes.append(tx)
+
+        if spawns is not None:
+            for deck_type, count in zip(("common", "at", "dt"), spawns):
+                for i in range(count):
+                    add(self.deck_spawn_tx(height, deck_type)[0])
+        for i in range(self.times(txes_per_block)):
+            add(self.payment_tx(height, wallet_share))
+        for i in range(self.times(burns_per_block)):
+            add(self.burn_tx(height))
+        for i in range(self.times(cards_per_block)):
+            add(self.card_tx(height, transfer_share))
+        for i in range(self.times(donations_per_block)):
+            add(self.donation_tx(height))
+
+        self.add_block(txes)
+
+    def add_block(self, txes: list) -> None:
+
+        height = len(self.blocks)
+        prevhash = self.blocks[-1][0] if self.blocks else "00" * 32
+        blocktime = self.block_time(height)
+        header = br.serialize_block(prevhash, blocktime, txes)[:80]
+        blockhash = br.sha256d(header)[::-1].hex()
+        txids = []
+        for tx in txes:
+            txids.append(self.add_tx(tx, height))
+        self.blocks.append((blockhash, blocktime, txids))
+        self.block_heights[blockhash] = height
+
+    def add_tx(self, raw: bytes, height: int) -> str:
+        """Adds a transaction to the chain (or the mempool if height is None) and updates outputs and wallet."""
+
+        tx, pos = br.parse_tx(raw, 0, self.p2pkh_prefix, self.p2sh_prefix)
+        txid = tx["txid"]
+        self.txes[txid] = (height, raw)
+        coinbase = "coinbase" in tx["vin"][0]
+
+        sent_from_wallet, sent_value = False, 0
+        for vin in tx["vin"]:
+            if "txid" not in vin:
+                continue
+            outpoint = (vin["txid"], vin["vout"])
+            self.remove_spendable(outpoint)
+            address, value = self.utxos.pop(outpoint)[:2]
+            self.address_utxos[address].discard(outpoint)
+            if address in self.wallet:
+                sent_from_wallet = True
+                sent_value += value
+
+        for vout in tx["vout"]:
+            addresses = vout["scriptPubKey"].get("addresses")
+            if not addresses:
+                continue
+            outpoint = (txid, vout["n"])
+            value = round(vout["value"] * COIN)
+            self.utxos[outpoint] = (addresses[0], value, height, coinbase)
+            self.address_utxos.setdefault(addresses[0], set()).add(outpoint)
+            if value > TX_FEE and addresses[0] in self.payment_addresses:
+                self.add_spendable(outpoint, addresses[0])
+            if addresses[0] == self.burn_address:
+                self.burns.append((txid, height, vout["value"]))
+
+        self.add_wallet_entries(tx, height, coinbase, sent_from_wallet, sent_value)
+        return txid
+
+    def add_wallet_entries(self, tx: dict, height: int, coinbase: bool, sent_from_wallet: bool, sent_value: int) -> None:
+        # entries like listtransactions: one per output to the wallet, and for sending transactions one per output to other addresses.
+        blocktime = self.block_time(height) if height is not None else None
+        base = {"txid" : tx["txid"], "time" : tx["time"], "timereceived" : tx["time"]}
+        if height is not None:
+            base.update({"blockindex" : 0, "blocktime" : blocktime})
+        fee = sent_value - sum([round(v["value"] * COIN) for v in tx["vout"]]) if sent_from_wallet else 0
+
+        for vout in tx["vout"]:
+            addresses = vout["scriptPubKey"].get("addresses")
+            address = addresses[0] if addresses else None
+            if sent_from_wallet and address not in self.wallet:
+                entry = dict(base, account="", address=address, category="send", amount=-vout["value"], fee=-round(fee / COIN, 6))
+                self.wallet_entries.append((height, entry))
+            if address in self.wallet:
+                category = "receive" if not coinbase else "generate"
+                entry = dict(base, account=self.wallet[address], address=address, category=category, amount=vout["value"])
+                self.wallet_entries.append((height, entry))
+
+    def send_tx(self, raw: bytes) -> str:
+        """Adds a transaction to the mempool (sendrawtransaction). Raises a ValueError if its inputs can't be spent."""
+
+        tx, pos = br.parse_tx(raw, 0, self.p2pkh_prefix, self.p2sh_prefix)
+        if tx["txid"] in self.txes:
+            raise ValueError("Transaction already in the chain or the mempool.")
+        for vin in tx["vin"]:
+            if (vin.get("txid"), vin.get("vout")) not in self.utxos:
+                raise ValueError("Missing inputs.")
+        self.mempool.append(self.add_tx(raw, None))
+        return tx["txid"]
+
+    def mine_block(self) -> str:
+        """Adds a block with the mempool transactions. Returns the block hash."""
+
+        height = len(self.blocks)
+        coinbase = self.coinbase_tx(height)
+        raws = [coinbase] + [self.txes[t][1] for t in self.mempool]
+        header = br.serialize_block(self.blocks[-1][0], self.block_time(height), raws)[:80]
+        blockhash = br.sha256d(header)[::-1].hex()
+        txids = [self.add_tx(coinbase, height)] + self.mempool
+        for txid in self.mempool:
+            self.txes[txid] = (height, self.txes[txid][1])
+        mined = set(self.mempool)
+        for outpoint, utxo in self.utxos.items():
+            if outpoint[0] in mined:
+                self.utxos[outpoint] = (utxo[0], utxo[1], height, utxo[3])
+        self.wallet_entries = [(height if h is None and e["txid"] in mined else h, e) for h, e in self.wallet_entries]
+        self.blocks.append((blockhash, self.block_time(height), txids))
+        self.block_heights[blockhash] = height
+        self.mempool = []
+        return blockhash
+
+    def reorganize(self, height: int) -> None:
+        """Replaces the blocks from a height on by blocks with the same transactions and other hashes, like a chain reorganization."""
+
+        for h in range(height, len(self.blocks)):
+            oldhash, blocktime, txids = self.blocks[h]
+            del self.block_heights[oldhash]
+            # a later block time changes the hash.
+            header = br.serialize_block(self.blocks[h - 1][0], blocktime + 1, [self.txes[t][1] for t in txids])[:80]
+            blockhash = br.sha256d(header)[::-1].hex()
+            self.blocks[h] = (blockhash, blocktime + 1, txids)
+            self.block_heights[blockhash] = h
+
+    # queries used by the fake node
+
+    def tip(self) -> int:
+        return len(self.blocks) - 1
+
+    def add_address(self, account: str="") -> str:
+        """Adds a new wallet address (getnewaddress)."""
+        address = self.new_address()
+        self.wallet[address] = account
+        self.wallet_addresses.append(address)
+        self.payment_addresses.add(address)
+        return address
+
+    def import_address(self, address: str, account: str="") -> None:
+        """Adds an address to the wallet with the receiving entries of its earlier transactions, like importprivkey with a rescan."""
+
+        self.wallet[address] = account
+        for txid, (height, raw) in self.txes.items():
+            tx = self.get_tx(txid)
+            base = {"txid" : txid, "time" : tx["time"], "timereceived" : tx["time"]}
+            if height is not None:
+                base.update({"blockindex" : 0, "blocktime" : self.block_time(height)})
+            category = "generate" if "coinbase" in tx["vin"][0] else "receive"
+            for vout in tx["vout"]:
+                if vout["scriptPubKey"].get("addresses") == [address]:
+                    self.wallet_entries.append((height, dict(base, account=account, address=address, category=category, amount=vout["value"])))
+        self.wallet_entries.sort(key=lambda e: (e[0] is None, e[0] or 0))
+
+    def confirmations(self, height: int) -> int:
+        return 0 if height is None else self.tip() - height + 1
+
+    def get_block(self, height: int) -> dict:
+        blockhash, blocktime, txids = self.blocks[height]
+        block = {"hash" : blockhash,
+                 "confirmations" : self.confirmations(height),
+                 "height" : height,
+                 "version" : 1,
+                 "time" : datetime.datetime.fromtimestamp(blocktime, datetime.timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC"),
+                 "bits" : "1e0fffff",
+                 "nonce" : 0,
+                 "flags" : "proof-of-work",
+                 "tx" : list(txids)}
+        if height > 0:
+            block.update({"previousblockhash" : self.blocks[height - 1][0]})
+        if height < self.tip():
+            block.update({"nextblockhash" : self.blocks[height + 1][0]})
+        return block
+
+    def get_tx(self, txid: str) -> dict:
+        height, raw = self.txes[txid]
+        tx, pos = br.parse_tx(raw, 0, self.p2pkh_prefix, self.p2sh_prefix)
+        if height is not None:
+            tx.update({"blockhash" : self.blocks[height][0], "confirmations" : self.confirmations(height), "blocktime" : self.blocks[height][1]})
+        return tx
+
+    def entry(self, height: int, entry: dict) -> dict:
+        entry = dict(entry, confirmations=self.confirmations(height))
+        if height is not None:
+            entry.update({"blockhash" : self.blocks[height][0]})
+            if entry["category"] == "generate" and entry["confirmations"] < MATURITY:
+                entry.update({"category" : "immature"})
+        return entry
+
+    def address_balance(self, address: str, minconf: int=1) -> int:
+        return sum([self.utxos[o][1] for o in self.address_utxos.get(address, ()) if self.confirmations(self.utxos[o][2]) >= minconf])
+
+    def write_block_files(self, datadir: str, magic: bytes=bytes.fromhex("cbf2c0ef"), max_file_size: int=128 * 1024 * 1024) -> None:
+        """Writes the chain into blk*.dat files, which can be read with the block file reader."""
+        import os, struct
+
+        fileno, blockfile, size = 1, None, 0
+        for height, (blockhash, blocktime, txids) in enumerate(self.blocks):
+            prevhash = self.blocks[height - 1][0] if height > 0 else "00" * 32
+            block = br.serialize_block(prevhash, blocktime, [self.txes[t][1] for t in txids])
+            if blockfile is None or size + len(block) > max_file_size:
+                if blockfile is not None:
+                    blockfile.close()
+                    fileno += 1
+                blockfile, size = open(os.path.join(datadir, "blk{:04d}.dat".format(fileno)), "wb"), 0
+            blockfile.write(magic + struct.pack("<I", len(block)) + block)
+            size += len(block) + 8
+        if blockfile is not None:
+            blockfile.close()
@@ -0,0 +1,275 @@
+# Fake node
+# Answers the subset of the Slimcoin JSON-RPC interface used by pacli and pypeerassets from a SyntheticChain.
+# It can be used in-process (FakeNode.call and FakeNode.handle, or LocalNode as provider in tests)
+# or as a localhost HTTP server (make_server, start_server),
+# which pacli uses like a real node when 'rpcport' points to it. Single and batch requests are supported,
+# the connections are kept alive. Errors are returned with the codes of the client, e.g. -5 for unknown transactions.
+
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pacli.blockexp.blkreader as br
+from pacli.fakenode.chain import SyntheticChain, COIN
+
+
+class RPCError(Exception):
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def coins(satoshis: int) -> float:
+    return round(satoshis / COIN, 6)
+
+
+class FakeNode:
+
+    def __init__(self, chain: SyntheticChain):
+
+        self.chain = chain
+        self.lock = threading.Lock() # the chain is not thread safe
+        self.calls = {} # method : number of calls
+
+    def handle(self, data: bytes) -> bytes:
+        """Answers a single or batch JSON-RPC request."""
+
+        try:
+            request = json.loads(data)
+        except ValueError:
+            return json.dumps({"result" : None, "error" : {"code" : -32700, "message" : "Parse error"}, "id" : None}).encode()
+        if type(request) == list:
+            return json.dumps([self.respond(r) for r in request]).encode()
+        return json.dumps(self.respond(request)).encode()
+
+    def respond(self, request: dict) -> dict:
+        try:
+            result = self.call(request["method"], *request.get("params", []))
+            return {"result" : result, "error" : None, "id" : request.get("id")}
+        except RPCError as e:
+            return {"result" : None, "error" : {"code" : e.code, "message" : e.message}, "id" : request.get("id")}
+        except (TypeError, ValueError, KeyError) as e:
+            return {"result" : None, "error" : {"code" : -1, "message" : str(e)}, "id" : request.get("id")}
+
+    def call(self, method: str, *params):
+        handler = getattr(self, "rpc_" + str(method), None)
+        if handler is None:
+            raise RPCError(-32601, "Method not found")
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            return handler(*params)
+
+    # blocks and transactions
+
+    def rpc_getblockcount(self):
+        return self.chain.tip()
+
+    def rpc_getblockhash(self, height: int):
+        if not 0 <= height <= self.chain.tip():
+            raise RPCError(-1, "Block number out of range.")
+        return self.chain.blocks[height][0]
+
+    def rpc_getblock(self, blockhash: str, txinfo: bool=False):
+        if type(blockhash) != str or blockhash not in self.chain.block_heights:
+            raise RPCError(-5, "Block not found")
+        block = self.chain.get_block(self.chain.block_heights[blockhash])
+        if txinfo:
+            block.update({"tx" : [self.chain.get_tx(t) for t in block["tx"]]})
+        return block
+
+    def rpc_getrawtransaction(self, txid: str, verbose: int=0):
+        if txid not in self.chain.txes:
+            raise RPCError(-5, "No information available about transaction")
+        if not verbose:
+            return self.chain.txes[txid][1].hex()
+        return self.chain.get_tx(txid)
+
+    def rpc_decoderawtransaction(self, txhex: str):
+        try:
+            tx, pos = br.parse_tx(bytes.fromhex(txhex), 0, self.chain.p2pkh_prefix, self.chain.p2sh_prefix)
+        except Exception:
+            raise RPCError(-22, "TX decode failed")
+        return tx
+
+    def rpc_sendrawtransaction(self, txhex: str, *args):
+        try:
+            return self.chain.send_tx(bytes.fromhex(txhex))
+        except ValueError as e:
+            raise RPCError(-25, str(e))
+
+    def rpc_getmemorypool(self, *args):
+        return {"transactions" : [self.chain.txes[t][1].hex() for t in self.chain.mempool]}
+
+    def rpc_setgenerate(self, generate: bool=True, blocks: int=1):
+        # mines the mempool transactions into new blocks
+        for i in range(blocks if generate else 0):
+            self.chain.mine_block()
+        return None
+
+    def rpc_getinfo(self, *args):
+        return {"version" : "fakenode",
+                "blocks" : self.chain.tip(),
+                "balance" : coins(self.wallet_balance()),
+                "connections" : 0,
+                "testnet" : self.chain.network.startswith("t")}
+
+    def rpc_getburndata(self, *args):
+        return [{"txid" : txid, "blockhash" : self.chain.blocks[height][0] if height is not None else None, "amount" : amount}
+                for txid, height, amount in self.chain.burns]
+
+    # wallet
+
+    def wallet_balance(self, account: str=None, minconf: int=1) -> int:
+        return sum([self.chain.address_balance(a, minconf) for a, acc in self.chain.wallet.items() if account in (None, "*", acc)])
+
+    def rpc_listtransactions(self, account: str="*", count: int=10, start: int=0, *args):
+        entries = [(h, e) for h, e in self.chain.wallet_entries if account == "*" or e["account"] == account]
+        end = len(entries) - start
+        return [self.chain.entry(h, e) for h, e in entries[max(end - count, 0):max(end, 0)]]
+
+    def rpc_listsinceblock(self, blockhash: str="", target_confirmations: int=1):
+        if blockhash and blockhash not in self.chain.block_heights:
+            raise RPCError(-5, "Block not found")
+        since = self.chain.block_heights[blockhash] if blockhash else -1
+        transactions = [self.chain.entry(h, e) for h, e in self.chain.wallet_entries if h is None or h > since]
+        lastblock = self.chain.blocks[max(self.chain.tip() + 1 - target_confirmations, 0)][0]
+        return {"transactions" : transactions, "lastblock" : lastblock}
+
+    def rpc_listunspent(self, minconf: int=1, maxconf: int=9999999, addresses: list=None):
+        addresses = addresses if addresses else [a for a in self.chain.wallet]
+        result = []
+        for address in addresses:
+            for outpoint in sorted(self.chain.address_utxos.get(address, ())):
+                utxo = self.chain.utxos[outpoint]
+                confirmations = self.chain.confirmations(utxo[2])
+                if not minconf <= confirmations <= maxconf:
+                    continue
+                result.append({"txid" : outpoint[0],
+                               "vout" : outpoint[1],
+                               "address" : address,
+                               "account" : self.chain.wallet.get(address, ""),
+                               "scriptPubKey" : self.chain.address_script(address).hex(),
+                               "amount" : coins(utxo[1]),
+                               "confirmations" : confirmations})
+        return result
+
+    def rpc_listaccounts(self, minconf: int=1):
+        # like the client, the default account "" is always listed.
+        accounts = {a : 0 for a in sorted(set(self.chain.wallet.values()) | {""})}
+        for address, account in self.chain.wallet.items():
+            accounts[account] += self.chain.address_balance(address, minconf)
+        return {a : coins(v) for a, v in accounts.items()}
+
+    def rpc_getaddressesbyaccount(self, account: str):
+        return [a for a, acc in self.chain.wallet.items() if acc == account]
+
+    def rpc_listreceivedbyaddress(self, minconf: int=1, includeempty: bool=False):
+        received = {}
+        for height, entry in self.chain.wallet_entries:
+            if entry["category"] != "send" and self.chain.confirmations(height) >= minconf:
+                received[entry["address"]] = received.get(entry["address"], 0) + round(entry["amount"] * COIN)
+        result = []
+        for address, account in self.chain.wallet.items():
+            if address in received or includeempty:
+                result.append({"address" : address, "account" : account, "amount" : coins(received.get(address, 0)),
+                               "confirmations" : 0 if address not in received else 1})
+        return result
+
+    def rpc_getbalance(self, account: str=None, minconf: int=1):
+        if account in self.chain.address_utxos and account not in self.chain.accounts:
+            # an address instead of an account
+            return coins(self.chain.address_balance(account, minconf))
+        return coins(self.wallet_balance(account, minconf))
+
+    def rpc_validateaddress(self, address: str):
+        payload = br.b58decode_check(address)
+        if payload is None or len(payload) != 21 or payload[:1] not in (self.chain.p2pkh_prefix, self.chain.p2sh_prefix):
+            return {"isvalid" : False}
+        result = {"isvalid" : True, "address" : address, "ismine" : address in self.chain.wallet}
+        if address in self.chain.wallet:
+            result.update({"account" : self.chain.wallet[address]})
+        return result
+
+    def rpc_getnewaddress(self, account: str=""):
+        return self.chain.add_address(account)
+
+    def rpc_setaccount(self, address: str, account: str=""):
+        if address not in self.chain.wallet:
+            raise RPCError(-5, "Address not in wallet")
+        self.chain.wallet[address] = account
+        return None
+
+    def rpc_importprivkey(self, privkey: str, account: str="", *args):
+        # keys can't be decoded here. The P2TH addresses of pacli are part of the generated wallet.
+        return None
+
+    def rpc_dumpprivkey(self, address: str):
+        raise RPCError(-4, "Private key for address {} is not known".format(address))
+
+
+class LocalNode:
+    """In-process provider for tests, with the interface of RpcNode: RPC methods are attributes,
+       errors are returned as dicts and batch requests are supported."""
+
+    def __init__(self, node: FakeNode):
+        self.node = node
+
+    def __getattr__(self, method: str):
+        # only the RPC methods, so checks like getattr(provider, "session", None) work.
+        if not hasattr(self.node, "rpc_" + method):
+            raise AttributeError(method)
+
+        def call(*params):
+            try:
+                return self.node.call(method, *params)
+            except RPCError as e:
+                return {"code" : e.code, "message" : e.message}
+        return call
+
+    def batch(self, calls: list) -> list:
+        request = [{"method" : method, "params" : list(params), "id" : i} for i, (method, params) in enumerate(calls)]
+        return json.loads(self.node.handle(json.dumps(request)))
+
+    # methods with the keyword arguments and defaults of RpcNode
+
+    def listtransactions(self, account: str="*", many: int=999, since: int=0):
+        return self.node.call("listtransactions", account, many, since)
+
+    def listunspent(self, address: str=None, minconf: int=1, maxconf: int=999999):
+        return self.node.call("listunspent", minconf, maxconf, [address] if address else None)
+
+    def getbalance(self, account: str=None, minconf: int=6):
+        return self.node.call("getbalance", account, minconf)
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1" # keep-alive connections
+
+    def do_POST(self):
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        response = self.server.node.handle(data)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(node: FakeNode, port: int=0, host: str="127.0.0.1") -> ThreadingHTTPServer:
+    """Returns the HTTP server of a fake node. With port 0, a free port is chosen (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), RequestHandler)
+    server.daemon_threads = True
+    server.node = node
+    return server
+
+
+def start_server(node: FakeNode, port: int=0, host: str="127.0.0.1") -> ThreadingHTTPServer:
+    """Starts the server in a background thread. Stop it with server.shutdown()."""
+    server = make_server(node, port=port, host=host)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,7 +1,7 @@
-from pypeerassets.provider import RpcNode, SlmRpcNode, Cryptoid, Explorer
-from pypeerassets import pautils
-from pacli.config import Settings
+from pacli.config import Settings, conf_dir
+import threading
 import sys
+import os
 
 # MODIFIED: Added Slimcoin support (SlmRpcNode)
 
@@ -11,44 +11,114 @@ def set_up(provider):
     # if provider is local node, check if PA P2TH is loaded in local node
     # this handles indexing of transaction
 
-    if Settings.provider in ("rpcnode", "slm_rpcnode"):
+    if Settings.provider in ("rpcnode", "slm_rpcnode", "record", "replay"):
+        from pypeerassets import pautils
+        imported = False
         try:
             if Settings.production:
                 if not provider.listtransactions("PAPROD"):
                     pautils.load_p2th_privkey_into_local_node(provider)
+                    imported = True
             if not Settings.production:
                 if not provider.listtransactions("PATEST"):
                     pautils.load_p2th_privkey_into_local_node(provider, prod=False)
+                    imported = True
         except:
             print("No connection to client. Your cryptocurrency client is probably not running. Start the client or wait until it starts.")
             sys.exit()
+        if imported: # the import rescans the blockchain for the deck spawns.
+            from pacli.extended.wallet_index import wallet_index
+            wallet_index.rescan()
+
+
+# settings read by configured_provider; the provider is created again if one of them changes (see pacli.daemon).
+PROVIDER_SETTINGS = ("provider", "network", "testnet", "production", "rpcuser", "rpcpassword", "rpcport", "replay_node", "replay_file",
+                     "rpc_pool_size", "scan_workers", "rpc_concurrency", "rpc_timeout", "rpc_connect_timeout", "rpc_adaptive",
+                     "rpc_retries", "rpc_retry_delay", "rpc_cache", "rpc_cache_size", "rpc_cache_disk", "rpc_cache_depth")
+
+
+def provider_settings(Settings) -> dict:
+    return {k : getattr(Settings, k, None) for k in PROVIDER_SETTINGS}
 
 
 def configured_provider(Settings):
     " resolve settings into configured provider "
 
-    if Settings.provider.lower() == "rpcnode":
+    from pypeerassets.provider import RpcNode, SlmRpcNode, Cryptoid, Explorer
+    from pacli.rpc.cache import CachingProvider
+    from pacli.rpc.session import set_pooled_session
+    from pacli.rpc.replay import set_replay_mode
+
+    provider_name = Settings.provider.lower()
+    replay_mode = None
+    if provider_name in ("record", "replay"):
+        # records the RPC traffic of the node set in replay_node, or replays it.
+        replay_mode, provider_name = provider_name, Settings.replay_node.lower()
+
+    if provider_name == "rpcnode":
         _provider = RpcNode
 
-    elif Settings.provider.lower() == "slm_rpcnode":
+    elif provider_name == "slm_rpcnode":
         _provider = SlmRpcNode
 
-    elif Settings.provider.lower() == "cryptoid":
+    elif provider_name == "cryptoid" and replay_mode is None:
         _provider = Cryptoid
 
-    elif Settings.provider.lower() == "explorer":
+    elif provider_name == "explorer" and replay_mode is None:
         _provider = Explorer
 
     else:
         raise Exception('invalid provider.')
 
-    if Settings.provider.lower() not in ("rpcnode", "slm_rpcnode"):
+    if provider_name not in ("rpcnode", "slm_rpcnode"):
         provider = _provider(network=Settings.network)
     else:
         provider = _provider(testnet=Settings.testnet, username=Settings.rpcuser, password=Settings.rpcpassword, ip=None, port=Settings.rpcport, directory=None)
+        set_pooled_session(provider, pool_size=max(Settings.rpc_pool_size, Settings.scan_workers, Settings.rpc_concurrency), timeout=Settings.rpc_timeout, connect_timeout=Settings.rpc_connect_timeout,
+                           adaptive=Settings.rpc_adaptive, retries=Settings.rpc_retries, retry_delay=Settings.rpc_retry_delay)
+        if replay_mode is not None:
+            set_replay_mode(provider, replay_mode, Settings.replay_file or os.path.join(conf_dir, "rpcreplay.json.gz"))
 
     set_up(provider)
 
+    if Settings.rpc_cache and provider_name in ("rpcnode", "slm_rpcnode"):
+        diskfile = os.path.join(conf_dir, "rpccache.db") if Settings.rpc_cache_disk else None
+        provider = CachingProvider(provider, maxsize=Settings.rpc_cache_size, depth=Settings.rpc_cache_depth, diskfile=diskfile)
+
     return provider
 
-provider = configured_provider(Settings)
+
+class LazyProvider:
+    """Proxy which creates the configured provider when it's used first.
+       Commands which don't need the node don't import the provider classes nor connect to the node."""
+
+    # the attributes of the proxy are private, all others are the ones of the provider.
+
+    def __init__(self, Settings):
+
+        self._settings = Settings
+        self._provider = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._provider is None:
+            with self._lock:
+                if self._provider is None:
+                    self._provider = configured_provider(self._settings)
+        return self._provider
+
+    def _reset(self) -> None:
+        # the provider is created again on the next use, e.g. after a change of the settings.
+        with self._lock:
+            self._provider = None
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    @property
+    def __class__(self):
+        # pypeerassets checks the provider type with isinstance.
+        return self._get().__class__
+
+
+provider = LazyProvider(Settings)
@@ -0,0 +1,85 @@
+# Async provider
+# Wallet queries often consist of many independent RPC calls (e.g. one getrawtransaction per wallet transaction).
+# The AsyncProvider runs them concurrently with asyncio. The node interface is blocking, so the calls
+# are executed in a thread pool whose size bounds the concurrency (setting rpc_concurrency);
+# the connections are taken from the keep-alive pool of the node.
+# Results are always returned in the order of the parameters, so the output of the queries is deterministic.
+# The async query variants (e.g. eq.get_address_transactions_async) are called by their synchronous
+# wrappers with aio.run, which also works if a coroutine is already running.
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pacli.provider import provider
+from pacli.config import Settings
+from pacli.rpc.batch import batch_query
+
+
+class AsyncProvider:
+
+    def __init__(self, node, concurrency: int=4):
+
+        self.node = node
+        self.concurrency = max(concurrency, 1)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="rpc")
+        return self.executor
+
+    async def run(self, function, *args):
+        """Runs a blocking function (e.g. a query consisting of several RPC calls) in the thread pool."""
+        return await asyncio.get_running_loop().run_in_executor(self.get_executor(), function, *args)
+
+    def __getattr__(self, method: str):
+        # RPC methods of the node as coroutines, e.g. await async_provider.getrawtransaction(txid, 1)
+        async def call(*params):
+            return await self.run(getattr(self.node, method), *params)
+        return call
+
+    async def map(self, function, args_list: list) -> list:
+        """Calls a function concurrently with each argument tuple. Returns the results in order."""
+        return await asyncio.gather(*[self.run(function, *args) for args in args_list])
+
+    async def query(self, method: str, params_list: list, batch_size: int=None) -> list:
+        """Like batch_query, but the batches are sent concurrently."""
+
+        batch_size = max(Settings.rpc_batch_size if batch_size is None else batch_size, 1)
+        chunks = [params_list[i:i + batch_size] for i in range(0, len(params_list), batch_size)]
+        results = await self.map(batch_query, [(method, chunk, batch_size) for chunk in chunks])
+        return [r for chunk_results in results for r in chunk_results]
+
+    async def imap(self, function, args_list: list, chunk_size: int=None):
+        """Async generator yielding function(*args) for each argument tuple in order.
+           The results are calculated in chunks; the next chunk is requested while the current one is processed."""
+
+        chunk_size = self.concurrency * 10 if chunk_size is None else chunk_size
+        loop = asyncio.get_running_loop()
+        chunks = [args_list[i:i + chunk_size] for i in range(0, len(args_list), chunk_size)]
+
+        def schedule(chunk):
+            return [loop.run_in_executor(self.get_executor(), function, *args) for args in chunk]
+
+        pending = schedule(chunks[0]) if chunks else []
+        for position in range(len(chunks)):
+            current = pending
+            pending = schedule(chunks[position + 1]) if position + 1 < len(chunks) else []
+            for result in await asyncio.gather(*current):
+                yield result
+
+
+def run(coroutine):
+    """Runs a coroutine from synchronous code and returns its result."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    # a synchronous wrapper called inside a coroutine: the new coroutine gets its own loop and thread.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+
+async_provider = AsyncProvider(provider, concurrency=Settings.rpc_concurrency)
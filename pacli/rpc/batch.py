@@ -0,0 +1,47 @@
+# Batched JSON-RPC requests.
+# Block exploring and some wallet queries consist of hundreds or thousands of independent calls.
+# Sending them together in JSON-RPC array requests saves most of the per-call overhead.
+# If the node or the provider doesn't support batches, the calls are sent one by one.
+
+from pacli.provider import provider
+from pacli.config import Settings
+
+# None: not tested yet. Set to False after the first failed batch request.
+batches_supported = None
+
+
+def batch_query(method: str, params_list: list, batch_size: int=None, debug: bool=False) -> list:
+    """Sends a RPC method with many different parameter lists, in chunks of batch_size calls per request.
+       Returns the results in the order of params_list. Failed calls return the error dict, like single calls."""
+
+    global batches_supported
+
+    if batch_size is None:
+        batch_size = Settings.rpc_batch_size
+
+    results = []
+    position = 0
+
+    if batch_size > 1 and batches_supported is not False and hasattr(provider, "batch"):
+        while position < len(params_list):
+            chunk = params_list[position:position + batch_size]
+            try:
+                response = provider.batch([(method, list(params)) for params in chunk])
+                assert type(response) == list and len(response) == len(chunk)
+            except Exception as e:
+                # old nodes answer array requests with an error object or an invalid response.
+                if debug:
+                    print("Batch request for method {} failed ({}). Continuing without batches.".format(method, e))
+                batches_supported = False
+                break
+
+            batches_supported = True
+            response.sort(key=lambda r: r["id"])
+            for item in response:
+                results.append(item["result"] if item.get("error") is None else item["error"])
+            position += len(chunk)
+
+    for params in params_list[position:]:
+        results.append(getattr(provider, method)(*params))
+
+    return results
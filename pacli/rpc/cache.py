@@ -0,0 +1,185 @@
+# Caching provider
+# Proxy around the node which memoizes RPC results that can't change anymore:
+# transactions (raw hex always, decoded ones when they are confirmed deeply enough), blocks and block hashes
+# with at least 'rpc_cache_depth' confirmations. The confirmations of cached transactions and blocks
+# are recalculated from the current block height.
+# The memory tier is a LRU cache with a maximum number of entries (setting rpc_cache_size).
+# Optionally (setting rpc_cache_disk) entries are also stored in a SQLite database in the config directory.
+# New entries are written to disk every SAVE_ENTRIES entries or SAVE_SECONDS seconds, and at exit.
+# Entries from a block height on are deleted if a chain reorganization is detected (see 'checkpoint reorg_check').
+
+import os
+import copy
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from collections import OrderedDict
+
+TIP_TTL = 10 # seconds until the block height is requested again
+SAVE_ENTRIES = 1000 # new entries written to the disk tier at once
+SAVE_SECONDS = 60 # maximum time new entries are kept only in memory
+
+
+class CachingProvider:
+
+    def __init__(self, node, maxsize: int=10000, depth: int=10, diskfile: str=None):
+
+        self.node = node
+        self.maxsize = maxsize
+        self.depth = max(depth, 1)
+        self.entries = OrderedDict() # (method, key) : (height, result)
+        self.hits, self.misses = 0, 0
+        self.lock = threading.Lock()
+        self.tip, self.tip_time = None, 0
+        self.diskfile = diskfile
+        self.db = None
+        self.unsaved = []
+        self.last_save = time.time()
+        if diskfile is not None:
+            atexit.register(self.save)
+
+    def __getattr__(self, name):
+        # all other methods and attributes are the ones of the node.
+        return getattr(self.node, name)
+
+    @property
+    def __class__(self):
+        # pypeerassets checks the provider type with isinstance.
+        return self.node.__class__
+
+    def connect(self) -> None:
+        if self.db is None:
+            self.db = sqlite3.connect(self.diskfile, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS rpccache (method TEXT, key TEXT, height INTEGER, result TEXT, PRIMARY KEY (method, key))")
+
+    def current_height(self) -> int:
+        if self.tip is None or time.time() - self.tip_time > TIP_TTL:
+            self.tip, self.tip_time = self.node.getblockcount(), time.time()
+        return self.tip
+
+    def lookup(self, method: str, key: str) -> tuple:
+        # returns the (height, result) tuple, or None.
+
+        with self.lock:
+            if (method, key) in self.entries:
+                self.entries.move_to_end((method, key))
+                self.hits += 1
+                return self.entries[(method, key)]
+            if self.diskfile is not None:
+                self.connect()
+                row = self.db.execute("SELECT height, result FROM rpccache WHERE method = ? AND key = ?", (method, key)).fetchone()
+                if row is not None:
+                    self.hits += 1
+                    entry = (row[0], json.loads(row[1]))
+                    self.store(method, key, entry)
+                    return entry
+            self.misses += 1
+        return None
+
+    def store(self, method: str, key: str, entry: tuple) -> None:
+        # memory tier only, the caller holds the lock.
+        self.entries[(method, key)] = entry
+        self.entries.move_to_end((method, key))
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def add(self, method: str, key: str, height: int, result) -> None:
+
+        if self.maxsize < 1:
+            return
+        with self.lock:
+            self.store(method, key, (height, result))
+            if self.diskfile is not None:
+                self.unsaved.append((method, key, height, json.dumps(result)))
+                if len(self.unsaved) >= SAVE_ENTRIES or time.time() - self.last_save >= SAVE_SECONDS:
+                    self.write()
+
+    def with_confirmations(self, height: int, result: dict) -> dict:
+        result = copy.deepcopy(result)
+        result.update({"confirmations" : self.current_height() - height + 1})
+        return result
+
+    def confirmed_height(self, result) -> int:
+        # block height of a transaction or block which can be cached, otherwise None.
+        if type(result) != dict or result.get("confirmations", 0) < self.depth:
+            return None
+        return self.current_height() - result["confirmations"] + 1
+
+    def getrawtransaction(self, txid: str, verbose: int=0):
+
+        method = "getrawtransaction" if not verbose else "getrawtransaction_verbose"
+        entry = self.lookup(method, txid)
+        if entry is not None:
+            return entry[1] if not verbose else self.with_confirmations(*entry)
+
+        result = self.node.getrawtransaction(txid, verbose)
+        if not verbose:
+            if type(result) == str: # the transaction data never changes
+                self.add(method, txid, None, result)
+        else:
+            height = self.confirmed_height(result)
+            if height is not None:
+                self.add(method, txid, height, copy.deepcopy(result))
+        return result
+
+    def getblock(self, blockhash: str, decode: bool=False):
+
+        method = "getblock" if not decode else "getblock_decoded"
+        entry = self.lookup(method, blockhash)
+        if entry is not None:
+            return self.with_confirmations(*entry)
+
+        result = self.node.getblock(blockhash, decode)
+        height = self.confirmed_height(result)
+        if height is not None:
+            self.add(method, blockhash, height, copy.deepcopy(result))
+        return result
+
+    def getblockhash(self, height: int):
+
+        entry = self.lookup("getblockhash", str(height))
+        if entry is not None:
+            return entry[1]
+
+        result = self.node.getblockhash(height)
+        if type(result) == str and height <= self.current_height() - self.depth + 1:
+            self.add("getblockhash", str(height), height, result)
+        return result
+
+    def invalidate(self, height: int=None) -> None:
+        """Deletes the entries from a block height on, or all entries depending on the block height if no height is given.
+           Raw transaction data is kept, because it doesn't change in a reorg."""
+
+        height = 0 if height is None else height
+        with self.lock:
+            for key in [k for k, e in self.entries.items() if e[0] is not None and e[0] >= height]:
+                del self.entries[key]
+            self.unsaved = [u for u in self.unsaved if u[2] is None or u[2] < height]
+            if self.diskfile is not None:
+                self.connect()
+                with self.db:
+                    self.db.execute("DELETE FROM rpccache WHERE height >= ?", (height,))
+            self.tip = None
+
+    def save(self) -> None:
+        """Writes the new entries to the disk tier."""
+
+        with self.lock:
+            self.write()
+
+    def write(self) -> None:
+        # the caller holds the lock.
+        self.last_save = time.time()
+        if self.diskfile is None or not self.unsaved:
+            return
+        self.connect()
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO rpccache VALUES (?, ?, ?, ?)", self.unsaved)
+        self.unsaved = []
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total > 0 else 0
+        return "RPC cache: {} hits, {} misses ({:.1f}% hit rate), {} entries in memory.".format(self.hits, self.misses, rate, len(self.entries))
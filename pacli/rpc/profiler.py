@@ -0,0 +1,165 @@
+# RPC profiler
+# Enabled with the global --profile flag (see parse_args and eh.run_command), it records for every RPC method
+# the number of requests and calls (batch requests contain several calls), a latency histogram
+# and the sizes of the sent and received payloads. Requests are recorded in the PooledSession of the node.
+# The main phases of slow commands are timed with a PhaseTimer (see Profiler.timer).
+# Components with an internal state (e.g. the AdaptiveLimiter of the RPC session) add it with add_state.
+# At exit, a summary table is printed, and with --profile_json FILE the data is also written as JSON.
+
+import sys
+import json
+import time
+import atexit
+import threading
+
+# upper limits of the latency histogram buckets in milliseconds, the last bucket has no limit
+BUCKETS = (1, 5, 10, 50, 100, 500, 1000)
+BUCKET_LABELS = ["<1ms", "<5ms", "<10ms", "<50ms", "<100ms", "<500ms", "<1s", ">=1s"]
+
+
+class Profiler:
+
+    def __init__(self):
+
+        self.requested = False
+        self.enabled = False
+        self.json_file = None
+        self.start_time = None
+        self.methods = {} # method : statistics dict
+        self.phases = {} # phase name : [count, seconds]
+        self.states = {} # name : function returning a dict
+        self.lock = threading.Lock()
+
+    def parse_args(self, argv: list) -> list:
+        """Removes the profiling flags from the command line arguments, which are unknown to the commands."""
+
+        args = []
+        position = 0
+        while position < len(argv):
+            arg = argv[position]
+            if arg == "--profile":
+                self.requested = True
+            elif arg in ("--profile_json", "--profile-json") and position + 1 < len(argv):
+                self.requested = True
+                self.json_file = argv[position + 1]
+                position += 1
+            elif arg.startswith(("--profile_json=", "--profile-json=")):
+                self.requested = True
+                self.json_file = arg.split("=", 1)[1]
+            else:
+                args.append(arg)
+            position += 1
+        return args
+
+    def start(self) -> None:
+        if self.enabled:
+            return
+        self.enabled = True
+        self.start_time = time.perf_counter()
+        atexit.register(self.report)
+
+    def finish(self) -> None:
+        """Prints the report now instead of at exit, and resets the profiler for the next command (used by the daemon)."""
+
+        if self.enabled:
+            atexit.unregister(self.report)
+            self.report()
+        self.requested, self.enabled, self.json_file, self.start_time = False, False, None, None
+        self.methods, self.phases = {}, {}
+
+    def record_request(self, methods: list, duration: float, sent: int, received: int) -> None:
+        """Records a request. methods contains a single method or the methods of a batch request."""
+
+        key = methods[0] if len(methods) == 1 else "batch: {}".format(",".join(sorted(set(methods))))
+        milliseconds = duration * 1000
+        bucket = len([b for b in BUCKETS if milliseconds >= b])
+        with self.lock:
+            stats = self.methods.setdefault(key, {"requests" : 0, "calls" : 0, "seconds" : 0, "max_ms" : 0,
+                                                  "sent" : 0, "received" : 0, "histogram" : [0] * len(BUCKET_LABELS)})
+            stats["requests"] += 1
+            stats["calls"] += len(methods)
+            stats["seconds"] += duration
+            stats["max_ms"] = max(stats["max_ms"], milliseconds)
+            stats["sent"] += sent
+            stats["received"] += received
+            stats["histogram"][bucket] += 1
+
+    def add_phase(self, name: str, duration: float) -> None:
+        with self.lock:
+            entry = self.phases.setdefault(name, [0, 0])
+            entry[0] += 1
+            entry[1] += duration
+
+    def add_state(self, name: str, function) -> None:
+        """Adds a component state to the report. function returns a dict and is called when the report is created."""
+        with self.lock:
+            self.states[name] = function
+
+    def timer(self, command: str):
+        """Returns a PhaseTimer for the phases of a command, or a dummy timer if profiling is disabled."""
+        return PhaseTimer(self, command) if self.enabled else NullTimer()
+
+    def summary(self) -> dict:
+        total = time.perf_counter() - self.start_time if self.start_time is not None else 0
+        return {"total_seconds" : total,
+                "rpc_seconds" : sum([s["seconds"] for s in self.methods.values()]),
+                "histogram_buckets" : BUCKET_LABELS,
+                "methods" : self.methods,
+                "phases" : {n : {"count" : p[0], "seconds" : p[1]} for n, p in self.phases.items()},
+                "states" : {n : f() for n, f in self.states.items()}}
+
+    def report(self) -> None:
+        import pacli.tui as tui
+
+        summary = self.summary()
+        methods = sorted(summary["methods"].items(), key=lambda m: m[1]["seconds"], reverse=True)
+        tui.print_table(title="RPC calls:",
+                        heading=["Method", "Requests", "Calls", "Total (s)", "Mean (ms)", "Max (ms)", "Sent (KB)", "Received (KB)", "Latency histogram"],
+                        data=[[m, s["requests"], s["calls"], round(s["seconds"], 3), round(s["seconds"] * 1000 / s["requests"], 2),
+                               round(s["max_ms"], 2), round(s["sent"] / 1024, 1), round(s["received"] / 1024, 1),
+                               " ".join(["{}:{}".format(l, c) for l, c in zip(BUCKET_LABELS, s["histogram"]) if c > 0])]
+                              for m, s in methods])
+        if summary["phases"]:
+            tui.print_table(title="Phases:",
+                            heading=["Phase", "Count", "Total (s)"],
+                            data=[[n, p["count"], round(p["seconds"], 3)] for n, p in summary["phases"].items()])
+        for name, state in summary["states"].items():
+            tui.print_table(title=name + ":", heading=list(state.keys()), data=[list(state.values())])
+        print("Total time: {:.3f} s, waiting for RPC: {:.3f} s.".format(summary["total_seconds"], summary["rpc_seconds"]))
+
+        if self.json_file is not None:
+            try:
+                with open(self.json_file, "w") as jsonfile:
+                    json.dump(summary, jsonfile, indent=2)
+            except OSError as e:
+                print("Profile data could not be written to {}: {}".format(self.json_file, e), file=sys.stderr)
+
+
+class PhaseTimer:
+    # lap() adds the time since the last lap (or the creation of the timer) to a phase of the command.
+
+    def __init__(self, profiler: Profiler, command: str):
+        self.profiler = profiler
+        self.command = command
+        self.last = time.perf_counter()
+
+    def lap(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.profiler.add_phase("{}: {}".format(self.command, phase), now - self.last)
+        self.last = now
+
+    def reset(self) -> None:
+        # the time until now is not counted for any phase
+        self.last = time.perf_counter()
+
+
+class NullTimer:
+
+    def lap(self, phase: str) -> None:
+        pass
+
+    def reset(self) -> None:
+        pass
+
+
+profiler = Profiler()
@@ -0,0 +1,124 @@
+# Record/replay of RPC traffic
+# With the provider setting 'record', every RPC request of the node set in 'replay_node' and its response
+# are recorded into a compressed file ('replay_file', by default rpcreplay.json.gz in the config directory).
+# With the provider setting 'replay', the responses are served from this file, without a running node.
+# This allows deterministic benchmarks and tests of the commands.
+# Requests are identified by their JSON data (method, parameters and batch structure). If the same request was
+# answered differently during recording (e.g. getblockcount), the responses are served in the recorded order,
+# and the last one is repeated when they're exhausted.
+# Recording and replay happen in the transport adapter of the PooledSession, so the provider object
+# and the instrumentation (--profile) are the same as with the node.
+
+import os
+import json
+import gzip
+import atexit
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class ReplayError(Exception):
+    # a request was not recorded in the replay file.
+    pass
+
+
+def request_key(body) -> str:
+    if body is None:
+        return ""
+    if type(body) == bytes:
+        body = body.decode()
+    try:
+        return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except ValueError:
+        return body
+
+
+class RecordingFile:
+
+    def __init__(self, filename: str):
+
+        self.filename = filename
+        self.responses = {} # request key : [[response, repetitions], ...]
+        self.positions = {} # replay position per request key: [index, repetitions served]
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        if os.path.exists(self.filename):
+            with gzip.open(self.filename, "rt") as f:
+                self.responses = json.load(f)
+
+    def save(self) -> None:
+        with self.lock:
+            with gzip.open(self.filename, "wt") as f:
+                json.dump(self.responses, f, separators=(",", ":"))
+
+    def add(self, key: str, response: str) -> None:
+        with self.lock:
+            if key not in self.positions:
+                # the responses of an earlier recording are replaced.
+                self.responses[key] = []
+                self.positions[key] = None
+            runs = self.responses[key]
+            if runs and runs[-1][0] == response:
+                runs[-1][1] += 1
+            else:
+                runs.append([response, 1])
+
+    def next(self, key: str) -> str:
+        with self.lock:
+            if key not in self.responses:
+                raise ReplayError("RPC request not recorded: {}".format(key[:200]))
+            runs = self.responses[key]
+            index, served = self.positions.get(key) or (0, 0)
+            if served >= runs[index][1] and index < len(runs) - 1:
+                index, served = index + 1, 0
+            self.positions[key] = (index, served + 1)
+            return runs[index][0]
+
+
+class RecordingAdapter(HTTPAdapter):
+
+    def __init__(self, recording: RecordingFile, **kwargs):
+        super().__init__(**kwargs)
+        self.recording = recording
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.recording.add(request_key(request.body), response.content.decode())
+        return response
+
+
+class ReplayAdapter(HTTPAdapter):
+
+    def __init__(self, recording: RecordingFile, **kwargs):
+        super().__init__(**kwargs)
+        self.recording = recording
+
+    def send(self, request, **kwargs):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.headers["content-type"] = "application/json"
+        response._content = self.recording.next(request_key(request.body)).encode()
+        return response
+
+
+def set_replay_mode(node, mode: str, filename: str) -> RecordingFile:
+    """Lets the session of an RPC node record its requests into a file (mode 'record'), or answer them from it (mode 'replay')."""
+
+    recording = RecordingFile(filename)
+    recording.load()
+    if mode == "record":
+        pool_size = getattr(node.session, "pool_size", 10)
+        adapter = RecordingAdapter(recording, pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        atexit.register(recording.save)
+    elif mode == "replay":
+        adapter = ReplayAdapter(recording)
+    else:
+        raise ValueError("Invalid mode: {}".format(mode))
+
+    node.session.mount("http://", adapter)
+    node.session.mount("https://", adapter)
+    return recording
@@ -0,0 +1,104 @@
+# Pooled HTTP session for the RPC node.
+# The RPC client of pypeerassets sends every call through a requests session. This module replaces it
+# with a session which keeps a pool of keep-alive connections to the node, sized for the workers
+# of the block explorer (setting rpc_pool_size), and applies default timeouts to every request
+# (settings rpc_connect_timeout and rpc_timeout, 0 disables them). The read timeout only applies to read-only calls,
+# as calls which change the wallet (e.g. importprivkey with a rescan) can take very long.
+# Single calls, batch requests and the threads of the ParallelBlockFetcher share the same pool.
+# The requests in flight are limited by an AdaptiveLimiter (setting rpc_adaptive, see throttle.py).
+# Read-only calls are sent again up to 'rpc_retries' times after timeouts, connection errors or a full work queue
+# of the node, waiting 'rpc_retry_delay' milliseconds before the first retry and twice as long before each further one.
+# With the --profile flag, every request is recorded in the profiler.
+
+import json
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from pacli.rpc.profiler import profiler
+from pacli.rpc.throttle import AdaptiveLimiter, is_read_only
+
+
+class PooledSession(requests.Session):
+
+    def __init__(self, pool_size: int=10, timeout: int=0, connect_timeout: int=0, adaptive: bool=False, retries: int=0, retry_delay: int=500):
+
+        super().__init__()
+        self.pool_size = max(pool_size, 1)
+        # (connect, read) timeout tuple, None waits forever
+        self.timeout = (connect_timeout or None, timeout or None)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+        self.headers.update({"Connection" : "keep-alive", "content-type" : "application/json"})
+        self.retries = max(retries, 0)
+        self.retry_delay = retry_delay / 1000
+        self.limiter = AdaptiveLimiter(self.pool_size) if adaptive else None
+        if self.limiter is not None:
+            profiler.add_state("RPC concurrency", self.limiter.state)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            timeout = self.timeout
+            if timeout[1] is not None and not is_read_only(get_rpc_methods(kwargs.get("data") or "")):
+                timeout = (timeout[0], None)
+            kwargs.update({"timeout" : timeout})
+        if not profiler.enabled and self.limiter is None and self.retries == 0:
+            return super().request(method, url, **kwargs)
+
+        rpc_methods = get_rpc_methods(kwargs.get("data") or "")
+        retries = self.retries if is_read_only(rpc_methods) else 0
+        for attempt in range(retries + 1):
+            if attempt > 0:
+                if self.limiter is not None:
+                    self.limiter.add_retry()
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                response = self.send_request(method, url, rpc_methods, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+                continue
+            if response.status_code != 503 or attempt == retries:
+                return response
+
+    def send_request(self, method, url, rpc_methods: list, **kwargs):
+        key = rpc_methods[0] if len(rpc_methods) == 1 else "batch"
+        start = time.perf_counter() if self.limiter is None else self.limiter.acquire()
+        outcome = "error"
+        try:
+            response = super().request(method, url, **kwargs)
+            # 503: the work queue of the node is full
+            outcome = "overloaded" if response.status_code == 503 else "ok"
+        except requests.Timeout:
+            outcome = "timeout"
+            raise
+        finally:
+            if self.limiter is not None:
+                self.limiter.release(start, key, outcome)
+
+        if profiler.enabled:
+            profiler.record_request(rpc_methods or ["empty batch"], time.perf_counter() - start, len(kwargs.get("data") or ""), len(response.content))
+        return response
+
+
+def get_rpc_methods(data) -> list:
+    try:
+        payload = json.loads(data)
+        return [c.get("method") for c in payload] if type(payload) == list else [payload.get("method")]
+    except (ValueError, TypeError, AttributeError):
+        return ["unknown"]
+
+
+def set_pooled_session(node, pool_size: int=10, timeout: int=0, connect_timeout: int=0, adaptive: bool=False, retries: int=0, retry_delay: int=500) -> None:
+    """Replaces the session of an RPC node with a PooledSession. Headers and authentication of the old session are kept.
+       Nodes without a requests session (e.g. explorer providers) are left unchanged."""
+
+    old_session = getattr(node, "session", None)
+    if not isinstance(old_session, requests.Session):
+        return
+
+    session = PooledSession(pool_size=pool_size, timeout=timeout, connect_timeout=connect_timeout, adaptive=adaptive, retries=retries, retry_delay=retry_delay)
+    session.headers.update(old_session.headers)
+    session.auth = old_session.auth
+    old_session.close()
+    node.session = session
@@ -0,0 +1,101 @@
+# Adaptive RPC concurrency
+# Long scans with many parallel or batched requests can overload the client until it stops answering
+# (see restart_stuck_slimcoind). The AdaptiveLimiter of the PooledSession limits the requests in flight:
+# it starts with the whole connection pool and halves the limit when the latency of a RPC method rises far
+# above the lowest latency measured for it, or when a request times out, can't connect or the client
+# answers that its work queue is full (HTTP 503). While the client answers fast, the limit grows again
+# by one per 'limit' successful requests (additive increase, multiplicative decrease).
+# Read-only calls are retried after these failures with exponential backoff (see PooledSession).
+# With the --profile flag, the state of the limiter is shown after the RPC calls.
+
+import time
+import threading
+
+# a method is slower than normal if its average latency is this factor above the lowest one ...
+SLOWDOWN_FACTOR = 3
+# ... and at least this number of seconds, so fast calls with some jitter don't count.
+SLOWDOWN_SECONDS = 0.05
+# weight of a new latency in the moving average
+LATENCY_WEIGHT = 0.2
+# the lowest latency rises slowly towards the average, so a permanently slower client (e.g. larger blocks) is accepted.
+BASELINE_DRIFT = 0.01
+
+# calls which don't change the state of the wallet or the client and can be sent again.
+READ_ONLY_PREFIXES = ("get", "list", "validate", "decode")
+NOT_READ_ONLY = {"getnewaddress", "getrawchangeaddress", "getwork"}
+
+OUTCOME_STATS = {"error" : "errors", "timeout" : "timeouts", "overloaded" : "overloaded"}
+
+
+def is_read_only(methods: list) -> bool:
+    return all([m is not None and m.startswith(READ_ONLY_PREFIXES) and m not in NOT_READ_ONLY for m in methods])
+
+
+class AdaptiveLimiter:
+
+    def __init__(self, max_limit: int, min_limit: int=1):
+
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self.latencies = {} # method : [moving average, lowest average]
+        self.last_decrease = 0
+        self.condition = threading.Condition()
+        self.stats = {"requests" : 0, "errors" : 0, "timeouts" : 0, "overloaded" : 0, "slowdowns" : 0,
+                      "decreases" : 0, "retries" : 0, "max_in_flight" : 0, "lowest_limit" : self.max_limit}
+
+    def acquire(self) -> float:
+        """Waits until a request can be sent. Returns the start time, to be passed to release."""
+
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.in_flight)
+        return time.perf_counter()
+
+    def release(self, start: float, method: str, outcome: str="ok") -> None:
+        """Records the result of a request. outcome: ok, error (no connection), timeout or overloaded (HTTP 503)."""
+
+        duration = time.perf_counter() - start
+        with self.condition:
+            self.in_flight -= 1
+            self.stats["requests"] += 1
+            if outcome == "ok":
+                if self.slowed_down(method, duration):
+                    self.stats["slowdowns"] += 1
+                    self.decrease(start)
+                else:
+                    self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+            else:
+                self.stats[OUTCOME_STATS[outcome]] += 1
+                self.decrease(start)
+            self.condition.notify_all()
+
+    def slowed_down(self, method: str, duration: float) -> bool:
+        if method not in self.latencies:
+            self.latencies[method] = [duration, duration]
+            return False
+        entry = self.latencies[method]
+        entry[0] += (duration - entry[0]) * LATENCY_WEIGHT
+        entry[1] = min(entry[0], entry[1] + (entry[0] - entry[1]) * BASELINE_DRIFT)
+        return entry[0] > entry[1] * SLOWDOWN_FACTOR and entry[0] - entry[1] > SLOWDOWN_SECONDS
+
+    def decrease(self, start: float) -> None:
+        # only requests sent after the last decrease count, otherwise a single slow phase
+        # would reduce the limit once for each request which was already in flight.
+        if start < self.last_decrease:
+            return
+        self.limit = max(self.limit / 2, self.min_limit)
+        self.last_decrease = time.perf_counter()
+        self.stats["decreases"] += 1
+        self.stats["lowest_limit"] = min(self.stats["lowest_limit"], int(self.limit))
+
+    def add_retry(self) -> None:
+        with self.condition:
+            self.stats["retries"] += 1
+
+    def state(self) -> dict:
+        with self.condition:
+            return dict({"limit" : int(self.limit), "max_limit" : self.max_limit}, **self.stats)
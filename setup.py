@@ -31,6 +31,7 @@ setup(name='pacli',
                         ],
       entry_points={
           'console_scripts': [
-              'pacli = pacli.__main__:main'
+              'pacli = pacli.__main__:main',
+              'pacli-client = pacli.daemon:client_main'
           ]}
       )
@@ -0,0 +1,53 @@
+# Fixtures of the tests which use the fake node (see pacli.fakenode) as provider.
+# Test modules whose dependencies (e.g. pypeerassets) are missing are skipped; in CI (environment variable CI set)
+# they fail instead, so a broken test environment doesn't pass silently.
+
+import os
+import sys
+import pytest
+
+
+def missing_dependency(report) -> bool:
+    return os.environ.get("CI") is not None and report.skipped and "could not import" in str(report.longrepr)
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collectreport(report):
+    if missing_dependency(report):
+        report.outcome = "failed"
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    # skips inside a test, e.g. importorskip in a test function.
+    outcome = yield
+    report = outcome.get_result()
+    if missing_dependency(report):
+        report.outcome = "failed"
+
+
+@pytest.fixture
+def use_node(tmp_path, monkeypatch):
+    """Returns a function which makes a FakeNode the provider of pacli. The header index and the prevout cache
+       are replaced by empty ones, so the chains of different tests don't mix."""
+
+    def use(node):
+        from pacli.provider import provider
+        from pacli.fakenode.server import LocalNode
+        from pacli.blockexp.headerindex import HeaderIndex
+        from pacli.blockexp.prevouts import PrevoutCache
+        import pacli.rpc.batch as batch
+
+        # setattr would create the provider, as the proxy forwards __class__.
+        monkeypatch.setitem(vars(provider), "_provider", LocalNode(node))
+        monkeypatch.setattr(batch, "batches_supported", None)
+        index = HeaderIndex(str(tmp_path / "headerindex.db"))
+        cache = PrevoutCache(maxsize=100000)
+        for name, module in list(sys.modules.items()):
+            if name.startswith("pacli.") and hasattr(module, "header_index"):
+                monkeypatch.setattr(module, "header_index", index)
+            if name.startswith("pacli.") and hasattr(module, "prevout_cache"):
+                monkeypatch.setattr(module, "prevout_cache", cache)
+        return node
+
+    return use
@@ -0,0 +1,44 @@
+import sys
+import time
+import asyncio
+import importlib
+import pytest
+
+pytest.importorskip("appdirs")
+
+
+@pytest.fixture
+def aio(tmp_path, monkeypatch):
+    # the configuration is written into a temporary directory.
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    for module in [m for m in sys.modules if m in ("pacli.config", "pacli.provider", "pacli.rpc.aio")]:
+        monkeypatch.delitem(sys.modules, module)
+    return importlib.import_module("pacli.rpc.aio")
+
+
+class Node:
+
+    def getrawtransaction(self, txid, verbose=0):
+        # later requests are answered first
+        time.sleep(0.01 / (int(txid) + 1))
+        return {"txid" : txid}
+
+
+def test_order(aio):
+    async_provider = aio.AsyncProvider(Node(), concurrency=4)
+    txids = [str(i) for i in range(25)]
+
+    async def collect():
+        return [tx["txid"] async for tx in async_provider.imap(async_provider.node.getrawtransaction, [(t, 1) for t in txids], chunk_size=6)]
+
+    assert aio.run(collect()) == txids
+    assert aio.run(async_provider.map(len, [("a",), ("bc",)])) == [1, 2]
+    assert aio.run(async_provider.getrawtransaction("3", 1)) == {"txid" : "3"}
+
+
+def test_nested_run(aio):
+    # synchronous wrappers can be called inside coroutines
+    async def outer():
+        return aio.run(asyncio.sleep(0, result="inner"))
+
+    assert aio.run(outer()) == "inner"
@@ -0,0 +1,43 @@
+import pytest
+
+pytest.importorskip("appdirs")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+import pacli.rpc.batch as batch
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=30, seed=2)))
+
+
+def test_batch_query(node, monkeypatch):
+    heights = [[h] for h in (5, 40, 2, 30, 7)]
+    expected = [node.chain.blocks[h][0] if h <= 30 else -1 for [h] in heights]
+    results = batch.batch_query("getblockhash", heights, batch_size=2)
+    assert [r if type(r) == str else r["code"] for r in results] == expected
+    assert batch.batches_supported is True
+    assert node.calls["getblockhash"] == 5
+
+    # the responses are ordered by their id
+    node_batch = batch.provider.batch
+    monkeypatch.setattr(batch.provider._provider, "batch", lambda calls: list(reversed(node_batch(calls))), raising=False)
+    assert batch.batch_query("getblockhash", heights, batch_size=10) == results
+
+
+def test_fallback(node, monkeypatch):
+    heights = [[h] for h in range(6)]
+    expected = [b[0] for b in node.chain.blocks[:6]]
+
+    def invalid_batch(calls):
+        # old nodes answer array requests with an error
+        return {"code" : -32700, "message" : "Parse error"}
+
+    monkeypatch.setattr(batch.provider._provider, "batch", invalid_batch, raising=False)
+    assert batch.batch_query("getblockhash", heights, batch_size=4) == expected
+    assert batch.batches_supported is False
+    # later queries are sent as single calls
+    node.calls.clear()
+    assert batch.batch_query("getblockhash", heights, batch_size=4) == expected
+    assert node.calls["getblockhash"] == 6
+    assert batch.batch_query("getblockhash", [], batch_size=4) == []
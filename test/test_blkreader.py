@@ -0,0 +1,109 @@
+import pytest
+import struct
+import pacli.blockexp.blkreader as br
+
+# Fixture block files are created with the serialization helpers of the reader.
+
+P2PKH = bytes([0x6f])
+P2SH = bytes([0xc4])
+MAGIC = bytes.fromhex("cbf2c0ef")
+PUBKEY = bytes.fromhex("02" + "11" * 32)
+H160 = bytes.fromhex("22" * 20)
+GENESIS = "00" * 32
+
+
+def p2pkh_script(h160: bytes) -> bytes:
+    return b"\x76\xa9\x14" + h160 + b"\x88\xac"
+
+def record(block: bytes) -> bytes:
+    return MAGIC + struct.pack("<I", len(block)) + block
+
+def block_hash(block: bytes) -> str:
+    # the reader doesn't need real (Dcrypt) block hashes, any unique hash works.
+    return br.sha256d(block[:80])[::-1].hex()
+
+
+@pytest.fixture
+def chain(tmp_path):
+    coinbase1 = br.serialize_tx(1, 1600000000, [(None, 0, b"\x01\x01")], [(50000000, p2pkh_script(H160))])
+    block1 = br.serialize_block(GENESIS, 1600000000, [coinbase1])
+    cb1_txid = br.sha256d(coinbase1)[::-1].hex()
+
+    coinbase2 = br.serialize_tx(1, 1600000060, [(None, 0, b"\x01\x02")], [(0, b"")])
+    spend = br.serialize_tx(1, 1600000060, [(cb1_txid, 0, b"\x00")],
+                            [(20000000, bytes([33]) + PUBKEY + b"\xac"), (29000000, b"\xa9\x14" + H160 + b"\x87"), (0, b"\x6a\x04test")])
+    block2 = br.serialize_block(block_hash(block1), 1600000060, [coinbase2, spend], burn=("33" * 32, "44" * 32, 1, 1, 0))
+
+    orphan = br.serialize_block(block_hash(block1), 1600000070, [br.serialize_tx(1, 1600000070, [(None, 0, b"\x01\x03")], [(0, b"")])])
+
+    (tmp_path / "blk0001.dat").write_bytes(record(block1) + record(block2) + bytes(64))
+    (tmp_path / "blk0002.dat").write_bytes(record(orphan))
+    return tmp_path, [block1, block2, orphan], cb1_txid
+
+
+def test_index_and_read(chain):
+    path, blocks, cb1_txid = chain
+    reader = br.BlockFileReader(str(path), P2PKH, P2SH)
+    block = reader.read_block(reader.find_block(GENESIS))
+    reader.close()
+
+    assert block["tx"] == [cb1_txid]
+    assert block["flags"] == "proof-of-work"
+    assert block["time"] == "2020-09-13 12:26:40 UTC"
+    assert block["txes"][0]["vin"] == [{"coinbase" : "0101", "sequence" : 0xffffffff}]
+    assert block["txes"][0]["vout"][0]["value"] == 50
+    assert block["txes"][0]["vout"][0]["scriptPubKey"]["addresses"] == [br.b58check(P2PKH + H160)]
+
+
+def test_ambiguous_block_is_not_read(chain):
+    path, blocks, cb1_txid = chain
+    reader = br.BlockFileReader(str(path), P2PKH, P2SH)
+    # block 2 and the orphan both follow block 1
+    assert reader.find_block(block_hash(blocks[0])) is None
+    reader.close()
+
+
+def test_pob_block_and_scripts(chain):
+    path, blocks, cb1_txid = chain
+    block = br.parse_block(blocks[1], P2PKH, P2SH)
+    spend = block["txes"][1]
+
+    assert block["flags"] == "proof-of-burn"
+    assert block["burnblockhash"] == "33" * 32
+    assert block["burnhash"] == "44" * 32
+    assert spend["vin"][0]["txid"] == cb1_txid
+    assert [o["scriptPubKey"]["type"] for o in spend["vout"]] == ["pubkey", "scripthash", "nulldata"]
+    assert spend["vout"][0]["scriptPubKey"]["addresses"] == [br.b58check(P2PKH + br.hash_160(PUBKEY))]
+    assert spend["vout"][1]["scriptPubKey"]["addresses"] == [br.b58check(P2SH + H160)]
+    assert "addresses" not in spend["vout"][2]["scriptPubKey"]
+
+
+def test_corrupted_block(chain):
+    path, blocks, cb1_txid = chain
+    corrupted = bytearray(blocks[1])
+    corrupted[-10] ^= 0xff # changes the last output of the last transaction
+    with pytest.raises(br.BlockParseError):
+        br.parse_block(bytes(corrupted), P2PKH, P2SH)
+
+
+def test_pob_fields_layout():
+    # written field by field after Slimcoin's CBlock serialization, independently of serialize_block:
+    # fProofOfBurn, hashBurnBlock, burnHash, burnBlkHeight, burnCTx, burnCTxOut, nEffectiveBurnCoins, nBurnBits
+    coinbase = br.serialize_tx(1, 1600000000, [(None, 0, b"\x01\x04")], [(0, b"")])
+    header = (struct.pack("<i", 1) + bytes(32) + br.merkle_root([br.sha256d(coinbase)])
+              + struct.pack("<III", 1600000000, 0x1e0fffff, 0))
+    pob = (b"\x01" + bytes.fromhex("55" * 32) + bytes.fromhex("66" * 32) + struct.pack("<iii", 1234, 2, 1)
+           + struct.pack("<q", 250 * 1000000) + struct.pack("<I", 0x1d00ffff))
+    block = br.parse_block(header + pob + b"\x01" + coinbase + b"\x00", P2PKH, P2SH)
+
+    assert block["flags"] == "proof-of-burn"
+    assert block["burnblockhash"] == "55" * 32
+    assert block["burnhash"] == "66" * 32
+    assert (block["burnblockheight"], block["burnctx"], block["burnctxout"]) == (1234, 2, 1)
+    assert block["nEffectiveBurnCoins"] == 250
+    assert block["nBurnBits"] == "1d00ffff"
+
+    # the fields are present (zeroed) in blocks without the flag, too
+    block = br.parse_block(header + b"\x00" + bytes(88) + b"\x01" + coinbase + b"\x00", P2PKH, P2SH)
+    assert block["flags"] == "proof-of-work"
+    assert "burnblockhash" not in block
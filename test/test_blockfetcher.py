@@ -0,0 +1,86 @@
+import pytest
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+import pacli.blockexp.blockfetcher as bf
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=40, txes_per_block=5, wallet_addresses=10, foreign_addresses=30, seed=6)))
+
+
+def fetch_all(fetcher, heights: list) -> dict:
+    try:
+        return {h : fetcher.get(h) for h in heights}
+    finally:
+        fetcher.close()
+
+
+def test_next_heights():
+    for heights in (range(0, 30, 3), list(range(0, 30, 3))):
+        fetcher = bf.BlockFetcher(heights, batch_size=4)
+        assert fetcher.next_heights(6) == [6, 9, 12, 15]
+        assert fetcher.next_heights(18) == [18, 21, 24, 27]
+        # heights which aren't in the list, or before the current position
+        assert fetcher.next_heights(5) == [5]
+        assert fetcher.next_heights(9) == [9]
+        assert fetcher.next_heights(27, size=10) == [27]
+        assert fetcher.next_heights(30) == [30]
+
+
+def test_batches(node):
+    heights = range(node.chain.tip() - 20, node.chain.tip() + 3) # the last ones are after the tip
+    single = fetch_all(bf.BlockFetcher(heights, batch_size=1), heights)
+    node.calls.clear()
+    batched = fetch_all(bf.BlockFetcher(heights, batch_size=8), heights)
+    assert batched == single
+    assert batched[node.chain.tip() + 1] == {"blockhash" : None, "block" : {}, "txes" : [], "errors" : {}}
+    block = batched[node.chain.tip()]
+    assert [t[0] for t in block["txes"]] == node.chain.blocks[-1][2]
+    assert all([t[2] is not None for b in batched.values() for t in b["txes"]])
+    # three batches of 8 heights, and no single calls
+    assert node.calls.get("getblockhash", 0) == len(heights)
+    assert node.calls.get("getblock", 0) == 21
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_parallel(node, executor):
+    # a height list with gaps, retrieved in chunks of 3 heights by 3 workers
+    heights = [h for h in range(node.chain.tip() + 3) if h % 4 != 1]
+    expected = fetch_all(bf.BlockFetcher(heights, batch_size=1), heights)
+    fetcher = bf.ParallelBlockFetcher(heights, batch_size=3, workers=3, executor=executor)
+    assert fetch_all(fetcher, heights) == expected
+    assert not fetcher.pending
+
+    # heights outside of the list, and an interrupted scan
+    fetcher = bf.ParallelBlockFetcher(heights, batch_size=3, workers=2, executor=executor)
+    assert fetcher.get(heights[0]) == expected[heights[0]]
+    assert fetcher.get(1) == bf.BlockFetcher([1], batch_size=1).get(1)
+    fetcher.close()
+
+
+def test_parallel_prevouts(node):
+    # the workers share the prevout cache of the main thread.
+    heights = range(node.chain.tip() + 1)
+    fetch_all(bf.ParallelBlockFetcher(heights, batch_size=2, workers=4), heights)
+    parallel = dict(bf.prevout_cache.outputs)
+    bf.prevout_cache.outputs.clear()
+    fetch_all(bf.BlockFetcher(heights, batch_size=2), heights)
+    assert parallel == dict(bf.prevout_cache.outputs)
+    assert len(parallel) == sum([len(node.chain.get_tx(t)["vout"]) for b in node.chain.blocks for t in b[2]])
+
+
+def test_init_process_worker(node, monkeypatch):
+    # the inherited connections are replaced, and the provider isn't created just to close its session.
+    from pacli.provider import provider
+    bf.header_index.get(height=1) # opens the database
+    db, lock = bf.header_index.db, bf.header_index.lock
+    monkeypatch.setattr(bf.prevout_cache, "unsaved", [("00" * 32, 0, "[]")])
+    monkeypatch.setitem(vars(provider), "_provider", None)
+    bf.init_process_worker()
+    db.close()
+    assert vars(provider)["_provider"] is None
+    assert bf.header_index.db is None and bf.header_index.lock is not lock
+    assert bf.prevout_cache.db is None and bf.prevout_cache.unsaved == []
@@ -0,0 +1,102 @@
+import json
+import pytest
+from array import array
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+import pacli.blockexp.blocklocator as loc
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=30, txes_per_block=1, seed=2)))
+
+
+def json_locator(path, chain) -> dict:
+    address_dict = {"addr1" : {"heights" : [7, 3, 3, 12], "lastblock" : chain.blocks[20][0]},
+                    "addr2" : {"heights" : [], "lastblock" : chain.blocks[25][0], "startheight" : 5, "discontinuous" : True}}
+    with open(path, "w") as jsonfile:
+        json.dump(address_dict, jsonfile)
+    return address_dict
+
+
+def test_migration(node, tmp_path):
+    jsonfile, dbfile = str(tmp_path / "locator.json"), str(tmp_path / "locator.db")
+    json_locator(jsonfile, node.chain)
+    db = loc.LocatorDB(dbfile, jsonfilename=jsonfile, quiet=True)
+    assert db.addresses() == ["addr1", "addr2"]
+    assert db.load("addr1") == {"heights" : array("I", [3, 7, 12]), "lastblock" : node.chain.blocks[20][0]}
+    assert db.load("addr2") == {"heights" : array("I"), "lastblock" : node.chain.blocks[25][0], "startheight" : 5, "discontinuous" : True}
+    assert db.get_meta("migrated") == jsonfile
+    assert (tmp_path / "locator.json.migrated").exists() and not (tmp_path / "locator.json").exists()
+    # a JSON file appearing later is not migrated again.
+    with open(jsonfile, "w") as f:
+        json.dump({"addr3" : {"heights" : [1], "lastblock" : node.chain.blocks[1][0]}}, f)
+    assert loc.LocatorDB(dbfile, jsonfilename=jsonfile, quiet=True).addresses() == ["addr1", "addr2"]
+
+
+def test_interrupted_migration(node, tmp_path, monkeypatch):
+    jsonfile, dbfile = str(tmp_path / "locator.json"), str(tmp_path / "locator.db")
+    json_locator(jsonfile, node.chain)
+
+    def crash(self, key, value):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as m:
+        m.setattr(loc.LocatorDB, "set_meta", crash)
+        with pytest.raises(KeyboardInterrupt):
+            loc.LocatorDB(dbfile, jsonfilename=jsonfile, quiet=True)
+    # the addresses were rolled back and the JSON file is still there, so the migration is repeated.
+    assert (tmp_path / "locator.json").exists()
+    db = loc.LocatorDB(dbfile, jsonfilename=jsonfile, quiet=True)
+    assert db.addresses() == ["addr1", "addr2"]
+    assert db.get_meta("migrated") == jsonfile
+
+
+def test_lazy_load_and_store(node, tmp_path, monkeypatch):
+    dbfile = str(tmp_path / "locator.db")
+    locator = loc.BlockLocator.from_db(dbfile)
+    locator.store_blockheights("addr1", [3, 8], 10)
+    locator.store_blockheights("addr2", [5], 12)
+    locator.store_blockheights("addr3", [], 12)
+    locator.store()
+
+    locator = loc.BlockLocator.from_db(dbfile)
+    assert list(locator.addresses) == ["addr1", "addr2", "addr3"]
+    assert locator.addresses.loaded == {}
+    assert list(locator.get_address("addr2").heights) == [5]
+    assert list(locator.addresses.loaded) == ["addr2"]
+    assert locator.addresses.changes() == {}
+
+    saved = []
+    save = loc.LocatorDB.save
+    monkeypatch.setattr(loc.LocatorDB, "save", lambda self, changes, deleted: saved.append((set(changes), set(deleted))) or save(self, changes, deleted))
+    locator.store_blockheights("addr1", [8, 15], 20)
+    locator.delete_address("addr3")
+    locator.store()
+    assert saved == [({"addr1"}, {"addr3"})] # addr2 was loaded, but not changed.
+
+    locator = loc.BlockLocator.from_db(dbfile)
+    assert list(locator.addresses) == ["addr1", "addr2"]
+    addr1 = locator.get_address("addr1")
+    assert list(addr1.heights) == [3, 8, 15]
+    assert (addr1.lastblockheight, addr1.lastblockhash) == (20, node.chain.blocks[20][0])
+
+
+@pytest.mark.parametrize("heights", [[], [0], [1, 2, 3], [127, 128, 16383, 16384, 2 ** 21, 2 ** 32 - 1], list(range(0, 100000, 97))])
+def test_encode_heights(heights):
+    data = loc.encode_heights(heights)
+    assert loc.decode_heights(data) == array("I", heights)
+
+
+@pytest.mark.parametrize("heights1, heights2, expected", [([], [], []),
+                                                          ([1, 2], [], [1, 2]),
+                                                          ([], [3, 3, 4], [3, 4]),
+                                                          ([1, 2], [5, 5, 6, 6, 6], [1, 2, 5, 6]),
+                                                          ([1, 5, 9], [2, 5, 5, 10], [1, 2, 5, 9, 10]),
+                                                          ([4, 8], [1, 1, 4, 8, 8], [1, 4, 8]),
+                                                          ([2, 3], [2, 2, 3, 3], [2, 3])])
+def test_merge_heights(heights1, heights2, expected):
+    assert loc.merge_heights(array("I", heights1), heights2) == array("I", expected)
+    assert loc.merge_heights(array("I", heights1), heights2) == array("I", sorted(set(heights1 + heights2)))
@@ -0,0 +1,46 @@
+import pytest
+from decimal import Decimal
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+from pacli.provider import provider
+import pacli.extended.queries as eq
+import pacli.extended.utils as eu
+
+
+@pytest.fixture
+def node(use_node, monkeypatch):
+    monkeypatch.setattr(eu, "ownership_cache", eu.OwnershipCache())
+    return use_node(FakeNode(SyntheticChain(blocks=40, txes_per_block=6, wallet_addresses=10, foreign_addresses=20, seed=11)))
+
+
+def node_balance(node, address: str) -> Decimal:
+    # the balance of provider.getbalance, with its default of 6 confirmations
+    return Decimal(str(node.call("getbalance", address, 6)))
+
+
+def test_coin_balances(node, monkeypatch):
+    chain = node.chain
+    addresses = chain.wallet_addresses + chain.foreign_addresses[:10]
+    expected = {a : node_balance(node, a) for a in addresses}
+    # the last blocks contain unspent outputs with less than 6 confirmations.
+    assert any(u["confirmations"] < 6 for u in node.call("listunspent", 1, 9999999))
+    assert eq.get_coin_balances(addresses) == expected
+    assert eq.get_coin_balances(addresses, eu.are_mine(addresses)) == expected
+
+    # unspent outputs without address are ignored.
+    local = vars(provider)["_provider"]
+    listunspent = local.listunspent
+    monkeypatch.setattr(local, "listunspent", lambda *args, **kwargs: listunspent(*args, **kwargs) + [{"txid" : "00" * 32, "vout" : 0, "amount" : 1.0, "confirmations" : 10}], raising=False)
+    assert eq.get_coin_balances(addresses) == expected
+
+
+def test_address_balances(node):
+    chain = node.chain
+    result = eq.get_labels_and_addresses(no_labels=True, balances=True)
+    balances = {a : node_balance(node, a) for a in {e["address"] for e in node.call("listreceivedbyaddress", 0, False)}}
+    assert {item["address"] : Decimal(item["balance"]) for item in result} == {a : b for a, b in balances.items() if b != 0}
+    assert all(item["ismine"] for item in result)
+    result = eq.get_labels_and_addresses(no_labels=True, balances=True, empty=True)
+    assert {item["address"] : Decimal(item["balance"]) for item in result} == balances
@@ -0,0 +1,84 @@
+import os
+import sys
+import threading
+import subprocess
+import pytest
+
+pytest.importorskip("fire")
+pytest.importorskip("appdirs")
+import pacli.daemon as pd
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    # the configuration is written into a temporary directory.
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    for module in [m for m in sys.modules if m in ("pacli.config", "pacli.provider")]:
+        monkeypatch.delitem(sys.modules, module)
+    socket_file = str(tmp_path / "pacli.sock")
+    server = pd.DaemonServer(socket_file)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    yield socket_file
+    pd.request(socket_file, {"shutdown" : True})
+    thread.join()
+    server.server_close()
+
+
+def client(socket_file: str, *args) -> subprocess.CompletedProcess:
+    # the output of the daemon is redirected, so the client runs in another process.
+    return subprocess.run([sys.executable, "-m", "pacli.daemon"] + list(args), capture_output=True, text=True,
+                          env=dict(os.environ, PACLI_SOCKET=socket_file))
+
+
+def test_help(daemon):
+    result = client(daemon, "--help")
+    assert result.returncode == 0
+    assert "checkpoint" in result.stderr
+
+
+def test_errors(daemon):
+    # unknown commands fail like in the pacli executable
+    result = client(daemon, "nocommand")
+    assert result.returncode == 2
+    assert "Cannot find key: nocommand" in result.stderr
+    assert client(daemon, "daemon", "stop").returncode == 1
+    assert pd.daemon_running(daemon)
+
+
+def test_not_running(tmp_path):
+    result = client(str(tmp_path / "pacli.sock"), "--help")
+    assert result.returncode == 1
+    assert "not running" in result.stderr
+
+
+def test_provider_kept(daemon, tmp_path, monkeypatch):
+    import configparser
+    assert client(daemon, "--help").returncode == 0 # loads the modules in the daemon
+    pacli_provider = sys.modules["pacli.provider"]
+    created = []
+    monkeypatch.setattr(pacli_provider, "configured_provider", lambda Settings: created.append(object()) or created[-1])
+
+    def command_provider():
+        # provider used by a command
+        assert client(daemon, "--help").returncode == 0
+        return pacli_provider.provider._get()
+
+    first = command_provider()
+    assert command_provider() is first
+    # settings which the provider doesn't use don't replace it ...
+    conf_file = str(tmp_path / "config" / "pacli" / "pacli.conf")
+    config = configparser.ConfigParser()
+    config.read(conf_file)
+    config["settings"]["locator_flush_blocks"] = "10"
+    with open(conf_file, "w") as f:
+        config.write(f)
+    assert command_provider() is first
+    # ... the others do.
+    config["settings"]["rpc_timeout"] = "5"
+    with open(conf_file, "w") as f:
+        config.write(f)
+    second = command_provider()
+    assert second is not first
+    assert command_provider() is second
+    assert len(created) == 2
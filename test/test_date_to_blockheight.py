@@ -0,0 +1,64 @@
+import datetime
+import pytest
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+import pacli.blockexp.utils as bu
+
+# one block per hour, the chain starts at 2020-09-13 12:26:40 UTC and spans about 4 days.
+BLOCKS = 100
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=BLOCKS, txes_per_block=1, block_interval=3600, seed=3)))
+
+
+def block_date(chain, height: int) -> datetime.date:
+    return datetime.datetime.fromtimestamp(chain.blocks[height][1], datetime.timezone.utc).date()
+
+
+def first_block(chain, date: datetime.date) -> int:
+    return next((h for h in range(len(chain.blocks)) if block_date(chain, h) >= date), len(chain.blocks))
+
+
+def set_time(chain, height: int, timestamp: int) -> None:
+    blockhash, _, txids = chain.blocks[height]
+    chain.blocks[height] = (blockhash, timestamp, txids)
+
+
+@pytest.mark.parametrize("day", [14, 15, 16])
+def test_bisection(node, day):
+    date = datetime.date(2020, 9, day)
+    assert bu.date_to_blockheight(date, BLOCKS) == first_block(node.chain, date)
+    assert bu.date_to_blockheight(date, BLOCKS, startheight=5) == first_block(node.chain, date)
+
+
+def test_outside_chain(node):
+    assert bu.date_to_blockheight(datetime.date(2020, 1, 1), BLOCKS) == 0
+    assert bu.date_to_blockheight(datetime.date(2020, 1, 1), BLOCKS, startheight=20) == 20
+    assert bu.date_to_blockheight(datetime.date(2020, 9, 13), BLOCKS) == 0 # genesis block date
+    assert bu.date_to_blockheight(datetime.date(2021, 1, 1), BLOCKS) == BLOCKS + 1
+    assert bu.date_to_blockheight(datetime.date(2021, 1, 1), 50) == 51
+
+
+def test_non_monotonic_timestamps(node):
+    chain = node.chain
+    date = datetime.date(2020, 9, 15)
+    boundary = first_block(chain, date)
+    # an earlier block with a timestamp after the date is found by the back-scan ...
+    set_time(chain, boundary - 3, chain.blocks[boundary][1])
+    assert bu.date_to_blockheight(date, BLOCKS) == boundary - 3
+    # ... and a later block with a timestamp before the date doesn't move the result.
+    set_time(chain, boundary + 1, chain.blocks[boundary - 1][1])
+    assert bu.date_to_blockheight(date, BLOCKS) == boundary - 3
+
+
+def test_back_scan_window(node):
+    chain = node.chain
+    date = datetime.date(2020, 9, 15)
+    boundary = first_block(chain, date)
+    # the first block of the window is still checked.
+    set_time(chain, boundary - bu.TIMESTAMP_WINDOW, chain.blocks[boundary][1])
+    assert bu.date_to_blockheight(date, BLOCKS) == boundary - bu.TIMESTAMP_WINDOW
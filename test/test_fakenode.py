@@ -0,0 +1,98 @@
+import pytest
+import json
+import pacli.blockexp.blkreader as br
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode, LocalNode
+
+
+@pytest.fixture(scope="module")
+def node():
+    return FakeNode(SyntheticChain(blocks=60, txes_per_block=4, wallet_addresses=20, foreign_addresses=50, seed=1))
+
+
+def test_deterministic():
+    first = SyntheticChain(blocks=20, seed=5)
+    second = SyntheticChain(blocks=20, seed=5)
+    assert first.blocks == second.blocks
+
+
+def test_blocks_and_transactions(node):
+    assert node.call("getblockcount") == 60
+    block = node.call("getblock", node.call("getblockhash", 30))
+    assert block["height"] == 30
+    assert block["confirmations"] == 31
+    assert block["previousblockhash"] == node.call("getblockhash", 29)
+
+    for txid in block["tx"]:
+        tx = node.call("getrawtransaction", txid, 1)
+        assert tx["blockhash"] == block["hash"]
+        assert node.call("decoderawtransaction", node.call("getrawtransaction", txid))["txid"] == txid
+        # all spent outputs exist
+        for vin in tx["vin"]:
+            if "txid" in vin:
+                assert node.call("getrawtransaction", vin["txid"], 1)["vout"][vin["vout"]]["scriptPubKey"]["addresses"]
+
+
+def test_errors(node):
+    response = json.loads(node.handle(json.dumps([{"method" : "getblockhash", "params" : [1000], "id" : 0},
+                                                  {"method" : "getrawtransaction", "params" : ["00" * 32, 1], "id" : 1},
+                                                  {"method" : "nomethod", "params" : [], "id" : 2}])))
+    assert [r["error"]["code"] for r in response] == [-1, -5, -32601]
+
+
+def test_wallet(node):
+    chain = node.chain
+    entries = node.call("listtransactions", "*", 100000, 0)
+    assert len(entries) == len(chain.wallet_entries)
+    assert node.call("listtransactions", "*", 5, 2) == entries[-7:-2]
+
+    unspent = node.call("listunspent", 1, 9999999)
+    balance = node.call("getbalance")
+    assert round(sum([u["amount"] for u in unspent]), 6) == balance
+    assert round(sum(node.call("listaccounts").values()), 6) == balance
+    address = chain.wallet_addresses[0]
+    assert node.call("validateaddress", address)["ismine"] is True
+    assert node.call("validateaddress", chain.foreign_addresses[0])["ismine"] is False
+    assert node.call("validateaddress", address[:-1] + "1")["isvalid"] is False
+
+    since = node.call("listsinceblock", node.call("getblockhash", 50))
+    assert since["lastblock"] == node.call("getblockhash", 60)
+    assert since["transactions"] == [e for e in entries if e["confirmations"] <= 10]
+    assert node.call("listsinceblock")["transactions"] == entries
+
+
+def test_send_and_mine():
+    chain = SyntheticChain(blocks=15, seed=3)
+    node = FakeNode(chain)
+    utxo = node.call("listunspent", 1, 9999999)[0]
+    receiver = chain.foreign_addresses[0]
+    raw = br.serialize_tx(1, 1700000000, [(utxo["txid"], utxo["vout"], b"")], [(1000, chain.address_script(receiver))])
+    txid = node.call("sendrawtransaction", raw.hex())
+    assert node.call("getrawtransaction", txid, 1).get("confirmations") is None
+    assert node.call("getmemorypool")["transactions"] == [raw.hex()]
+
+    node.call("setgenerate", True, 1)
+    assert node.call("getrawtransaction", txid, 1)["confirmations"] == 1
+    assert txid in node.call("getblock", node.call("getblockhash", 16))["tx"]
+    assert json.loads(node.handle(json.dumps({"method" : "sendrawtransaction", "params" : [raw.hex()]})))["error"]["code"] == -25
+
+
+def test_local_node_and_reorg():
+    chain = SyntheticChain(blocks=15, seed=3)
+    node = LocalNode(FakeNode(chain))
+    assert node.getblockhash(100)["code"] == -1
+    assert getattr(node, "session", None) is None
+    response = node.batch([("getblockhash", [3]), ("getblockhash", [100])])
+    assert [r["id"] for r in response] == [0, 1]
+    assert response[0]["result"] == chain.blocks[3][0] and response[1]["error"]["code"] == -1
+    address = chain.wallet_addresses[0]
+    assert node.listunspent(address=address, minconf=1) == node.node.call("listunspent", 1, 999999, [address])
+
+    old_hashes = [b[0] for b in chain.blocks]
+    txid = chain.blocks[12][2][0]
+    chain.reorganize(10)
+    assert [b[0] for b in chain.blocks][:10] == old_hashes[:10]
+    assert set([b[0] for b in chain.blocks][10:]).isdisjoint(old_hashes)
+    assert node.getblock(old_hashes[12])["code"] == -5
+    assert node.getrawtransaction(txid, 1)["blockhash"] == node.getblockhash(12)
+    assert node.getblock(node.getblockhash(11))["previousblockhash"] == node.getblockhash(10)
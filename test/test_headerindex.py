@@ -0,0 +1,98 @@
+import pytest
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+import pacli.blockexp.headerindex as hi
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=60, txes_per_block=1, seed=7)))
+
+
+def fill(index, chain, heights) -> None:
+    for height in heights:
+        index.add(height, chain.blocks[height][0], chain.get_block(height)["time"])
+    index.save()
+
+
+def stored_heights(filename: str) -> list:
+    index = hi.HeaderIndex(filename) # checked when connecting
+    index.connect()
+    return [h[0] for h in index.db.execute("SELECT height FROM headers ORDER BY height")]
+
+
+def test_lookups(node):
+    chain = node.chain
+    assert hi.height_to_blockhash(20) == chain.blocks[20][0]
+    assert hi.blockhash_to_height(chain.blocks[25][0]) == 25
+    assert hi.height_to_time(30) == chain.get_block(30)["time"]
+    node.calls.clear()
+    assert hi.height_to_blockhash(25) == chain.blocks[25][0]
+    assert hi.height_to_time(30) == chain.get_block(30)["time"]
+    assert node.calls.get("getblock", 0) == node.calls.get("getblockhash", 0) == 0
+    assert type(hi.height_to_blockhash(100)) == dict # after the tip
+    with pytest.raises(KeyError):
+        hi.blockhash_to_height("00" * 32)
+
+
+@pytest.mark.parametrize("depth", [500, 5])
+def test_reorg(node, tmp_path, monkeypatch, depth):
+    # with depth 5, the entries are below the compared blocks and the fork is searched.
+    monkeypatch.setattr(hi, "REORG_DEPTH", depth)
+    chain, filename = node.chain, str(tmp_path / "reorg.db")
+    fill(hi.HeaderIndex(filename), chain, range(10, 41))
+    chain.reorganize(30)
+    assert stored_heights(filename) == list(range(10, 30))
+
+
+def test_orphans_below_valid_entry(node, tmp_path):
+    # entries of the old chain, and one entry of the new chain above a gap (added before the open index was checked again):
+    # the orphans are found when they are looked up.
+    chain, filename = node.chain, str(tmp_path / "gaps.db")
+    index = hi.HeaderIndex(filename)
+    fill(index, chain, range(10, 21))
+    chain.reorganize(15)
+    fill(index, chain, [40])
+    index = hi.HeaderIndex(filename)
+    assert index.get(height=17) is None
+    assert index.get(blockhash=chain.blocks[14][0])[0] == 14
+    assert index.get(height=40)[1] == chain.blocks[40][0]
+    assert stored_heights(filename) == list(range(10, 17)) + list(range(18, 21)) + [40]
+
+
+def test_check_calls(node, tmp_path):
+    # opening the index compares only the highest entry, recent entries are compared once when they are looked up.
+    chain, index = node.chain, hi.HeaderIndex(str(tmp_path / "calls.db"))
+    fill(index, chain, range(0, 61))
+    index = hi.HeaderIndex(index.filename)
+    node.calls.clear()
+    index.connect()
+    assert node.calls == {"getblockcount" : 1, "getblockhash" : 2}
+    for i in range(3):
+        assert index.get(height=55)[1] == chain.blocks[55][0]
+    assert node.calls == {"getblockcount" : 1, "getblockhash" : 3}
+
+
+def test_checkpoint(node, tmp_path, monkeypatch):
+    import pacli.extended.config as ce
+    chain, filename = node.chain, str(tmp_path / "checkpoint.db")
+    fill(hi.HeaderIndex(filename), chain, range(0, 61))
+    monkeypatch.setattr(ce, "get_config", lambda quiet=False: {"checkpoint" : {"12" : "00" * 32}})
+    assert stored_heights(filename) == list(range(0, 12))
+
+
+def test_recheck(node, tmp_path, monkeypatch):
+    # an open index (e.g. in the daemon) is checked again when the tip changes.
+    chain, index = node.chain, hi.HeaderIndex(str(tmp_path / "recheck.db"))
+    fill(index, chain, range(0, 61))
+    chain.reorganize(50)
+    node.call("setgenerate", True, 2)
+    assert index.get(height=55)[1] != chain.blocks[55][0] # not checked yet
+    monkeypatch.setattr(hi, "CHECK_SECONDS", 0)
+    assert index.get(height=55) is None
+    assert index.get(height=49)[1] == chain.blocks[49][0]
+    node.calls.clear()
+    index.get(height=49) # same tip: no new check
+    assert node.calls == {"getblockcount" : 1, "getblockhash" : 1}
@@ -0,0 +1,26 @@
+import sys
+import subprocess
+import pytest
+
+pytest.importorskip("fire")
+import pacli.__main__ as pm
+
+CHECK_IMPORTS = """
+import sys
+import pacli.__main__ as pm
+sys.argv = ["pacli"]
+pm.main()
+print(sorted(m for m in ("pacli.config", "pacli.provider", "pacli.extended.classes", "pypeerassets") if m in sys.modules))
+"""
+
+
+def test_command_groups():
+    for name, (module, classname, summary) in pm.COMMANDS.items():
+        assert module.startswith("pacli.") and summary
+
+
+def test_help_without_imports():
+    # the list of command groups is shown without importing them.
+    output = subprocess.run([sys.executable, "-c", CHECK_IMPORTS], capture_output=True, text=True, check=True).stdout
+    assert "checkpoint" in output
+    assert output.strip().endswith("[]")
@@ -0,0 +1,63 @@
+import pytest
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode, LocalNode
+from pacli.provider import provider
+import pacli.extended.utils as eu
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=20, txes_per_block=4, wallet_addresses=10, foreign_addresses=10, seed=5)))
+
+
+def test_ownership(node, tmp_path):
+    chain = node.chain
+    cache = eu.OwnershipCache()
+    addresses = chain.wallet_addresses[:5] + chain.foreign_addresses[:5]
+    expected = {a : node.call("validateaddress", a)["ismine"] for a in addresses}
+
+    # a few addresses are checked directly, without the address set of the wallet.
+    node.calls.clear()
+    assert cache.check(addresses[4:6]) == {a : expected[a] for a in addresses[4:6]}
+    assert node.calls == {"validateaddress" : 2}
+
+    node.calls.clear()
+    assert cache.check(addresses) == expected
+    assert cache.check(addresses) == expected
+    # the wallet addresses come from the address set, the others are checked once.
+    assert node.calls["validateaddress"] == 4
+    assert node.calls["listreceivedbyaddress"] == 1
+
+    # negative results expire
+    cache.not_mine = {a : t - eu.NOT_MINE_SECONDS for a, t in cache.not_mine.items()}
+    node.calls.clear()
+    cache.check(addresses)
+    assert node.calls["validateaddress"] == 5
+
+    # wallet addresses are stored on disk
+    diskfile = str(tmp_path / "ownership.db")
+    eu.OwnershipCache(diskfile=diskfile).check(addresses)
+    cache = eu.OwnershipCache(diskfile=diskfile)
+    cache.connect()
+    stored = set([row[0] for row in cache.db.execute("SELECT address FROM mine")])
+    assert set([a for a in addresses if expected[a]]) <= stored
+
+
+def test_other_wallet(node, tmp_path, monkeypatch):
+    diskfile = str(tmp_path / "ownership.db")
+    addresses = node.chain.wallet_addresses[:8]
+    assert all(eu.OwnershipCache(diskfile=diskfile).check(addresses).values())
+    # another wallet: the stored addresses of the old one are deleted.
+    other = FakeNode(SyntheticChain(blocks=20, txes_per_block=4, wallet_addresses=10, foreign_addresses=10, seed=6))
+    monkeypatch.setitem(vars(provider), "_provider", LocalNode(other))
+    cache = eu.OwnershipCache(diskfile=diskfile)
+    assert not any(cache.check(addresses).values())
+    stored = set([row[0] for row in cache.db.execute("SELECT address FROM mine")])
+    assert stored and not stored & set(addresses)
+    assert stored <= set(other.chain.wallet)
+    # the same wallet keeps them.
+    other.calls.clear()
+    assert eu.OwnershipCache(diskfile=diskfile).check(other.chain.wallet_addresses[:8]) == dict.fromkeys(other.chain.wallet_addresses[:8], True)
+    assert other.calls.get("validateaddress", 0) == 0
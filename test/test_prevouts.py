@@ -0,0 +1,74 @@
+import threading
+import pytest
+
+pytest.importorskip("appdirs")
+from pacli.blockexp.prevouts import PrevoutCache
+import pacli.blockexp.prevouts as pc
+
+
+def make_tx(txid: str, outputs: int) -> dict:
+    vout = [{"value" : n + 1, "scriptPubKey" : {"addresses" : ["address{}".format(n)]}} for n in range(outputs)]
+    # outputs without addresses (e.g. OP_RETURN) are not cached
+    return {"txid" : txid, "vout" : vout + [{"value" : 0, "scriptPubKey" : {}}]}
+
+
+def test_eviction():
+    cache = PrevoutCache(maxsize=4)
+    cache.add_tx(make_tx("a", 3))
+    assert cache.get("a", 0) == (["address0"], 1) # a:0 is used last
+    assert not cache.contains("a", 3)
+    cache.add_tx(make_tx("b", 2))
+    assert [cache.contains("a", n) for n in range(3)] == [True, False, True]
+    assert cache.contains("b", 0) and cache.contains("b", 1)
+    assert cache.get("a", 1) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    PrevoutCache(maxsize=0).add_tx(make_tx("c", 1))
+
+
+def test_disk(tmp_path):
+    diskfile = str(tmp_path / "prevouts.db")
+    cache = PrevoutCache(maxsize=2, diskfile=diskfile)
+    cache.add_tx(make_tx("a", 3))
+    cache.save()
+    assert cache.unsaved == []
+
+    # outputs evicted from memory, or stored by another process, are read from disk.
+    cache = PrevoutCache(maxsize=2, diskfile=diskfile)
+    assert not cache.contains("a", 0)
+    assert [cache.get("a", n) for n in range(3)] == [(["address0"], 1), (["address1"], 2), (["address2"], 3)]
+    assert cache.contains("a", 2) and not cache.contains("a", 0)
+    assert cache.get("a", 3) is None
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_periodic_write(tmp_path, monkeypatch):
+    # new outputs are written every SAVE_ENTRIES outputs or SAVE_SECONDS seconds, without an explicit save.
+    monkeypatch.setattr(pc, "SAVE_ENTRIES", 5)
+    cache = PrevoutCache(maxsize=100, diskfile=str(tmp_path / "prevouts.db"))
+    cache.add_tx(make_tx("a", 3))
+    assert len(cache.unsaved) == 3
+    cache.add_tx(make_tx("b", 3))
+    assert cache.unsaved == []
+    monkeypatch.setattr(pc, "SAVE_SECONDS", 0)
+    cache.add_tx(make_tx("c", 1))
+    assert cache.unsaved == []
+    assert cache.db.execute("SELECT COUNT(*) FROM prevouts").fetchone()[0] == 7
+
+
+def test_threads():
+    cache = PrevoutCache(maxsize=500)
+
+    def worker(number):
+        for i in range(50):
+            txid = "{}-{}".format(number, i)
+            cache.add_tx(make_tx(txid, 3))
+            cache.contains(txid, 1)
+            cache.get(txid, 2)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(cache.outputs) == 500
+    assert cache.hits == 400
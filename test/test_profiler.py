@@ -0,0 +1,47 @@
+import pytest
+from pacli.rpc.profiler import Profiler, NullTimer
+
+
+def test_parse_args():
+    profiler = Profiler()
+    assert profiler.parse_args(["pacli", "address", "list", "-w"]) == ["pacli", "address", "list", "-w"]
+    assert profiler.requested is False
+
+    args = profiler.parse_args(["pacli", "--profile", "address", "list", "--profile_json", "out.json", "-w"])
+    assert args == ["pacli", "address", "list", "-w"]
+    assert profiler.requested is True
+    assert profiler.json_file == "out.json"
+
+    profiler = Profiler()
+    assert profiler.parse_args(["pacli", "token", "balances", "--profile-json=p.json"]) == ["pacli", "token", "balances"]
+    assert profiler.requested is True
+    assert profiler.json_file == "p.json"
+
+
+def test_record_request():
+    profiler = Profiler()
+    profiler.record_request(["getblock"], 0.0005, 100, 2000)
+    profiler.record_request(["getblock"], 0.02, 100, 3000)
+    profiler.record_request(["getrawtransaction", "getrawtransaction"], 1.5, 300, 9000)
+
+    summary = profiler.summary()
+    getblock = summary["methods"]["getblock"]
+    assert getblock["requests"] == 2 and getblock["calls"] == 2
+    assert getblock["received"] == 5000
+    assert getblock["histogram"][0] == 1 # <1ms
+    assert getblock["histogram"][3] == 1 # <50ms
+    batch = summary["methods"]["batch: getrawtransaction"]
+    assert batch["requests"] == 1 and batch["calls"] == 2
+    assert batch["histogram"][-1] == 1 # >=1s
+    assert summary["rpc_seconds"] == pytest.approx(1.5205)
+
+
+def test_timer():
+    profiler = Profiler()
+    assert isinstance(profiler.timer("command"), NullTimer)
+
+    profiler.enabled = True
+    timer = profiler.timer("command")
+    timer.lap("phase")
+    timer.lap("phase")
+    assert profiler.summary()["phases"]["command: phase"]["count"] == 2
@@ -0,0 +1,137 @@
+import pytest
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode, LocalNode
+import pacli.rpc.cache as rc
+
+BLOCKS = 40
+DEPTH = 5
+
+
+@pytest.fixture
+def node():
+    return FakeNode(SyntheticChain(blocks=BLOCKS, txes_per_block=2, wallet_addresses=10, foreign_addresses=20, seed=4))
+
+
+@pytest.fixture
+def cached(node, monkeypatch):
+    monkeypatch.setattr(rc, "TIP_TTL", 0) # the tests change the block height
+    return rc.CachingProvider(LocalNode(node), maxsize=1000, depth=DEPTH)
+
+
+def first_tx(node, height: int) -> str:
+    return node.chain.blocks[height][2][0]
+
+
+def test_memoization(node, cached):
+    deep, shallow = first_tx(node, 10), first_tx(node, BLOCKS - 1)
+    for i in range(2):
+        assert cached.getblockhash(10) == node.chain.blocks[10][0]
+        assert cached.getblock(node.chain.blocks[10][0]) == node.call("getblock", node.chain.blocks[10][0])
+        assert cached.getrawtransaction(deep, 1) == node.call("getrawtransaction", deep, 1)
+        assert cached.getrawtransaction(shallow) == node.call("getrawtransaction", shallow)
+        assert cached.getrawtransaction(shallow, 1) == node.call("getrawtransaction", shallow, 1)
+        assert cached.getblockhash(BLOCKS) == node.chain.blocks[BLOCKS][0]
+    node.calls.clear()
+    cached.getblockhash(10), cached.getblock(node.chain.blocks[10][0]), cached.getrawtransaction(deep, 1), cached.getrawtransaction(shallow)
+    assert node.calls.get("getblockhash", 0) == node.calls.get("getblock", 0) == node.calls.get("getrawtransaction", 0) == 0
+    # results with less than DEPTH confirmations are always requested.
+    cached.getrawtransaction(shallow, 1), cached.getblockhash(BLOCKS)
+    assert node.calls["getrawtransaction"] == node.calls["getblockhash"] == 1
+    # errors are not cached.
+    assert "code" in cached.getrawtransaction("00" * 32)
+    assert "code" in cached.getrawtransaction("00" * 32)
+    assert node.calls["getrawtransaction"] == 3
+    # the results are copies.
+    cached.getrawtransaction(deep, 1)["vout"].clear()
+    assert cached.getrawtransaction(deep, 1) == node.call("getrawtransaction", deep, 1)
+
+
+def test_confirmations(node, cached):
+    blockhash, txid = node.chain.blocks[20][0], first_tx(node, 20)
+    assert cached.getblock(blockhash)["confirmations"] == BLOCKS - 20 + 1
+    cached.getrawtransaction(txid, 1)
+    cached.setgenerate(True, 3)
+    node.calls.clear()
+    assert cached.getblock(blockhash) == node.call("getblock", blockhash)
+    assert cached.getrawtransaction(txid, 1) == node.call("getrawtransaction", txid, 1)
+    assert cached.getblock(blockhash)["confirmations"] == BLOCKS + 3 - 20 + 1
+    assert node.calls == {"getblock" : 1, "getrawtransaction" : 1, "getblockcount" : 3}
+
+
+def test_eviction(node):
+    cached = rc.CachingProvider(LocalNode(node), maxsize=3, depth=DEPTH)
+    for height in (1, 2, 3, 1, 4):
+        cached.getblockhash(height)
+    assert [k[1] for k in cached.entries] == ["3", "1", "4"]
+    assert (cached.hits, cached.misses) == (1, 4)
+    assert rc.CachingProvider(LocalNode(node), maxsize=0).getblockhash(1) == node.chain.blocks[1][0]
+
+
+def test_disk(node, tmp_path, monkeypatch):
+    diskfile = str(tmp_path / "rpccache.db")
+    cached = rc.CachingProvider(LocalNode(node), depth=DEPTH, diskfile=diskfile)
+    for height in range(1, 5):
+        cached.getblockhash(height)
+    cached.save()
+    other = rc.CachingProvider(LocalNode(node), depth=DEPTH, diskfile=diskfile)
+    node.calls.clear()
+    assert [other.getblockhash(h) for h in range(1, 5)] == [node.chain.blocks[h][0] for h in range(1, 5)]
+    assert node.calls == {}
+
+    # new entries are written without waiting for the exit.
+    monkeypatch.setattr(rc, "SAVE_ENTRIES", 3)
+    cached.getblockhash(10), cached.getblockhash(11)
+    assert len(cached.unsaved) == 2
+    cached.getblockhash(12)
+    assert cached.unsaved == []
+    cached.last_save = 0 # SAVE_SECONDS elapsed
+    cached.getblockhash(13)
+    assert cached.unsaved == []
+    rows = rc.CachingProvider(LocalNode(node), diskfile=diskfile)
+    rows.connect()
+    assert sorted(int(r[0]) for r in rows.db.execute("SELECT key FROM rpccache")) == [1, 2, 3, 4, 10, 11, 12, 13]
+
+
+def test_reorg(node, cached, tmp_path):
+    cached.diskfile = str(tmp_path / "rpccache.db")
+    chain = node.chain
+    txid = first_tx(node, 30)
+    old = [cached.getblockhash(h) for h in range(20, BLOCKS - DEPTH + 2)]
+    old_tx = cached.getrawtransaction(txid, 1)
+    raw = cached.getrawtransaction(txid)
+    # a fork from block 30 on, which becomes longer than the old chain.
+    chain.reorganize(30)
+    cached.setgenerate(True, 1)
+    assert cached.getblockhash(30) == old[10] != chain.blocks[30][0] # stale
+
+    cached.invalidate(30)
+    node.calls.clear()
+    assert [cached.getblockhash(h) for h in range(20, BLOCKS - DEPTH + 2)] == [chain.blocks[h][0] for h in range(20, BLOCKS - DEPTH + 2)]
+    assert node.calls["getblockhash"] == BLOCKS - DEPTH + 2 - 30 # the blocks before the fork are still cached.
+    assert cached.getrawtransaction(txid, 1)["blockhash"] == chain.blocks[30][0] != old_tx["blockhash"]
+    assert cached.getrawtransaction(txid) == raw
+    assert node.calls["getrawtransaction"] == 1
+
+    # without a height, all entries depending on the chain are deleted, also on disk.
+    cached.save()
+    cached.invalidate()
+    assert all(e[0] is None for e in cached.entries.values())
+    assert cached.db.execute("SELECT COUNT(*) FROM rpccache WHERE height IS NOT NULL").fetchone()[0] == 0
+
+
+def test_reorg_check(node, cached, monkeypatch):
+    pytest.importorskip("pypeerassets")
+    from pacli.provider import provider
+    import pacli.extended.checkpoints as cp
+    import pacli.extended.config as ce
+
+    monkeypatch.setitem(vars(provider), "_provider", cached)
+    checkpoint = {"checkpoint" : {"32" : node.chain.blocks[32][0]}}
+    monkeypatch.setattr(ce, "get_config", lambda *args, **kwargs: checkpoint)
+    cached.getblockhash(32)
+    assert cp.reorg_check(quiet=True) == 0
+    node.chain.reorganize(30)
+    cached.setgenerate(True, 1)
+    assert cached.getblockhash(32) == checkpoint["checkpoint"]["32"] # stale until the reorg is found
+    assert cp.reorg_check(quiet=True) == 1
+    assert cached.getblockhash(32) == node.chain.blocks[32][0]
@@ -0,0 +1,133 @@
+import json
+import time
+import threading
+import pytest
+
+requests = pytest.importorskip("requests")
+from http.server import ThreadingHTTPServer
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode, RequestHandler
+from pacli.rpc.session import PooledSession, set_pooled_session
+
+
+class NodeHandler(RequestHandler):
+    # fake node which can answer slowly or with 503 (full work queue), and records its connections.
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.clients.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            delay = server.delays.pop(0) if server.delays else server.delay
+            overloaded = server.overloaded > 0
+            server.overloaded -= 1
+        try:
+            time.sleep(delay)
+            if overloaded:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+            else:
+                super().do_POST()
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+@pytest.fixture(scope="module")
+def node():
+    return FakeNode(SyntheticChain(blocks=10, txes_per_block=1, seed=9))
+
+
+@pytest.fixture
+def server(node):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), NodeHandler)
+    server.daemon_threads = True
+    server.node = node
+    server.lock = threading.Lock()
+    server.requests, server.active, server.max_active, server.clients = 0, 0, 0, set()
+    server.delay, server.delays, server.overloaded = 0, [], 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def call(session, server, method: str, *params, **kwargs):
+    url = "http://127.0.0.1:{}".format(server.server_port)
+    return session.post(url, data=json.dumps({"method" : method, "params" : list(params), "id" : 0}), **kwargs)
+
+
+def test_pool_size(server, node):
+    session = PooledSession(pool_size=3)
+    # keep-alive: consecutive requests use the same connection.
+    for i in range(5):
+        assert call(session, server, "getblockhash", i).json()["result"] == node.chain.blocks[i][0]
+    assert len(server.clients) == 1
+
+    # parallel requests wait for a free connection of the pool.
+    server.delay = 0.05
+    threads = [threading.Thread(target=call, args=(session, server, "getblockcount")) for i in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert server.requests == 17
+    assert server.max_active == 3
+    assert len(server.clients) == 3
+    session.close()
+
+
+def test_timeout(server):
+    server.delay = 0.5
+    session = PooledSession(timeout=0.1)
+    with pytest.raises(requests.Timeout):
+        call(session, server, "getblockcount")
+    # a timeout given with the request is not overridden.
+    assert call(session, server, "getblockcount", timeout=2).json()["result"] == 10
+    # calls which change the wallet (e.g. importprivkey with a rescan) wait for the answer.
+    assert call(session, server, "getnewaddress").json()["error"] is None
+    session.close()
+
+
+def test_retries(server, node):
+    session = PooledSession(retries=2, retry_delay=10, timeout=0.2)
+    # a full work queue of the node
+    server.overloaded = 2
+    assert call(session, server, "getblockcount").json()["result"] == 10
+    assert server.requests == 3
+    server.overloaded = 3
+    assert call(session, server, "getblockcount").status_code == 503
+    assert server.requests == 6
+
+    # timeouts
+    server.delays = [0.5]
+    assert call(session, server, "getblockhash", 1).json()["result"] == node.chain.blocks[1][0]
+    assert server.requests == 8
+    server.delays = [0.5, 0.5, 0.5]
+    with pytest.raises(requests.Timeout):
+        call(session, server, "getblockhash", 1)
+    assert server.requests == 11
+
+    # calls which change the wallet or the chain are not sent again.
+    server.overloaded = 1
+    assert call(session, server, "getnewaddress").status_code == 503
+    assert server.requests == 12
+    session.close()
+
+
+def test_set_pooled_session():
+    node = type("Node", (), {})()
+    node.session = requests.Session()
+    node.session.auth = ("user", "password")
+    node.session.headers.update({"X-Test" : "1"})
+    set_pooled_session(node, pool_size=4, timeout=30, connect_timeout=5, retries=1)
+    assert isinstance(node.session, PooledSession)
+    assert node.session.auth == ("user", "password") and node.session.headers["X-Test"] == "1"
+    assert node.session.pool_size == 4 and node.session.timeout == (5, 30) and node.session.retries == 1
+    other = type("Explorer", (), {})()
+    set_pooled_session(other)
+    assert not hasattr(other, "session")
@@ -0,0 +1,69 @@
+import json
+import time
+import pytest
+from pacli.rpc.throttle import AdaptiveLimiter, is_read_only
+
+
+def test_is_read_only():
+    assert is_read_only(["getrawtransaction", "getblockhash", "listunspent", "validateaddress"])
+    assert not is_read_only(["getblockhash", "sendrawtransaction"])
+    assert not is_read_only(["getnewaddress"])
+    assert not is_read_only([None])
+
+
+def test_limiter():
+    limiter = AdaptiveLimiter(8)
+    # failures halve the limit, but only once for the requests which were already in flight
+    starts = [limiter.acquire() for i in range(4)]
+    for start in starts:
+        limiter.release(start, "getblock", "timeout")
+    assert limiter.state()["limit"] == 4
+    limiter.release(limiter.acquire(), "getblock", "overloaded")
+    assert limiter.state()["limit"] == 2
+
+    # fast answers increase it again
+    for i in range(20):
+        limiter.release(limiter.acquire(), "getblock")
+    state = limiter.state()
+    assert state["limit"] > 2 and state["lowest_limit"] == 2
+    assert state["timeouts"] == 4 and state["overloaded"] == 1 and state["requests"] == 25
+
+    # a method answered much slower than before reduces the limit
+    limit = state["limit"]
+    for i in range(5):
+        start = limiter.acquire()
+        time.sleep(0.1)
+        limiter.release(start, "getblock")
+    assert limiter.state()["limit"] < limit and limiter.state()["slowdowns"] > 0
+
+
+def test_session_retries():
+    requests = pytest.importorskip("requests")
+    from requests.adapters import HTTPAdapter
+    from pacli.rpc.session import PooledSession
+
+    class FlakyAdapter(HTTPAdapter):
+        # times out twice, then answers.
+        sent = 0
+
+        def send(self, request, **kwargs):
+            FlakyAdapter.sent += 1
+            if FlakyAdapter.sent <= 2:
+                raise requests.ReadTimeout("timeout")
+            response = requests.models.Response()
+            response.status_code = 200
+            response._content = b'{"result": 1, "error": null, "id": 0}'
+            return response
+
+    session = PooledSession(pool_size=4, adaptive=True, retries=3, retry_delay=1)
+    session.mount("http://", FlakyAdapter())
+    data = json.dumps({"method": "getblockcount", "params": [], "id": 0})
+    assert session.post("http://127.0.0.1:1/", data=data).json()["result"] == 1
+    state = session.limiter.state()
+    assert state["retries"] == 2 and state["timeouts"] == 2 and state["limit"] < 4
+
+    # calls changing the wallet are not sent twice
+    FlakyAdapter.sent = 0
+    with pytest.raises(requests.ReadTimeout):
+        session.post("http://127.0.0.1:1/", data=json.dumps({"method": "sendrawtransaction", "params": ["00"], "id": 0}))
+    assert FlakyAdapter.sent == 1
@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("pypeerassets")
+from pacli.fakenode.chain import SyntheticChain
+from pacli.fakenode.server import FakeNode
+import pacli.blockexp.blocklocator as loc
+import pacli.blockexp.utils as bu
+
+BLOCKS = 40
+
+
+@pytest.fixture
+def node(use_node):
+    return use_node(FakeNode(SyntheticChain(blocks=BLOCKS, txes_per_block=4, wallet_addresses=3, foreign_addresses=20, seed=8)))
+
+
+def scan(addresses: list, locator, **kwargs) -> dict:
+    return bu.show_txes_by_block(receiving_addresses=addresses, sending_addresses=addresses, startblock=0, endblock=BLOCKS,
+                                 locator=locator, use_locator=True, store_locator=True, quiet=True, workers=1, **kwargs)
+
+
+def interrupt_at(monkeypatch, height: int, exception: type) -> None:
+    # the blocks are added to the header index before their transactions are processed.
+    add_block = bu.header_index.add_block
+
+    def add(block):
+        if block["height"] == height:
+            raise exception
+        add_block(block)
+
+    monkeypatch.setattr(bu.header_index, "add_block", add)
+
+
+def stored(dbfile: str, addresses: list) -> dict:
+    locator = loc.BlockLocator.from_db(dbfile)
+    return {a : (list(locator.get_address(a).heights), locator.get_address(a).lastblockheight) for a in addresses}
+
+
+def test_interrupted_scan(node, tmp_path, monkeypatch):
+    addresses = node.chain.wallet_addresses
+    complete = scan(addresses, loc.BlockLocator.from_db(str(tmp_path / "complete.db")), flush_blocks=0, flush_seconds=0)
+    assert all(complete["blocks"][a] for a in addresses)
+
+    # a crash at block 23: the data was saved until block 20 (every 5 blocks after the genesis block).
+    dbfile = str(tmp_path / "locator.db")
+    with monkeypatch.context() as m:
+        interrupt_at(m, 23, RuntimeError)
+        with pytest.raises(RuntimeError):
+            scan(addresses, loc.BlockLocator.from_db(dbfile), flush_blocks=5, flush_seconds=0)
+    assert stored(dbfile, addresses) == {a : ([h for h in complete["blocks"][a] if h <= 20], 20) for a in addresses}
+
+    # KeyboardInterrupt ends the resumed scan, and the result contains the data until the last processed block.
+    with monkeypatch.context() as m:
+        interrupt_at(m, 33, KeyboardInterrupt)
+        result = scan(addresses, loc.BlockLocator.from_db(dbfile), flush_blocks=5, flush_seconds=0)
+    assert result["bheight"] == 32
+    assert result["blocks"] == {a : [h for h in complete["blocks"][a] if h <= 32] for a in addresses}
+    assert stored(dbfile, addresses) == {a : ([h for h in complete["blocks"][a] if h <= 30], 30) for a in addresses}
+
+    # the resumed scan completes the data.
+    result = scan(addresses, loc.BlockLocator.from_db(dbfile), flush_blocks=5, flush_seconds=0)
+    bu.store_locator_data(result["blocks"], result["bheight"], result["bhash"], loc.BlockLocator.from_db(dbfile))
+    assert stored(dbfile, addresses) == {a : (complete["blocks"][a], BLOCKS) for a in addresses}
+
+
+def test_stream(node, tmp_path, capsys):
+    import json
+    import pacli.blockexp.blockexp as bx
+    addresses = node.chain.wallet_addresses
+
+    # the generator yields the same transactions and locator data as the list version.
+    listed = scan(addresses, loc.BlockLocator.from_db(str(tmp_path / "listed.db")))
+    streamed = {}
+    txes = list(bu.iter_txes_by_block(receiving_addresses=addresses, sending_addresses=addresses, startblock=0, endblock=BLOCKS, result=streamed,
+                                      locator=loc.BlockLocator.from_db(str(tmp_path / "streamed.db")), use_locator=True, store_locator=True, quiet=True, workers=1))
+    assert txes == listed.pop("txes")
+    assert streamed == listed
+
+    # NDJSON output of show_txes
+    for advanced in (False, True):
+        expected = bx.show_txes(receiving_address=addresses[0], start=5, end=30, advanced=advanced, use_locator=False, quiet=True)
+        assert expected
+        capsys.readouterr()
+        assert bx.show_txes(receiving_address=addresses[0], start=5, end=30, advanced=advanced, use_locator=False, stream=True, quiet=True) is None
+        # other lines are notes which don't depend on quiet, e.g. about the missing extended config file.
+        lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+        assert [json.loads(line) for line in lines] == json.loads(json.dumps(expected, default=str))
@@ -0,0 +1,156 @@
+import pytest
+
+pytest.importorskip("pypeerassets")
+import pacli.blockexp.blkreader as br
+from pacli.fakenode.chain import SyntheticChain
+import pacli.fakenode.chain as fc
+from pacli.fakenode.server import FakeNode, LocalNode
+from pacli.provider import provider
+from pacli.config import Settings
+from pacli.extended.wallet_index import WalletIndex
+import pacli.extended.wallet_index as wi
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    node = FakeNode(SyntheticChain(blocks=40, txes_per_block=4, wallet_addresses=10, foreign_addresses=30, seed=4))
+    # setattr would create the provider, as the proxy forwards __class__.
+    monkeypatch.setitem(vars(provider), "_provider", LocalNode(node))
+    monkeypatch.setattr(Settings, "provider", "slm_rpcnode")
+    monkeypatch.setattr(Settings, "wallet_index", True)
+    index = WalletIndex(str(tmp_path / "walletindex.db"))
+    monkeypatch.setattr(wi, "wallet_index", index)
+    return index, node
+
+
+def indexed_entries(index):
+    return sorted([(r["txid"], sorted(map(tuple, r["entries"])), r["height"]) for r in index.transactions()])
+
+
+def node_entries(node):
+    entries = {}
+    for entry in node.call("listsinceblock")["transactions"]:
+        height = node.chain.tip() - entry["confirmations"] + 1 if entry["confirmations"] > 0 else None
+        entries.setdefault(entry["txid"], ([], height))[0].append((entry["account"], entry["category"]))
+    return sorted([(txid, sorted(e), height) for txid, (e, height) in entries.items()])
+
+
+def test_update(index):
+    index, node = index
+    assert index.update()
+    assert indexed_entries(index) == node_entries(node)
+    record = index.transactions()[0]
+    tx = node.call("getrawtransaction", record["txid"], 1)
+    assert record["outputs"] == [[o["scriptPubKey"].get("addresses"), o["value"]] for o in tx["vout"]]
+    assert index.as_tx(record)["confirmations"] == tx["confirmations"]
+
+    # an unconfirmed transaction, which is confirmed later
+    chain = node.chain
+    utxo = node.call("listunspent", 1, 9999999)[0]
+    raw = br.serialize_tx(1, 1700000000, [(utxo["txid"], utxo["vout"], b"")], [(1000, chain.address_script(chain.foreign_addresses[0]))])
+    txid = node.call("sendrawtransaction", raw.hex())
+    assert index.update()
+    assert indexed_entries(index) == node_entries(node)
+    assert index.find_spending_tx(utxo["txid"], utxo["vout"]) is None # only confirmed transactions
+    node.call("setgenerate", True, 2)
+    assert index.update()
+    assert indexed_entries(index) == node_entries(node)
+    assert index.find_spending_tx(utxo["txid"], utxo["vout"])["txid"] == txid
+    assert index.find_txids(txid[:12], only_start=True) == [txid]
+    assert txid in index.find_txids(txid[10:30])
+
+
+def test_reorg(index):
+    index, node = index
+    assert index.update()
+    # blocks above height 30 are replaced by others
+    with index.db:
+        index.db.execute("UPDATE txes SET blockhash = 'orphaned' WHERE height > 30")
+        index.db.execute("UPDATE state SET value = 'orphaned' WHERE key = 'since_hash'")
+    assert index.find_fork(node.chain.tip()) == 31
+    assert index.update()
+    assert indexed_entries(index) == node_entries(node)
+    assert "orphaned" not in [r["blockhash"] for r in index.transactions()]
+
+
+def test_addresses(index):
+    index, node = index
+    assert index.update()
+    records = index.transactions()
+    for address in node.chain.wallet_addresses[:3]:
+        sent = [r["txid"] for r in records if any([address in s["sender"] for s in r["senders"]])]
+        received = [r["txid"] for r in records if any([address in (a or []) for a, value in r["outputs"]])]
+        assert sorted([r["txid"] for r in index.address_entries([address], ("sender",))]) == sorted(sent)
+        assert sorted([r["txid"] for r in index.address_entries([address], ("receiver",))]) == sorted(received)
+        entries = index.address_entries([address])
+        assert sorted([(r["txid"], role) for r in entries for role in r["values"]]) == sorted([(t, "sender") for t in sent] + [(t, "receiver") for t in received])
+        heights = [r["height"] for r in entries if r["height"] is not None]
+        assert heights == sorted(heights)
+    # the rows of replaced transactions are deleted
+    with index.db:
+        index.db.execute("UPDATE state SET value = 'orphaned' WHERE key = 'since_hash'")
+        index.db.execute("UPDATE txes SET blockhash = 'orphaned' WHERE height > 30")
+    assert index.update()
+    assert index.db.execute("SELECT COUNT(*) FROM addresses WHERE txid NOT IN (SELECT txid FROM txes)").fetchone()[0] == 0
+
+
+def test_spent(index):
+    index, node = index
+    assert index.update()
+    records = [r for r in index.transactions() if r["height"] is not None]
+    spent = {tuple(outpoint) : r["txid"] for r in records for outpoint in r["inputs"]}
+    unspent = [(u["txid"], u["vout"]) for u in node.call("listunspent", 1, 9999999)]
+    result = index.find_spending_txes(list(spent) + unspent)
+    assert {outpoint : r["txid"] for outpoint, r in result.items()} == spent
+    outpoint = list(spent)[0]
+    assert index.find_spending_tx(*outpoint)["txid"] == spent[outpoint]
+
+
+def test_rescan(index):
+    index, node = index
+    # the coinbase outputs of the first blocks become mature, so the updates start after them.
+    node.call("setgenerate", True, fc.MATURITY)
+    assert index.update()
+    assert int(index.get_state("since_height")) >= 30
+    # an imported address with transactions in old blocks is only found after rescan().
+    chain = node.chain
+    received = [o["scriptPubKey"]["addresses"][0] for t, (h, raw) in chain.txes.items() if h is not None and h < 30
+                for o in chain.get_tx(t)["vout"] if o["scriptPubKey"].get("addresses")]
+    address = [a for a in chain.foreign_addresses if a in received][0]
+    chain.import_address(address, "imported")
+    assert index.update()
+    assert indexed_entries(index) != node_entries(node)
+    index.rescan()
+    assert index.update()
+    assert indexed_entries(index) == node_entries(node)
+    node.calls.clear()
+    assert index.update()
+    assert node.calls.get("listsinceblock") == 1 and node.calls.get("validateaddress") == 1
+
+
+def test_other_wallet(index, monkeypatch):
+    index, node = index
+    assert index.update()
+    assert index.get_state("wallet_address") in node.chain.wallet
+    other = FakeNode(SyntheticChain(blocks=40, txes_per_block=4, wallet_addresses=10, foreign_addresses=30, seed=5))
+    monkeypatch.setitem(vars(provider), "_provider", LocalNode(other))
+    assert index.update()
+    assert indexed_entries(index) == node_entries(other)
+    assert index.get_state("wallet_address") in other.chain.wallet
+
+
+@pytest.mark.parametrize("filters", [{}, {"sent" : True}, {"received" : True}])
+def test_address_transactions(index, monkeypatch, filters):
+    # the index gives the same results as the wallet transactions of the client.
+    import pacli.extended.queries as eq
+    import pacli.extended.utils as eu
+    index, node = index
+    monkeypatch.setattr(eq, "wallet_index", index)
+    monkeypatch.setattr(eu, "get_p2th_dict", lambda: {})
+    queries = [{"wallet" : True}] + [{"addr_string" : a} for a in node.chain.wallet_addresses[:3]]
+    for query in queries:
+        indexed = eq.get_address_transactions(include_coinbase=True, **query, **filters)
+        monkeypatch.setattr(Settings, "wallet_index", False)
+        expected = eq.get_address_transactions(include_coinbase=True, **query, **filters)
+        monkeypatch.setattr(Settings, "wallet_index", True)
+        assert indexed and sorted(indexed, key=lambda t: t["txid"]) == sorted(expected, key=lambda t: t["txid"])